@@ -0,0 +1,452 @@
+# LAMMPS Documentation Utilities
+#
+# Timing helpers to check how the converters scale with document size
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from lammpsdoc import txt2html
+from lammpsdoc import txt2rst
+from lammpsdoc import doc_anchor_check
+from lammpsdoc.corpus import CorpusGenerator
+
+# one long paragraph of each kind whose output is assembled piece by piece
+SECTION = "pair_style lj/cut command :h3\n\n" \
+          "%(list)s\n\n" \
+          "%(table)s\n\n" \
+          "%(pre)s\n\n"
+
+
+def create_document(n):
+    """ returns a document whose lists, tables and preformatted blocks have n lines """
+    items = ["item %d with [bold] and {italic} text :l" % i for i in range(n)]
+    items[0] = items[0].replace(":l", ":ulb,l")
+    items[-1] += ",ule"
+    cells = ",".join("cell%d" % i for i in range(2 * n))
+    pre = "\n".join("fix %d all nve" % i for i in range(n))
+    return SECTION % {'list': "\n".join(items),
+                      'table': cells + " :tb(c=2)",
+                      'pre': pre + " :pre"}
+
+
+def time_conversion(parser_class, content, repeat=3):
+    """ returns the best wall time in seconds of converting content """
+    best = None
+    for _ in range(repeat):
+        parser = parser_class()
+        start = time.perf_counter()
+        parser.convert(content)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def time_formatting(parser_class, n, repeat=3):
+    """ returns the best wall time in seconds of only assembling the output of
+    lists, tables and line blocks with n lines, without any markup """
+    lines = "\n".join("line %d" % i for i in range(n))
+    cells = ",".join("cell%d" % i for i in range(2 * n))
+    table_config = {'num_columns': 2, 'separator': ',', 'border_width': 1, 'table_alignment': 'center'}
+    best = None
+    for _ in range(repeat):
+        fmt = parser_class().format
+        start = time.perf_counter()
+        fmt.unordered_list(lines)
+        fmt.all_paragraphs(lines)
+        fmt.table(cells, dict(table_config))
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+MARKUP_WORDS = ["the", "[bold]", "{italic}", "par[tial]ly", "x_y", "a*b", "\\[x\\]",
+                "\"link\"_pair_lj.html", "\"ref\"_#anchor", "\\(x^2\\)", "end."]
+
+
+def create_markup_paragraph(n):
+    """ returns a paragraph of n words which are dense in inline markup """
+    return " ".join(MARKUP_WORDS[i % len(MARKUP_WORDS)] for i in range(n))
+
+
+def time_markup(markup_class, text, repeat=3):
+    """ returns the best wall time in seconds of converting the inline markup of text """
+    best = None
+    for _ in range(repeat):
+        markup = markup_class()
+        start = time.perf_counter()
+        markup.convert(text)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def create_math_paragraph(n):
+    """ returns a paragraph with n inline formulas, the worst case of the math pass """
+    return " and ".join("\\(\\epsilon_%d^{2} \\sigma^*\\)" % i for i in range(n))
+
+
+def time_inline_math(n, repeat=3):
+    """ returns the best wall time in seconds of converting n inline formulas """
+    text = txt2rst.RSTMarkup().escape_rst_chars(create_math_paragraph(n))
+    best = None
+    for _ in range(repeat):
+        markup = txt2rst.RSTMarkup()
+        start = time.perf_counter()
+        markup.inline_math(text)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+# a command page in the style of the LAMMPS manual
+PAGE = """"LAMMPS WWW Site"_lws - "LAMMPS Documentation"_ld - "LAMMPS Commands"_lc :c
+
+:link(lws,http://lammps.sandia.gov)
+:link(ld,Manual.html)
+:link(lc,Section_commands.html#comm)
+
+:line
+
+fix nvt%(id)d command :h3
+
+[Syntax:]
+
+fix ID group-ID nvt%(id)d keyword value ... :pre
+
+ID, group-ID are documented in "fix"_fix.html command :ulb,l
+nvt%(id)d = style name of this fix command :l
+one or more keyword/value pairs may be appended :l
+keyword = {temp} or {tchain} or {drag} :l
+  {temp} values = Tstart Tstop Tdamp
+    Tstart,Tstop = external temperature at start/end of run
+    Tdamp = temperature damping parameter (time units)
+  {drag} value = Df
+    Df = drag factor added to barostat/thermostat (0.0 = no drag) :pre
+:ule
+
+[Examples:]
+
+fix 1 all nvt%(id)d temp 300.0 300.0 100.0
+fix 1 water nvt%(id)d temp 300.0 300.0 100.0 drag 0.2 :pre
+
+[Description:]
+
+Perform constant NVT integration to update positions and velocities
+each timestep for atoms in the group using a Nose/Hoover style thermostat
+as described in "(Shinoda)"_#Shinoda%(id)d. The thermostat is applied to
+the translational degrees of freedom, with a target temperature
+\\(T_{target}\\) which is ramped from {Tstart} to {Tstop}:
+
+\\begin\\{equation\\} T(t) = T_\\{start\\} + \\frac\\{t\\}\\{t_\\{run\\}\\} (T_\\{stop\\} - T_\\{start\\}) \\end\\{equation\\}
+
+NOTE: A Nose-Hoover thermostat will not work well for arbitrary values
+of {Tdamp}. If {Tdamp} is too small, the temperature can fluctuate wildly.
+
+Keyword; Default; Meaning
+temp; none; target temperature
+tchain; 3; length of thermostat chain
+drag; 0.0; drag factor :tb(c=3,s=;)
+
+<!-- HTML_ONLY -->
+This paragraph only appears in the HTML output of "fix nvt%(id)d"_fix_nvt%(id)d.html.
+<!-- END_HTML_ONLY -->
+
+:line
+
+[Restart, fix_modify, output, run start/stop, minimize info:]
+
+This fix writes the state of the Nose/Hoover thermostat to "binary
+restart files"_restart.html.  See the "read_restart"_read_restart.html
+command for info on how to re-specify a fix in an input script that
+reads a restart file, so that the operation of the fix continues in an
+uninterrupted fashion.
+
+[Restrictions:] none
+
+[Related commands:]
+
+"fix nve"_fix_nve.html, "fix_modify"_fix_modify.html
+
+[Default:]
+
+The keyword defaults are tchain = 3 and drag = 0.0.
+
+:line
+
+:link(Shinoda%(id)d)
+[(Shinoda)] Shinoda, Shiga, and Mikami, Phys Rev B, 69, 134103 (2004).
+"""
+
+
+PAGE_SEPARATOR = "\n<!-- PAGE -->\n"
+
+
+def create_page(copies):
+    """ returns a representative document made of the given number of command pages """
+    return PAGE_SEPARATOR.join(PAGE % {'id': i} for i in range(copies))
+
+
+def best_time(prepare, repeat):
+    """ returns the best wall time in seconds of calling the function returned by prepare().
+    Setting up the function is not measured """
+    best = None
+    for _ in range(repeat):
+        function = prepare()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def unfiltered_rst(content):
+    """ returns the RST output of content before any document filter was applied """
+    parser = txt2rst.Txt2Rst()
+    parser.document_filters = []
+    return parser.convert(content)
+
+
+def markup_case(markup_class, texts):
+    def prepare():
+        markup = markup_class()
+        return lambda: [markup.convert(text) for text in texts]
+    return prepare
+
+
+def paragraphs_case(parser_class, content):
+    def prepare():
+        parser = parser_class()
+        return lambda: list(parser.paragraphs(content))
+    return prepare
+
+
+def table_case(parser_class, paragraph, configuration, table_format=None):
+    def prepare():
+        fmt = parser_class().format
+        if table_format is not None:
+            fmt.table_format = table_format
+        return lambda: fmt.table(paragraph, dict(configuration))
+    return prepare
+
+
+def convert_case(parser_class, content):
+    def prepare():
+        parser = parser_class()
+        return lambda: parser.convert(content)
+    return prepare
+
+
+def filter_case(doc_filter, content):
+    return lambda: lambda: doc_filter(content)
+
+
+def anchor_check_case(filenames):
+    return lambda: lambda: doc_anchor_check.find_anchors(filenames)
+
+
+def benchmark_cases(inputs, workdir):
+    """ returns (name, input name, paragraphs, bytes, prepare) tuples for the named documents in
+    inputs. The pages of each document are written to workdir for doc_anchor_check """
+    cases = []
+    parsers = [('html', txt2html.Txt2Html, txt2html.HTMLMarkup),
+               ('rst', txt2rst.Txt2Rst, txt2rst.RSTMarkup)]
+
+    for input_name, content in inputs:
+        size = len(content.encode())
+        paragraphs = list(txt2html.Txt2Html().paragraphs(content))
+        texts = [text for text, is_raw in paragraphs if not is_raw]
+        n = len(paragraphs)
+
+        # one table with a row per paragraph of the document
+        cells = ",".join("cell%d" % i for i in range(3 * n))
+        table_configuration = {'num_columns': 3, 'separator': ',', 'border_width': 1,
+                               'table_alignment': 'center'}
+
+        for name, parser_class, markup_class in parsers:
+            cases.append(('%s/markup' % name, input_name, len(texts), size, markup_case(markup_class, texts)))
+            cases.append(('%s/paragraphs' % name, input_name, n, size, paragraphs_case(parser_class, content)))
+            cases.append(('%s/table' % name, input_name, n, len(cells),
+                          table_case(parser_class, cells, table_configuration)))
+            cases.append(('%s/convert' % name, input_name, n, size, convert_case(parser_class, content)))
+
+        for table_format in ('list-table', 'csv-table'):
+            cases.append(('rst/%s' % table_format, input_name, n, len(cells),
+                          table_case(txt2rst.Txt2Rst, cells, table_configuration, table_format)))
+
+        converted = unfiltered_rst(content)
+        converted_size = len(converted.encode())
+        for doc_filter in txt2rst.Txt2Rst().document_filters:
+            cases.append(('filter/%s' % doc_filter.__name__, input_name, n, converted_size,
+                          filter_case(doc_filter, converted)))
+        cases.append(('filter/all', input_name, n, converted_size,
+                      filter_case(txt2rst.Txt2Rst().filter_document, converted)))
+
+        filenames = []
+        for i, page in enumerate(content.split(PAGE_SEPARATOR)):
+            filename = os.path.join(workdir, '%s_%d.txt' % (input_name, i))
+            with open(filename, 'wt') as f:
+                f.write(page)
+            filenames.append(filename)
+        cases.append(('doc_anchor_check', input_name, n, size, anchor_check_case(filenames)))
+
+    return cases
+
+
+def run_suite(scale=1, repeat=3, select=None, report=None):
+    """ times all benchmark cases on a representative document of 10 * scale command pages, a
+    synthetic corpus of 10 * scale pages and a document with lists, tables and preformatted
+    blocks of 250 * scale lines. Returns one dictionary per case. select limits the cases to
+    names which contain it, report is called with each result as soon as it is measured """
+    pages = 10 * scale
+    corpus = CorpusGenerator().pages(pages)
+    inputs = [('pages', create_page(pages)),
+              ('corpus', PAGE_SEPARATOR.join(content for filename, content in corpus)),
+              ('scaled', create_document(250 * scale))]
+    workdir = tempfile.mkdtemp()
+    results = []
+
+    try:
+        for name, input_name, paragraphs, size, prepare in benchmark_cases(inputs, workdir):
+            if select is not None and select not in name:
+                continue
+            seconds = best_time(prepare, repeat)
+            result = {'name': name,
+                      'input': input_name,
+                      'paragraphs': paragraphs,
+                      'bytes': size,
+                      'seconds': seconds,
+                      'paragraphs_per_second': paragraphs / seconds if seconds > 0 else 0.0,
+                      'mb_per_second': size / 1e6 / seconds if seconds > 0 else 0.0}
+            results.append(result)
+            if report is not None:
+                report(result)
+    finally:
+        shutil.rmtree(workdir)
+
+    return results
+
+
+def format_result(result):
+    return "%-56s %-7s %10.2f ms %12.0f par/s %9.2f MB/s" % (result['name'], result['input'],
+                                                                  result['seconds'] * 1000,
+                                                                  result['paragraphs_per_second'],
+                                                                  result['mb_per_second'])
+
+
+def save_results(results, filename, scale, repeat):
+    """ writes results as JSON together with the settings and environment of the run """
+    data = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': scale,
+            'repeat': repeat,
+            'results': results}
+    with open(filename, 'wt') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def load_results(filename):
+    with open(filename, 'rt') as f:
+        return json.load(f)['results']
+
+
+def compare_results(results, baseline):
+    """ returns (name, input, ratio) tuples of the run time of each result relative to the
+    baseline result with the same name and input """
+    baseline_times = dict(((r['name'], r['input']), r['seconds']) for r in baseline)
+    ratios = []
+    for result in results:
+        key = (result['name'], result['input'])
+        if baseline_times.get(key):
+            ratios.append((result['name'], result['input'], result['seconds'] / baseline_times[key]))
+    return ratios
+
+
+def scaling(parser_class, sizes, repeat=3, formatting_only=False):
+    """ returns (size, seconds) pairs for documents of the given sizes """
+    if formatting_only:
+        return [(n, time_formatting(parser_class, n, repeat)) for n in sizes]
+    return [(n, time_conversion(parser_class, create_document(n), repeat)) for n in sizes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='measure the speed of the LAMMPS documentation converters')
+    parser.add_argument('-n', dest='size', type=int, default=250, help='smallest document size in lines')
+    parser.add_argument('-r', dest='repeat', type=int, default=3, help='repetitions per measurement')
+    parser.add_argument('-s', '--scale', type=int, default=1, help='size factor of the benchmark suite inputs')
+    parser.add_argument('-k', dest='select', help='only run suite benchmarks whose name contains this text')
+    parser.add_argument('--json', dest='json_file', help='save the suite results to this JSON file')
+    parser.add_argument('--compare', dest='baseline_file',
+                        help='compare the suite results with those saved in this JSON file')
+    parser.add_argument('--scaling', action='store_true',
+                        help='measure how conversion time scales with documents of n to 8n lines')
+    parser.add_argument('--formatting-only', action='store_true',
+                        help='only time the assembly of lists and tables, without markup')
+    parser.add_argument('--markup', action='store_true',
+                        help='time the inline markup of one paragraph')
+    parser.add_argument('--math', action='store_true',
+                        help='time the inline math pass on paragraphs with n to 8n formulas')
+    args = parser.parse_args()
+
+    if args.markup:
+        text = create_markup_paragraph(args.size)
+        for name, markup_class in [('html', txt2html.HTMLMarkup), ('rst', txt2rst.RSTMarkup)]:
+            seconds = time_markup(markup_class, text, args.repeat)
+            print("%-4s %8d words %8.2f ms" % (name, args.size, seconds * 1000))
+        return
+
+    sizes = [args.size, 2 * args.size, 4 * args.size, 8 * args.size]
+
+    if args.math:
+        base_time = None
+        for n in sizes:
+            seconds = time_inline_math(n, args.repeat)
+            base_time = base_time or seconds
+            print("math %8d formulas %10.2f ms  x%.1f" % (n, seconds * 1000, seconds / base_time))
+        return
+
+    if args.scaling or args.formatting_only:
+        for name, parser_class in [('html', txt2html.Txt2Html), ('rst', txt2rst.Txt2Rst)]:
+            results = scaling(parser_class, sizes, args.repeat, args.formatting_only)
+            base_size, base_time = results[0]
+            for n, seconds in results:
+                print("%-4s %8d lines %10.1f ms  x%.1f" % (name, n, seconds * 1000, seconds / base_time))
+        return
+
+    results = run_suite(args.scale, args.repeat, args.select, report=lambda r: print(format_result(r)))
+
+    if args.json_file:
+        save_results(results, args.json_file, args.scale, args.repeat)
+
+    if args.baseline_file:
+        print()
+        for name, input_name, ratio in compare_results(results, load_results(args.baseline_file)):
+            print("%-56s %-7s x%.2f" % (name, input_name, ratio))
+
+if __name__ == "__main__":
+    main()
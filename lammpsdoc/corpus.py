@@ -0,0 +1,248 @@
+# LAMMPS Documentation Utilities
+#
+# Generator of synthetic LAMMPS style documentation pages for scale tests
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import random
+import argparse
+
+STYLES = ['fix', 'compute', 'pair_style', 'bond_style', 'angle_style', 'dump', 'region', 'atom_style']
+
+NAMES = ['nvt', 'npt', 'nve', 'langevin', 'lj/cut', 'eam', 'harmonic', 'morse', 'temp', 'pressure',
+         'msd', 'rdf', 'reax/c', 'tersoff', 'coul/long', 'granular', 'rigid', 'shake', 'spring', 'wall']
+
+WORDS = ['atoms', 'the', 'group', 'timestep', 'temperature', 'are', 'computed', 'with', 'each', 'of',
+         'force', 'energy', 'is', 'a', 'per-atom', 'value', 'which', 'can', 'be', 'used', 'by', 'this',
+         'command', 'simulation', 'box', 'in', 'units', 'distance', 'for', 'pairwise', 'interactions',
+         'velocity', 'and', 'to', 'output', 'thermostat', 'keyword', 'neighbor', 'list', 'cutoff']
+
+CITATIONS = ['Allen', 'Frenkel', 'Plimpton', 'Shinoda', 'Tersoff']
+
+KEYWORDS = ['temp', 'iso', 'aniso', 'drag', 'tchain', 'pchain', 'dilate', 'region', 'units', 'every']
+
+COMMON_LINKS = ':link(lws,http://lammps.sandia.gov)\n' \
+               ':link(ld,Manual.html)\n' \
+               ':link(lc,Section_commands.html#comm)\n'
+
+
+class CorpusGenerator(object):
+    """ generates LAMMPS style .txt pages with command headers, link anchors and aliases, links,
+    tables, nested lists, equations, inline math, notes and HTML_ONLY and RST blocks.
+
+    Each page is generated with its own random number generator seeded by the corpus seed and
+    the page index, so pages of large corpora can be generated one at a time and in any order.
+    Links point to other pages of a corpus of count pages. size scales the number of
+    paragraphs, list items and table rows of each page """
+
+    def __init__(self, seed=0, size=1):
+        self.seed = seed
+        self.size = size
+
+    def command_name(self, index):
+        style = STYLES[index % len(STYLES)]
+        name = NAMES[(index // len(STYLES)) % len(NAMES)]
+        return style, "%s%d" % (name, index)
+
+    def filename(self, index):
+        style, name = self.command_name(index)
+        return "%s_%s.txt" % (style, name.replace('/', '_'))
+
+    def html_name(self, index):
+        return self.filename(index)[:-len('.txt')] + ".html"
+
+    def pages(self, count):
+        """ yields (filename, content) pairs of a corpus of count pages """
+        for index in range(count):
+            yield self.filename(index), self.page(index, count)
+
+    def write(self, directory, count):
+        """ writes count pages to directory and returns their filenames """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        filenames = []
+        for name, content in self.pages(count):
+            filename = os.path.join(directory, name)
+            with open(filename, 'wt') as f:
+                f.write(content)
+            filenames.append(filename)
+        return filenames
+
+    def page(self, index, count=1):
+        """ returns the content of the page with the given index in a corpus of count pages """
+        rng = random.Random("%d:%d" % (self.seed, index))
+        style, name = self.command_name(index)
+        sections = [self.header(),
+                    "%s %s command :h3\n" % (style, name),
+                    self.syntax(rng, style, name),
+                    self.examples(rng, style, name),
+                    "[Description:]\n"]
+
+        for i in range(3 * self.size):
+            kind = rng.random()
+            if kind < 0.5:
+                sections.append(self.paragraph(rng, index, count))
+            elif kind < 0.6:
+                sections.append(self.equation(rng))
+            elif kind < 0.7:
+                sections.append(self.note(rng, index, count))
+            elif kind < 0.8:
+                sections.append(self.table(rng))
+            elif kind < 0.9:
+                sections.append(self.nested_list(rng, index, count))
+            elif kind < 0.95:
+                sections.append(self.html_only(rng, index, count))
+            else:
+                sections.append(self.rst_block(rng))
+
+        sections.append(":line\n")
+        sections.append(self.restart_info(rng, index, count))
+        sections.append("[Restrictions:] %s\n" % self.sentence(rng, index, count, 8))
+        sections.append(self.related(rng, index, count))
+        sections.append("[Default:]\n\n%s\n" % self.sentence(rng, index, count, 6))
+        sections.append(":line\n")
+        sections.append(self.references(rng, index))
+        return "\n".join(sections)
+
+    def header(self):
+        return '"LAMMPS WWW Site"_lws - "LAMMPS Documentation"_ld - "LAMMPS Commands"_lc :c\n\n' + \
+               COMMON_LINKS + "\n:line\n"
+
+    def words(self, rng, n):
+        return [rng.choice(WORDS) for _ in range(n)]
+
+    def inline(self, rng, index, count):
+        """ returns a word with inline markup """
+        kind = rng.random()
+        word = rng.choice(WORDS)
+        if kind < 0.25:
+            return "[%s]" % word
+        elif kind < 0.45:
+            return "{%s}" % word
+        elif kind < 0.6:
+            return '"%s"_%s' % (word, self.html_name(rng.randrange(count)))
+        elif kind < 0.7:
+            citation = rng.choice(CITATIONS)
+            return '"(%s)"_#%s%d' % (citation, citation, index)
+        elif kind < 0.8:
+            return '"LAMMPS"_lws'
+        elif kind < 0.9:
+            return "\\(%s_%s^%d\\)" % (rng.choice('EFTUVr'), rng.choice('ijk'), rng.randint(1, 12))
+        return "%s_%s" % (word, rng.choice(WORDS))
+
+    def sentence(self, rng, index, count, n):
+        words = self.words(rng, n)
+        for i in range(len(words)):
+            if rng.random() < 0.15:
+                words[i] = self.inline(rng, index, count)
+        text = " ".join(words)
+        return text[0].upper() + text[1:] + "."
+
+    def paragraph(self, rng, index, count):
+        lines = []
+        for _ in range(rng.randint(2, 6)):
+            lines.append(self.sentence(rng, index, count, rng.randint(6, 14)))
+        return "\n".join(lines) + "\n"
+
+    def syntax(self, rng, style, name):
+        keywords = rng.sample(KEYWORDS, rng.randint(2, 4))
+        items = ["ID, group-ID are documented in \"%s\"_%s.html command :ulb,l" % (style, style),
+                 "%s = style name of this command :l" % name,
+                 "zero or more keyword/value pairs may be appended :l",
+                 "keyword = %s :l" % " or ".join("{%s}" % k for k in keywords)]
+        values = []
+        for k in keywords:
+            values.append("  {%s} value = %s" % (k, " ".join(self.words(rng, 3))))
+        items.append("\n".join(values) + " :pre")
+        items.append(":ule")
+        return "[Syntax:]\n\n%s %s ID group-ID %s keyword value ... :pre\n\n%s\n" % (
+            style, name, name, "\n".join(items))
+
+    def examples(self, rng, style, name):
+        lines = []
+        for i in range(rng.randint(2, 2 + self.size)):
+            lines.append("%s %d all %s %s %.1f" % (style, i + 1, name, rng.choice(KEYWORDS), rng.uniform(0, 500)))
+        return "[Examples:]\n\n%s :pre\n" % "\n".join(lines)
+
+    def equation(self, rng):
+        a, b = rng.sample('EFTUVP', 2)
+        return "\\begin\\{equation\\} %s = \\sum_\\{i\\} \\frac\\{%s_i\\}\\{%d\\} \\end\\{equation\\}\n" % (
+            a, b, rng.randint(2, 9))
+
+    def note(self, rng, index, count):
+        kind = "IMPORTANT NOTE" if rng.random() < 0.3 else "NOTE"
+        return "%s: %s\n" % (kind, self.paragraph(rng, index, count))
+
+    def table(self, rng):
+        columns = rng.randint(2, 5)
+        rows = rng.randint(2, 3 * self.size + 2)
+        separator = rng.choice([',', ';'])
+        cells = []
+        for r in range(rows):
+            cells.append(separator.join("%s%d" % (rng.choice(WORDS), r) for c in range(columns)))
+        if separator == ',':
+            return "%s :tb(c=%d)\n" % (",\n".join(cells), columns)
+        return "%s :tb(c=%d,s=;)\n" % (";\n".join(cells), columns)
+
+    def nested_list(self, rng, index, count):
+        items = ["%s :ulb,l" % self.sentence(rng, index, count, 5)]
+        for i in range(rng.randint(0, self.size + 1)):
+            items.append("%s :l" % self.sentence(rng, index, count, 5))
+        inner = ["%s :l" % self.sentence(rng, index, count, 4) for i in range(rng.randint(1, self.size + 2))]
+        inner[0] = inner[0][:-len(":l")] + ":ulb,l"
+        inner[-1] += ",ule"
+        items.extend(inner)
+        items.append("%s :l,ule" % self.sentence(rng, index, count, 5))
+        return "\n".join(items) + "\n"
+
+    def html_only(self, rng, index, count):
+        return "<!-- HTML_ONLY -->\n%s<!-- END_HTML_ONLY -->\n" % self.paragraph(rng, index, count)
+
+    def rst_block(self, rng):
+        return "<!-- RST\n\n.. note::\n\n   %s\n\nEND_RST -->\n" % " ".join(self.words(rng, 8))
+
+    def restart_info(self, rng, index, count):
+        return "[Restart, fix_modify, output, run start/stop, minimize info:]\n\n%s\n" % \
+            self.paragraph(rng, index, count)
+
+    def related(self, rng, index, count):
+        links = ['"%s %s"_%s' % (self.command_name(i) + (self.html_name(i),))
+                 for i in sorted(set(rng.randrange(count) for _ in range(3)))]
+        return "[Related commands:]\n\n%s\n" % ", ".join(links)
+
+    def references(self, rng, index):
+        """ anchors of the citations a page can link to """
+        refs = []
+        for citation in CITATIONS:
+            refs.append(":link(%s%d)\n[(%s)] %s, J Comp Phys, %d, %d (%d).\n" % (
+                citation, index, citation, citation, rng.randint(1, 300), rng.randint(1, 999),
+                rng.randint(1990, 2015)))
+        return "\n".join(refs)
+
+def main():
+    parser = argparse.ArgumentParser(description='generate a synthetic corpus of LAMMPS style documentation pages')
+    parser.add_argument('directory', help='directory the .txt pages are written to')
+    parser.add_argument('-n', dest='pages', type=int, default=100, help='number of pages')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='seed of the random number generator')
+    parser.add_argument('--size', type=int, default=1, help='scales the number of paragraphs of each page')
+    args = parser.parse_args()
+
+    filenames = CorpusGenerator(args.seed, args.size).write(args.directory, args.pages)
+    print("wrote %d pages to %s" % (len(filenames), args.directory))
+
+if __name__ == "__main__":
+    main()
@@ -17,28 +17,210 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
 import re
 import sys
+import mmap
+import sqlite3
+import hashlib
 import argparse
+import multiprocessing
+
+anchor_pattern = re.compile(r'^:link\(([^,\)]*)\)')
+
+# patterns for a whole file. A literal line break in front of the anchor is found much faster
+# than a multiline ^. Labels end at a line break like they do in a single line
+first_anchor_pattern = re.compile(rb':link\(([^,\)\r\n]*)\)')
+file_anchor_pattern = re.compile(rb'\n:link\(([^,\)\r\n]*)\)')
+
+# a carriage return which is not part of \r\n, which text mode reads as line break
+lone_carriage_return = re.compile(rb'\r(?!\n)')
+
+# smaller files are read at once, since mapping them costs more than copying them
+MMAP_THRESHOLD = 1 << 20
+
+def scan_lines(filename):
+    """ returns the (label, line number) pairs of the anchors in a file, reading it line by line """
+    labels = []
+    with open(filename, 'rt') as f:
+        for line_number, line in enumerate(f):
+            m = anchor_pattern.match(line)
+            if m:
+                labels.append((m.group(1), line_number+1))
+    return labels
+
+def scan_buffer(buffer):
+    """ returns the (label, line number) pairs of the anchors in the bytes of a file. Line numbers
+    are computed from the match offsets """
+    labels = []
+    m = first_anchor_pattern.match(buffer)
+    if m:
+        labels.append((m.group(1).decode(), 1))
+
+    line_number = 1
+    offset = 0
+    for m in file_anchor_pattern.finditer(buffer):
+        line_start = m.start() + 1
+        line_number += buffer[offset:line_start].count(b'\n')
+        offset = line_start
+        labels.append((m.group(1).decode(), line_number))
+    return labels
+
+def scan_contents(filename, buffer, digest=None):
+    if digest is not None:
+        digest.update(buffer)
+    if buffer.find(b'\r') >= 0 and lone_carriage_return.search(buffer):
+        return scan_lines(filename)
+    return scan_buffer(buffer)
+
+def read_anchors(filename, digest=None):
+    """ returns the (label, line number) pairs of the anchors in a file, which is searched as a
+    whole. Large files are memory-mapped. If given, digest is updated with the file content """
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD or size == 0:
+            return scan_contents(filename, f.read(), digest)
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return scan_contents(filename, buffer, digest)
+
+def scan_file(filename):
+    return read_anchors(filename)
+
+def index_file(filename):
+    """ returns the size, modification time, content hash and anchors of a file """
+    stat = os.stat(filename)
+    digest = hashlib.sha1()
+    labels = read_anchors(filename, digest)
+    return stat.st_size, stat.st_mtime_ns, digest.hexdigest(), labels
+
+def map_files(function, filenames, jobs=1):
+    """ returns the results of function for each file in order. Files are processed by a pool of
+    jobs worker processes if jobs > 1, but never more workers than files """
+    jobs = min(jobs, len(filenames))
+    if jobs > 1:
+        chunksize = max(1, min(64, len(filenames) // (4 * jobs)))
+        with multiprocessing.Pool(jobs) as pool:
+            return list(pool.imap(function, filenames, chunksize))
+    return [function(filename) for filename in filenames]
+
+def find_anchors(filenames, jobs=1):
+    """ returns a dictionary which maps each anchor label to the (filename, line number) pairs
+    where it is defined. Files are scanned by a pool of jobs worker processes if jobs > 1 """
+    anchors = {}
+
+    # results are merged in the order of the files, which keeps the order of the report
+    for filename, labels in zip(filenames, map_files(scan_file, filenames, jobs)):
+        for label, line_number in labels:
+            if label in anchors:
+                anchors[label].append((filename, line_number))
+            else:
+                anchors[label] = [(filename, line_number)]
+
+    return anchors
+
+
+class AnchorIndex(object):
+    """ anchors of documentation files stored in a SQLite database, so that later runs only have
+    to rescan files which changed since they were indexed.
+
+    Files are identified by their absolute path. A file is rescanned if its size or modification
+    time changed, its anchors are only replaced if the hash of its content changed, too. Files
+    which no longer exist are removed from the index """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+
+        with self.connection:
+            if version != self.SCHEMA_VERSION:
+                self.connection.execute('DROP TABLE IF EXISTS anchors')
+                self.connection.execute('DROP TABLE IF EXISTS files')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, '
+                                    'mtime INTEGER, digest TEXT)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS anchors (path TEXT, label TEXT, line INTEGER)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS anchors_label ON anchors (label)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS anchors_path ON anchors (path)')
+            self.connection.execute('PRAGMA user_version = %d' % self.SCHEMA_VERSION)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def update(self, filenames, jobs=1):
+        """ rescans the files which are new or changed and removes files which no longer exist.
+        Returns the number of rescanned files """
+        stored = {}
+        for path, size, mtime, digest in self.connection.execute('SELECT path, size, mtime, digest FROM files'):
+            stored[path] = (size, mtime, digest)
+
+        changed = []
+        for filename in filenames:
+            path = os.path.abspath(filename)
+            stat = os.stat(filename)
+            entry = stored.get(path)
+            if entry is None or entry[:2] != (stat.st_size, stat.st_mtime_ns):
+                changed.append(path)
+
+        removed = [path for path in stored if not os.path.exists(path)]
+
+        with self.connection:
+            for path in removed:
+                self.remove(path)
+
+            for path, (size, mtime, digest, labels) in zip(changed, map_files(index_file, changed, jobs)):
+                entry = stored.get(path)
+                if entry is None or entry[2] != digest:
+                    self.connection.execute('DELETE FROM anchors WHERE path = ?', (path,))
+                    self.connection.executemany('INSERT INTO anchors (path, label, line) VALUES (?, ?, ?)',
+                                                [(path, label, line_number) for label, line_number in labels])
+                self.connection.execute('INSERT OR REPLACE INTO files (path, size, mtime, digest) '
+                                        'VALUES (?, ?, ?, ?)', (path, size, mtime, digest))
+        return len(changed)
+
+    def remove(self, path):
+        self.connection.execute('DELETE FROM anchors WHERE path = ?', (path,))
+        self.connection.execute('DELETE FROM files WHERE path = ?', (path,))
+
+    def files(self):
+        return [path for path, in self.connection.execute('SELECT path FROM files ORDER BY path')]
+
+    def duplicates(self):
+        """ returns a dictionary which maps each anchor label defined more than once in the
+        indexed files to the (path, line number) pairs where it is defined """
+        anchors = {}
+        for label, path, line_number in self.connection.execute(
+                'SELECT label, path, line FROM anchors WHERE label IN '
+                '(SELECT label FROM anchors GROUP BY label HAVING COUNT(*) > 1) ORDER BY label, path, line'):
+            anchors.setdefault(label, []).append((path, line_number))
+        return anchors
 
 def main():
     parser = argparse.ArgumentParser(description='scan for duplicate anchor labels in documentation files')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=0,
+                        help='number of worker processes used to scan the files (0: one per CPU)')
+    parser.add_argument('--index', dest='index', metavar='FILE',
+                        help='keep the anchors in this SQLite database and only rescan changed files. '
+                             'Duplicates are reported across all indexed files')
     parser.add_argument('files',  metavar='file', nargs='+', help='one or more files to scan')
     parsed_args = parser.parse_args()
 
-    anchor_pattern = re.compile(r'^:link\(([^,\)]*)\)')
-    anchors = {}
+    jobs = min(parsed_args.jobs if parsed_args.jobs > 0 else os.cpu_count(), len(parsed_args.files))
 
-    for filename in parsed_args.files:
-        with open(filename, 'rt') as f:
-            for line_number, line in enumerate(f):
-                m = anchor_pattern.match(line)
-                if m:
-                    label = m.group(1)
-                    if label in anchors:
-                        anchors[label].append((filename, line_number+1))
-                    else:
-                        anchors[label] = [(filename, line_number+1)]
+    if parsed_args.index:
+        with AnchorIndex(parsed_args.index) as index:
+            index.update(parsed_args.files, jobs)
+            anchors = dict((label, [(os.path.relpath(path), line_number) for path, line_number in locations])
+                           for label, locations in index.duplicates().items())
+    else:
+        anchors = find_anchors(parsed_args.files, jobs)
 
     count = 0
 
@@ -0,0 +1,62 @@
+#! /usr/bin/env python3
+# LAMMPS Documentation Utilities
+#
+# Scan for dangling links and unused anchors in documentation files
+#
+# Copyright (C) 2017 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import sys
+import argparse
+from lammpsdoc.links import LinkIndex, scan_page
+from lammpsdoc.doc_anchor_check import map_files
+
+
+def location(filename, line):
+    if line > 0:
+        return "%s:%d" % (filename, line)
+    return filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description='scan for dangling links and unused anchors in documentation '
+                                                 'files')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=0,
+                        help='number of worker processes used to scan the files (0: one per CPU)')
+    parser.add_argument('--no-unused', dest='unused', action='store_false',
+                        help='do not report anchors which no link points to')
+    parser.add_argument('files',  metavar='file', nargs='+', help='one or more files to scan')
+    parsed_args = parser.parse_args()
+
+    jobs = parsed_args.jobs if parsed_args.jobs > 0 else os.cpu_count()
+    index = LinkIndex(map_files(scan_page, parsed_args.files, jobs))
+    dangling, unused = index.check()
+
+    for filename, line, target, reason in dangling:
+        print(" - %s: %s (%s)" % (location(filename, line), target, reason))
+
+    if parsed_args.unused:
+        for filename, line, name in unused:
+            print(" - %s: anchor %s is not linked to" % (location(filename, line), name))
+        print("Found %d unused anchors." % len(unused))
+
+    if dangling:
+        print("Found %d dangling links." % len(dangling))
+        sys.exit(1)
+    else:
+        print("No dangling links.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+# LAMMPS Documentation Utilities
+#
+# Parsed representation of LAMMPS documentation text files
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import itertools
+from collections import OrderedDict
+
+command_pattern = re.compile(r"(?P<command>[^\(,]+(\([^\)]+\))?),?")
+named_link_pattern = re.compile(r"^link\((?P<name>[^\,]+)\)")
+define_link_alias_pattern = re.compile(r"^link\((?P<alias>[^\,]+),(?P<value>[^\,]+)\)")
+link_pattern = re.compile(r"\"(?P<text>[^\"]+)\"_(?P<link>[^\s\t\n]+)")
+
+# characters at which str.splitlines() breaks lines
+LINE_BREAKS = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+CHUNK_SIZE = 1 << 16
+
+
+def format_string(paragraph):
+    """ returns the trailing formatting string of a paragraph """
+    last_word = paragraph.rsplit(None, 1)[-1]
+    format_str = paragraph[paragraph.rfind(last_word):]
+    return format_str.strip('\n')
+
+
+def parse_commands(format_str):
+    """ splits a formatting string like ':ulb,l' into its list of commands """
+    commands = format_str[1:].strip()
+    return [x[0] for x in command_pattern.findall(commands)]
+
+
+def read_chunks(source, chunk_size=CHUNK_SIZE):
+    """ yields a string or the text read from a file object in chunks """
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+    else:
+        for chunk in iter(lambda: source.read(chunk_size), ''):
+            yield chunk
+
+
+def split_chunks(source, chunk_size=CHUNK_SIZE):
+    """ yields the lines of a string or a file object like str.splitlines(), as one list of lines
+    per chunk of text """
+    pending = ''
+
+    for chunk in read_chunks(source, chunk_size):
+        text = pending + chunk if pending else chunk
+        lines = text.splitlines()
+        last = text[-1]
+
+        if last == '\r':
+            # the first half of a \r\n line break if the next chunk starts with \n
+            pending = lines.pop() + '\r'
+        elif last in LINE_BREAKS:
+            pending = ''
+        else:
+            pending = lines.pop()
+
+        yield lines
+
+    if pending:
+        yield pending.splitlines()
+
+
+def iter_lines(source, chunk_size=CHUNK_SIZE):
+    """ yields the lines of a string or a file object like str.splitlines(). The text is split one
+    chunk at a time, so lines are available before a file is read completely """
+    return itertools.chain.from_iterable(split_chunks(source, chunk_size))
+
+
+def command_name(command):
+    """ name of a formatting command without its arguments, like 'tb' for 'tb(c=3)' """
+    return command.split('(', 1)[0]
+
+
+class CommandCache(object):
+    """ least recently used cache of compiled formatting strings """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class Paragraph(object):
+    """ a single paragraph of a document together with its formatting commands """
+    __slots__ = ('text', 'is_raw', 'targets', 'format_str', 'commands')
+
+    def __init__(self, text, is_raw, targets):
+        self.text = text
+        self.is_raw = is_raw
+        self.targets = targets
+        self.format_str = None
+        self.commands = []
+
+        if not is_raw:
+            words = text.rsplit(None, 1)
+            if words and words[-1].startswith(':'):
+                self.format_str = format_string(text)
+                self.commands = parse_commands(self.format_str)
+
+    def has_formatting(self):
+        return self.format_str is not None
+
+    def anchors(self):
+        """ names defined by :link(name) """
+        names = []
+        for command in self.commands:
+            m = named_link_pattern.match(command)
+            if m:
+                names.append(m.group('name'))
+        return names
+
+    def link_aliases(self):
+        """ (alias, value) pairs defined by :link(alias,value) """
+        aliases = []
+        for command in self.commands:
+            m = define_link_alias_pattern.match(command)
+            if m:
+                aliases.append((m.group('alias'), m.group('value')))
+        return aliases
+
+    def links(self):
+        """ (text, link) pairs of all "text"_link references in the paragraph """
+        if self.is_raw:
+            return []
+        return link_pattern.findall(self.text)
+
+
+class ParagraphSegmenter(object):
+    """ splits a sequence of lines into paragraphs using the block rules of a parser """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.paragraph = []
+        self.last_line_had_format = False
+        self.ignore_lines = False
+        self.raw_lines = False
+
+    def feed(self, line):
+        """ adds the next line. Returns a completed (paragraph, is_raw) tuple or None """
+        parser = self.parser
+        completed = None
+
+        if parser.is_ignored_textblock_begin(line):
+            if len(self.paragraph) > 0:
+                completed = ('\n'.join(self.paragraph) + '\n', False)
+            self.paragraph = []
+            self.last_line_had_format = False
+            self.ignore_lines = True
+        elif parser.is_ignored_textblock_end(line):
+            self.ignore_lines = False
+            return None
+        elif parser.is_raw_textblock_begin(line):
+            if len(self.paragraph) > 0:
+                completed = ('\n'.join(self.paragraph) + '\n', False)
+            self.paragraph = []
+            self.last_line_had_format = False
+            self.raw_lines = True
+            return completed
+        elif parser.is_raw_textblock_end(line):
+            if len(self.paragraph) > 0:
+                completed = ('\n'.join(self.paragraph) + '\n', True)
+            self.paragraph = []
+            self.raw_lines = False
+            return completed
+
+        if self.ignore_lines:
+            return completed
+        elif self.raw_lines:
+            self.paragraph.append(line)
+            return completed
+
+        if parser.is_paragraph_separator(line):
+            if len(self.paragraph) > 0:
+                completed = ('\n'.join(self.paragraph) + '\n', False)
+            self.paragraph = []
+            self.last_line_had_format = False
+        elif self.last_line_had_format:
+            if len(self.paragraph) > 0:
+                completed = ('\n'.join(self.paragraph) + '\n', False)
+            self.paragraph = [line]
+            self.last_line_had_format = parser.has_formatting(line)
+        else:
+            self.paragraph.append(line)
+            self.last_line_had_format = parser.has_formatting(line)
+
+        return completed
+
+    def finish(self):
+        """ returns the last (paragraph, is_raw) tuple or None """
+        if len(self.paragraph) > 0:
+            completed = ('\n'.join(self.paragraph) + '\n', False)
+            self.paragraph = []
+            return completed
+        return None
+
+
+class Document(object):
+    """ paragraphs of a text file, segmented once for one or more parsers.
+
+    Paragraphs which are identical for several parsers are shared. Each paragraph
+    records the parsers it belongs to as a bit mask of the parser indices """
+    __slots__ = ('paragraphs', 'num_targets', 'size')
+
+    def __init__(self, paragraphs, num_targets, size):
+        self.paragraphs = paragraphs
+        self.num_targets = num_targets
+        self.size = size
+
+    @classmethod
+    def parse(cls, content, parsers):
+        segmenters = [(1 << index, ParagraphSegmenter(parser)) for index, parser in enumerate(parsers)]
+        paragraphs = []
+
+        for line in parsers[0].lines(content):
+            completed = None
+            for bit, segmenter in segmenters:
+                paragraph = segmenter.feed(line)
+                if paragraph is not None:
+                    if completed is None:
+                        completed = []
+                    completed.append((bit, paragraph))
+            if completed:
+                cls.add_paragraphs(paragraphs, completed)
+
+        cls.add_paragraphs(paragraphs, [(bit, segmenter.finish()) for bit, segmenter in segmenters])
+
+        return cls(paragraphs, len(parsers), len(content))
+
+    @staticmethod
+    def add_paragraphs(paragraphs, completed):
+        added = []
+        for bit, paragraph in completed:
+            if paragraph is None:
+                continue
+            text, is_raw = paragraph
+            for node in added:
+                if node.text == text and node.is_raw == is_raw:
+                    node.targets |= bit
+                    break
+            else:
+                node = Paragraph(text, is_raw, bit)
+                added.append(node)
+                paragraphs.append(node)
+
+    def is_empty(self):
+        return self.size == 0
+
+    def target_paragraphs(self, target=0):
+        bit = 1 << target
+        for paragraph in self.paragraphs:
+            if paragraph.targets & bit:
+                yield paragraph
@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import re
+from lammpsdoc.output import FilterSpec, LINE_SCOPE, BLOCK_SCOPE, DOCUMENT_SCOPE, create_filter_chain
 
 def detect_local_toc(paragraph):
     local_toc_pattern = re.compile(r"[0-9]+\.[0-9]*\s+.+<BR>", re.MULTILINE)
@@ -28,10 +29,7 @@ def detect_local_toc(paragraph):
     return paragraph
 
 def indent(content):
-    indented = ""
-    for line in content.splitlines():
-        indented += "   %s\n" % line
-    return indented
+    return "".join("   %s\n" % line for line in content.splitlines())
 
 def detect_and_format_notes(paragraph):
     note_pattern = re.compile(r"(?P<type>(IMPORTANT )?NOTE):\s+(?P<content>.+)", re.MULTILINE | re.DOTALL)
@@ -58,16 +56,18 @@ def detect_and_add_command_to_index(content):
 
     return content
 
+FILE_HEADER_END = '----------\n\n'
+
+COMMON_LINKS = "\n.. _lws: http://lammps.sandia.gov\n" \
+               ".. _ld: Manual.html\n" \
+               ".. _lc: Section_commands.html#comm\n"
+
 def filter_file_header_until_first_horizontal_line(content):
-    hr = '----------\n\n'
+    hr = FILE_HEADER_END
     first_hr = content.find(hr)
 
-    common_links = "\n.. _lws: http://lammps.sandia.gov\n" \
-                   ".. _ld: Manual.html\n" \
-                   ".. _lc: Section_commands.html#comm\n"
-
     if first_hr >= 0:
-        return content[first_hr+len(hr):].lstrip() + common_links
+        return content[first_hr+len(hr):].lstrip() + COMMON_LINKS
     return content
 
 def promote_doc_keywords(content):
@@ -92,22 +92,199 @@ def filter_multiple_horizontal_rules(content):
     return re.sub(r"----------[\s\n]+----------", '', content)
 
 
+PARSED_LITERAL = ".. parsed-literal::\n\n"
+non_whitespace_pattern = re.compile(r"\S")
+
+
+class LiteralBlockScanner(object):
+    """ scans the indented and empty lines of parsed-literal blocks.
+
+    A directive inside of an indented line starts a block which ends together with the enclosing
+    one, so its lines are not scanned again """
+
+    def __init__(self, content):
+        self.content = content
+        self.start = -1
+        self.end = -1
+        self.empty_end = -1
+        self.blank = True
+        self.gap_start = -1
+        self.gap_end = -1
+
+    def scan(self, start):
+        """ returns the position after the last empty line of the block starting at start or -1,
+        whether there are lines before that empty line and whether all lines after it are blank """
+        if not self.start <= start < self.end:
+            self.scan_lines(start)
+
+        if self.empty_end <= start:
+            return -1, False, True
+        return self.empty_end, self.empty_end - 1 > start, self.blank
+
+    def scan_lines(self, start):
+        content = self.content
+        pos = start
+        self.empty_end = -1
+        self.blank = True
+
+        while True:
+            end = content.find('\n', pos)
+            if end < 0:
+                break
+            if end == pos:
+                self.empty_end = end + 1
+                self.blank = True
+            elif end - pos > 3 and content.startswith('   ', pos):
+                self.blank = self.blank and content[pos:end].isspace()
+            else:
+                break
+            pos = end + 1
+
+        self.start = start
+        self.end = pos
+
+    def next_directive(self, pos):
+        """ returns the start of the block of a directive which follows pos after whitespace or -1 """
+        if pos != self.gap_start:
+            content = self.content
+            m = non_whitespace_pattern.search(content, pos)
+            self.gap_start = pos
+            self.gap_end = -1
+            if m is not None and content[m.start()-1] == '\n' and content.startswith(PARSED_LITERAL, m.start()):
+                self.gap_end = m.start() + len(PARSED_LITERAL)
+        return self.gap_end
+
+
 def merge_preformatted_sections(content):
-    mergable_section_pattern = re.compile(r"\.\. parsed-literal::\n"
-                                          r"\n"
-                                          r"(?P<listingA>((   [^\n]+\n)|(^\n))+)\n\s*"
-                                          r"^\.\. parsed-literal::\n"
-                                          r"\n"
-                                          r"(?P<listingB>((   [^\n]+\n)|(^\n))+)\n", re.MULTILINE | re.DOTALL)
-
-    m = mergable_section_pattern.search(content)
-
-    while m:
-        content = mergable_section_pattern.sub(r".. parsed-literal::\n"
-                                            r"\n"
-                                            r"\g<listingA>"
-                                            r"\g<listingB>"
-                                            r"\n", content)
-        m = mergable_section_pattern.search(content)
+    """ merges consecutive parsed-literal blocks which are only separated by whitespace.
 
-    return content
+    A block consists of indented and empty lines up to its last empty line. It can be merged with
+    a following directive if there are only blank lines after it. The merged block takes the
+    lines of both blocks and keeps everything after the last empty line of the second one """
+    scanner = LiteralBlockScanner(content)
+    out = []
+    copied = 0
+    pos = content.find(PARSED_LITERAL)
+
+    while pos >= 0:
+        empty_end, has_lines, blank = scanner.scan(pos + len(PARSED_LITERAL))
+        merged = False
+
+        while empty_end >= 0 and has_lines and blank:
+            second = scanner.next_directive(empty_end)
+            if second < 0:
+                break
+
+            next_empty_end, next_has_lines, next_blank = scanner.scan(second)
+            if next_empty_end < 0 or not next_has_lines:
+                break
+
+            if not merged:
+                out.append(content[copied:empty_end-1])
+                merged = True
+            out.append(content[second:next_empty_end-1])
+            copied = next_empty_end - 1
+            empty_end, has_lines, blank = next_empty_end, next_has_lines, next_blank
+
+        if merged:
+            pos = content.find(PARSED_LITERAL, copied)
+        else:
+            pos = content.find(PARSED_LITERAL, pos + 1)
+
+    out.append(content[copied:])
+    return "".join(out)
+
+
+class CommandIndexStreamFilter(object):
+    """ streaming form of detect_and_add_command_to_index, which only needs the first line """
+
+    def __init__(self):
+        self.pending = ""
+        self.done = False
+
+    def feed(self, text):
+        if self.done:
+            return text
+        self.pending += text
+        if '\n' not in self.pending:
+            return ""
+        return self.finish()
+
+    def finish(self):
+        text = self.pending
+        self.pending = ""
+        if self.done:
+            return text
+        self.done = True
+        return detect_and_add_command_to_index(text)
+
+
+class FileHeaderStreamFilter(object):
+    """ streaming form of filter_file_header_until_first_horizontal_line. Output is held
+    back until the first horizontal line was seen """
+    hr = FILE_HEADER_END
+
+    def __init__(self):
+        self.pending = ""
+        self.found_hr = False
+        self.strip = False
+
+    def feed(self, text):
+        if not self.found_hr:
+            start = max(0, len(self.pending) - len(self.hr) + 1)
+            self.pending += text
+            first_hr = self.pending.find(self.hr, start)
+            if first_hr < 0:
+                return ""
+            text = self.pending[first_hr+len(self.hr):]
+            self.pending = ""
+            self.found_hr = True
+            self.strip = True
+
+        if self.strip:
+            text = text.lstrip()
+            self.strip = not text
+
+        return text
+
+    def finish(self):
+        if not self.found_hr:
+            text = self.pending
+            self.pending = ""
+            return text
+        return COMMON_LINKS
+
+
+def starts_outside_horizontal_rules(content, line_start):
+    """ horizontal rules are only merged within runs of dashes and whitespace """
+    c = content[line_start]
+    return c != '-' and not c.isspace()
+
+
+def starts_unindented_line(content, line_start):
+    """ preformatted sections can not be merged across a line starting with text other than a
+    parsed-literal directive """
+    directive = ".. parsed-literal::"
+    c = content[line_start]
+    return not c.isspace() and not directive.startswith(content[line_start:line_start+len(directive)])
+
+
+filter_specs = {
+    filter_file_header_until_first_horizontal_line: FilterSpec(filter_file_header_until_first_horizontal_line,
+                                                               DOCUMENT_SCOPE, markers=(FILE_HEADER_END,),
+                                                               stream=FileHeaderStreamFilter),
+    detect_and_add_command_to_index: FilterSpec(detect_and_add_command_to_index, DOCUMENT_SCOPE,
+                                                markers=(' command',), stream=CommandIndexStreamFilter),
+    filter_multiple_horizontal_rules: FilterSpec(filter_multiple_horizontal_rules, BLOCK_SCOPE,
+                                                 markers=('----------',),
+                                                 is_boundary=starts_outside_horizontal_rules),
+    promote_doc_keywords: FilterSpec(promote_doc_keywords, LINE_SCOPE, markers=('**',)),
+    merge_preformatted_sections: FilterSpec(merge_preformatted_sections, BLOCK_SCOPE, markers=(PARSED_LITERAL,),
+                                            is_boundary=starts_unindented_line),
+}
+
+
+def create_stream_filter(doc_filter):
+    """ returns a filter object with feed(text) and finish() methods that gives the same output
+    as the document filter. Filters without a streaming form see the whole document """
+    return create_filter_chain([doc_filter], filter_specs)[0]
@@ -0,0 +1,262 @@
+# LAMMPS Documentation Utilities
+#
+# Corpus-wide index of link anchors, aliases and link targets
+#
+# Copyright (C) 2017 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import hashlib
+from lammpsdoc.document import Paragraph
+from lammpsdoc.txt2html import Markup, TxtParser
+from lammpsdoc.txt2rst import Txt2Rst
+from lammpsdoc.doc_anchor_check import map_files
+
+
+def is_external(target):
+    return '://' in target or target.startswith('mailto:')
+
+
+def page_key(filename):
+    """ absolute path of a page without its extension, which identifies it as link target """
+    return os.path.splitext(os.path.abspath(filename))[0]
+
+
+class LineCounter(object):
+    """ finds the line numbers of strings which occur in a text in increasing order """
+
+    def __init__(self, content):
+        self.content = content
+        self.pos = 0
+        self.line = 1
+
+    def find(self, text):
+        """ returns the line of the next occurrence of text, or 0 if there is none """
+        pos = self.content.find(text, self.pos)
+        if pos < 0:
+            return 0
+        self.line += self.content.count('\n', self.pos, pos)
+        self.pos = pos + len(text)
+        line = self.line
+        self.line += text.count('\n')
+        return line
+
+
+class PageLinks(object):
+    """ the anchors, link aliases and links of a single page together with their line numbers """
+    __slots__ = ('filename', 'anchors', 'aliases', 'links')
+
+    def __init__(self, filename, anchors=None, aliases=None, links=None):
+        self.filename = filename
+        self.anchors = anchors if anchors is not None else {}
+        self.aliases = aliases if aliases is not None else {}
+        self.links = links if links is not None else []
+
+    @classmethod
+    def scan(cls, filename, content):
+        """ collects the link targets of a page from its paragraphs, the same way a conversion
+        sees them. Raw, raw HTML and math paragraphs are skipped """
+        page = cls(filename)
+        parser = TxtParser()
+        lines = LineCounter(content)
+
+        for text, is_raw in parser.paragraphs(content):
+            if is_raw or parser.is_raw_html_paragraph(text) or parser.is_math_paragraph(text):
+                continue
+            paragraph = Paragraph(text, is_raw, 1)
+
+            for link_text, link in paragraph.links():
+                target = link.rstrip(Markup.PUNCTUATION_CHARACTERS)
+                page.links.append((target, lines.find('"%s"_%s' % (link_text, link))))
+
+            for name in paragraph.anchors():
+                page.anchors.setdefault(name, lines.find('link(%s)' % name))
+
+            for alias, value in paragraph.link_aliases():
+                page.aliases[alias] = value
+        return page
+
+
+def scan_page(filename):
+    with open(filename, 'rt') as f:
+        return PageLinks.scan(filename, f.read())
+
+
+class LinkIndex(object):
+    """ the anchors, aliases and links of all pages of a corpus.
+
+    A link "text"_target of a page is resolved like the converters do: link aliases of the page
+    come first, then external URLs, #name anchors of the same page, page.html and page.html#name
+    targets of other pages and names of anchors of the same page. Other targets must be files
+    relative to the page.
+
+    Pages which are linked to but were not added are read from their .txt source, so that a
+    subset of the pages can be checked without building the HTML output """
+
+    def __init__(self, pages=()):
+        self.pages = {}
+        self.sources = {}
+        for page in pages:
+            self.add(page)
+
+    def add(self, page):
+        self.pages[page_key(page.filename)] = page
+
+    def find_page(self, page, path):
+        """ returns the page a relative .html path of page points to, or None """
+        directory = os.path.dirname(os.path.abspath(page.filename))
+        key = os.path.normpath(os.path.join(directory, path[:-len('.html')]))
+
+        if key in self.pages:
+            return self.pages[key]
+
+        if key not in self.sources:
+            source = key + '.txt'
+            self.sources[key] = scan_page(source) if os.path.isfile(source) else None
+        return self.sources[key]
+
+    def resolve(self, page, target, used):
+        """ returns None if target is a valid link target of page, otherwise the reason why it is
+        not. Anchors which are linked to are added to used as (page key, name) pairs """
+        if target in page.aliases:
+            target = page.aliases[target]
+
+        if is_external(target):
+            return None
+
+        path, sep, name = target.partition('#')
+
+        if not path:
+            return self.resolve_anchor(page, name, used)
+
+        if path.endswith('.html'):
+            linked_page = self.find_page(page, path)
+            if linked_page is not None:
+                return self.resolve_anchor(linked_page, name, used) if sep else None
+
+        if not sep and target in page.anchors:
+            used.add((page_key(page.filename), target))
+            return None
+
+        directory = os.path.dirname(os.path.abspath(page.filename))
+        if os.path.exists(os.path.join(directory, path)):
+            return None
+        return "no page %s" % path
+
+    def resolve_anchor(self, page, name, used):
+        if name in page.anchors:
+            used.add((page_key(page.filename), name))
+            return None
+        return "no anchor %s in %s" % (name, page.filename)
+
+    def check(self):
+        """ returns the dangling links as (filename, line, target, reason) tuples and the unused
+        anchors as (filename, line, name) tuples, both ordered by file and line """
+        dangling = []
+        used = set()
+
+        for key in sorted(self.pages):
+            page = self.pages[key]
+            for target, line in page.links:
+                reason = self.resolve(page, target, used)
+                if reason is not None:
+                    dangling.append((page.filename, line, target, reason))
+
+        unused = []
+        for key in sorted(self.pages):
+            page = self.pages[key]
+            for name, line in sorted(page.anchors.items(), key=lambda item: item[1]):
+                if (key, name) not in used:
+                    unused.append((page.filename, line, name))
+
+        return dangling, unused
+
+
+def scan_link_targets(filename):
+    """ returns the anchor names and (alias, value) pairs defined in a file as the RST converter,
+    which consults the link table, sees them. Blocks it skips or copies as they are are left out """
+    parser = Txt2Rst()
+    names = []
+    aliases = []
+
+    with open(filename, 'rt') as f:
+        paragraphs = (Paragraph(text, is_raw, 1) for text, is_raw in parser.paragraphs(f))
+        for paragraph_names, paragraph_aliases in parser.link_definitions(paragraphs):
+            names.extend(paragraph_names)
+            aliases.extend(paragraph_aliases)
+    return names, aliases
+
+
+class LinkTable(object):
+    """ anchor names and link aliases defined anywhere in a corpus, which a converter consults for
+    link targets its current file does not define.
+
+    Aliases which are defined with different values by different files are ambiguous and left
+    out. Tables are saved as JSON """
+
+    def __init__(self, references=(), aliases=None, ambiguous=()):
+        self.references = set(references)
+        self.aliases = dict(aliases or {})
+        self.ambiguous = set(ambiguous)
+        self.cached_digest = None
+
+    @classmethod
+    def scan(cls, filenames, jobs=1):
+        """ builds the table of files by a pool of jobs worker processes if jobs > 1 """
+        table = cls()
+        for names, aliases in map_files(scan_link_targets, filenames, jobs):
+            table.add(names, aliases)
+        return table
+
+    def add(self, names, aliases):
+        self.cached_digest = None
+        self.references.update(names)
+        for alias, value in aliases:
+            if alias in self.ambiguous:
+                continue
+            if self.aliases.setdefault(alias, value) != value:
+                del self.aliases[alias]
+                self.ambiguous.add(alias)
+
+    def has_reference(self, name):
+        return name in self.references
+
+    def has_alias(self, name):
+        return name in self.aliases
+
+    def to_dict(self):
+        return {'references': sorted(self.references),
+                'aliases': self.aliases,
+                'ambiguous': sorted(self.ambiguous)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['references'], data['aliases'], data['ambiguous'])
+
+    def digest(self):
+        """ hash of the table, which changes whenever the converted output might """
+        if self.cached_digest is None:
+            self.cached_digest = hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()
+        return self.cached_digest
+
+    def save(self, filename):
+        with open(filename, 'wt') as f:
+            json.dump(self.to_dict(), f, sort_keys=True)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rt') as f:
+            return cls.from_dict(json.load(f))
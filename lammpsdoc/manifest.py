@@ -0,0 +1,86 @@
+# LAMMPS Documentation Utilities
+#
+# Build manifest for incremental conversions
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import hashlib
+import lammpsdoc
+
+
+def content_hash(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class BuildManifest(object):
+    """ records which source, converter and options produced each output file.
+
+    One manifest file is kept in every directory that contains outputs. Entries are
+    keyed by the output file name relative to that directory """
+    FILENAME = '.lammpsdoc-manifest.json'
+    FORMAT_VERSION = 1
+
+    def __init__(self):
+        self.directories = {}
+        self.modified = set()
+
+    def entries(self, directory):
+        if directory not in self.directories:
+            self.directories[directory] = self.load(directory)
+        return self.directories[directory]
+
+    def load(self, directory):
+        path = os.path.join(directory, BuildManifest.FILENAME)
+        try:
+            with open(path, 'rt') as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+        if data.get('format') != BuildManifest.FORMAT_VERSION:
+            return {}
+        return data.get('outputs', {})
+
+    def create_record(self, source, source_hash, converter, options):
+        return {
+            'source': os.path.abspath(source),
+            'hash': source_hash,
+            'converter': converter,
+            'options': options,
+            'version': lammpsdoc.__version__
+        }
+
+    def is_up_to_date(self, output_filename, record):
+        directory, name = os.path.split(os.path.abspath(output_filename))
+        return self.entries(directory).get(name) == record and os.path.exists(output_filename)
+
+    def update(self, output_filename, record):
+        directory, name = os.path.split(os.path.abspath(output_filename))
+        self.entries(directory)[name] = record
+        self.modified.add(directory)
+
+    def save(self):
+        for directory in sorted(self.modified):
+            path = os.path.join(directory, BuildManifest.FILENAME)
+            data = {'format': BuildManifest.FORMAT_VERSION, 'outputs': self.directories[directory]}
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wt') as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+        self.modified.clear()
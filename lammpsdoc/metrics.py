@@ -0,0 +1,118 @@
+# LAMMPS Documentation Utilities
+#
+# Machine readable metrics of conversion runs
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import time
+
+
+def error_text(msg):
+    """ returns the message of an error report without its banner """
+    lines = [line.strip() for line in msg.splitlines() if line.strip() and not line.startswith('#')]
+    text = " ".join(lines)
+    if text.startswith("ERROR: "):
+        return text[len("ERROR: "):]
+    return text
+
+
+def file_size(filename):
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+class FileMetrics(object):
+    """ measures the conversion of a single file. The parsers used for it are tracked to read
+    their paragraph and table counts """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.parsers = []
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    def track(self, parser):
+        self.parsers.append(parser)
+
+    def finish(self, output_bytes, errors, read_time=0.0):
+        """ returns the record of the file once it was converted. read_time is the part of
+        the time spent reading the file """
+        wall_time = time.perf_counter() - self.wall_start
+        cpu_time = time.process_time() - self.cpu_start
+        parser = self.parsers[0] if self.parsers else None
+        return {'file': self.filename,
+                'input_bytes': file_size(self.filename),
+                'output_bytes': output_bytes,
+                'paragraphs': parser.paragraph_count if parser is not None else 0,
+                'tables': parser.table_count if parser is not None else 0,
+                'wall_time': wall_time,
+                'cpu_time': cpu_time,
+                'read_time': read_time,
+                'errors': [error_text(msg) for msg in errors]}
+
+
+class RunMetrics(object):
+    """ collects the records of all files of a conversion run and computes run totals """
+
+    def __init__(self):
+        self.files = []
+        self.current = None
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    def begin_file(self, filename):
+        self.current = FileMetrics(filename)
+        return self.current
+
+    def track(self, parser):
+        if self.current is not None:
+            self.current.track(parser)
+
+    def add(self, record):
+        self.files.append(record)
+
+    def totals(self):
+        wall_time = time.perf_counter() - self.wall_start
+        input_bytes = sum(record['input_bytes'] for record in self.files)
+        return {'files': len(self.files),
+                'failed_files': sum(1 for record in self.files if record['errors']),
+                'input_bytes': input_bytes,
+                'output_bytes': sum(record['output_bytes'] for record in self.files),
+                'paragraphs': sum(record['paragraphs'] for record in self.files),
+                'tables': sum(record['tables'] for record in self.files),
+                'wall_time': wall_time,
+                'cpu_time': time.process_time() - self.cpu_start,
+                'file_cpu_time': sum(record['cpu_time'] for record in self.files),
+                'read_time': sum(record['read_time'] for record in self.files),
+                'files_per_second': len(self.files) / wall_time if wall_time > 0 else 0.0,
+                'mb_per_second': input_bytes / 1e6 / wall_time if wall_time > 0 else 0.0}
+
+    def save(self, filename):
+        """ writes the metrics as JSON, or as JSON Lines with one record per file followed by the
+        run totals if filename ends with .jsonl """
+        totals = self.totals()
+
+        with open(filename, 'wt') as f:
+            if filename.endswith('.jsonl'):
+                for record in self.files:
+                    f.write(json.dumps(dict(record, type='file'), sort_keys=True) + "\n")
+                f.write(json.dumps(dict(totals, type='run'), sort_keys=True) + "\n")
+            else:
+                json.dump({'files': self.files, 'totals': totals}, f, indent=2, sort_keys=True)
@@ -0,0 +1,210 @@
+# LAMMPS Documentation Utilities
+#
+# Output buffer used to assemble converted documents
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+class OutputBuffer(object):
+    """ collects output fragments and joins them once, which keeps assembling
+    large outputs linear in their size """
+    __slots__ = ('fragments',)
+
+    def __init__(self):
+        self.fragments = []
+
+    def write(self, fragment):
+        self.fragments.append(fragment)
+
+    def writelines(self, fragments):
+        self.fragments.extend(fragments)
+
+    def getvalue(self):
+        return ''.join(self.fragments)
+
+
+LINE_SCOPE = 'line'
+BLOCK_SCOPE = 'block'
+DOCUMENT_SCOPE = 'document'
+
+
+class FilterSpec(object):
+    """ describes how a document filter can be applied to parts of the output.
+
+    - LINE_SCOPE filters only change text within lines and can be applied to any run of
+      complete lines
+    - BLOCK_SCOPE filters can be applied to runs of lines which begin at a line start for which
+      is_boundary(content, line_start) is true
+    - DOCUMENT_SCOPE filters see the whole output, unless stream creates a stream filter for them
+
+    A filter with markers leaves text which contains none of them unchanged and is skipped for it.
+    Consecutive line and block scoped filters are fused, so they must not turn a boundary line
+    into one which is no boundary for the filters after them """
+
+    def __init__(self, function, scope=DOCUMENT_SCOPE, markers=(), is_boundary=None, stream=None):
+        self.function = function
+        self.scope = scope
+        self.markers = markers
+        self.is_boundary = is_boundary
+        self.stream = stream
+
+    def applies_to(self, content):
+        if not self.markers:
+            return True
+        for marker in self.markers:
+            if marker in content:
+                return True
+        return False
+
+    def apply(self, content):
+        if self.applies_to(content):
+            return self.function(content)
+        return content
+
+    def is_fusable(self):
+        return self.scope in (LINE_SCOPE, BLOCK_SCOPE)
+
+    def create_stream_filter(self):
+        if self.stream is not None:
+            return self.stream()
+        if self.is_fusable():
+            return FusedFilter([self])
+        return BufferedFilter(self.apply)
+
+
+def create_filter_chain(document_filters, specs):
+    """ returns the stream filters which apply a list of document filters in order. specs maps
+    document filters to their FilterSpec, other filters see the whole output """
+    chain = []
+    fused = []
+
+    for doc_filter in document_filters:
+        spec = specs.get(doc_filter) or FilterSpec(doc_filter)
+        if spec.is_fusable():
+            fused.append(spec)
+            continue
+        if fused:
+            chain.append(FusedFilter(fused))
+            fused = []
+        chain.append(spec.create_stream_filter())
+
+    if fused:
+        chain.append(FusedFilter(fused))
+    return chain
+
+
+class BufferedFilter(object):
+    """ applies a document filter to the whole output once it is complete """
+
+    def __init__(self, function):
+        self.function = function
+        self.buffer = OutputBuffer()
+
+    def feed(self, text):
+        self.buffer.write(text)
+        return ""
+
+    def finish(self):
+        return self.function(self.buffer.getvalue())
+
+
+class FusedFilter(object):
+    """ applies a group of line and block scoped filters in a single pass over the output.
+
+    Text is passed on in windows which end at a line start that is a boundary for every block
+    scoped filter. Filters whose markers do not occur in a window are skipped for it """
+    window_size = 65536
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.boundaries = [spec.is_boundary for spec in specs if spec.scope == BLOCK_SCOPE]
+        self.pending = ""
+        self.searched = 0
+
+    def is_boundary(self, content, line_start):
+        if self.boundaries and line_start >= len(content):
+            return False
+        for is_boundary in self.boundaries:
+            if not is_boundary(content, line_start):
+                return False
+        return True
+
+    def split(self, content, start, end):
+        """ returns the last boundary after start and not after end or -1 """
+        while end > start:
+            line_start = content.rfind('\n', start, end) + 1
+            if line_start <= 0:
+                return -1
+            if self.is_boundary(content, line_start):
+                return line_start
+            end = line_start - 1
+        return -1
+
+    def apply(self, content):
+        for spec in self.specs:
+            content = spec.apply(content)
+        return content
+
+    def feed(self, text):
+        pending = self.pending + text
+        out = OutputBuffer()
+        pos = 0
+
+        while len(pending) - pos > self.window_size:
+            index = self.split(pending, pos, pos + self.window_size)
+            if index < 0:
+                break
+            out.write(self.apply(pending[pos:index]))
+            pos = index
+
+        # line starts before the last line of the previous call were no boundaries
+        index = self.split(pending, max(pos, self.searched), len(pending))
+        if index > 0:
+            out.write(self.apply(pending[pos:index]))
+            pos = index
+
+        self.pending = pending[pos:]
+        self.searched = max(0, self.pending.rfind('\n'))
+        return out.getvalue()
+
+    def finish(self):
+        done = self.pending
+        self.pending = ""
+        self.searched = 0
+        return self.apply(done)
+
+
+class FilteredWriter(object):
+    """ writes output through a chain of stream filters """
+
+    def __init__(self, outfile, filters):
+        self.outfile = outfile
+        self.filters = filters
+
+    def write(self, text):
+        for stream_filter in self.filters:
+            if not text:
+                return
+            text = stream_filter.feed(text)
+        if text:
+            self.outfile.write(text)
+
+    def close(self):
+        text = ""
+        for stream_filter in self.filters:
+            text = stream_filter.feed(text) + stream_filter.finish()
+        if text:
+            self.outfile.write(text)
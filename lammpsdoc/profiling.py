@@ -0,0 +1,201 @@
+# LAMMPS Documentation Utilities
+#
+# Per-stage profiling of conversions
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import pstats
+import cProfile
+import functools
+from lammpsdoc.output import FilterSpec
+from lammpsdoc.document import command_name
+
+
+def filter_name(doc_filter):
+    return getattr(doc_filter, '__name__', type(doc_filter).__name__)
+
+
+class Profile(object):
+    """ cumulative wall time and number of calls of the stages of conversions, the time of
+    each converted file and optionally merged cProfile statistics.
+
+    Stages are timed inclusively, a formatting command which converts markup also counts the
+    time of the markup stage """
+
+    def __init__(self, collect_stats=False):
+        self.collect_stats = collect_stats
+        self.stages = {}
+        self.files = []
+        self.stats = {}
+
+    def fork(self):
+        """ returns an empty profile with the same settings, e.g. for a worker process """
+        return Profile(self.collect_stats)
+
+    def add(self, stage, seconds, calls=1):
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [seconds, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += calls
+
+    def timed(self, stage, function):
+        """ returns a function which adds the time of each call of function to stage """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return wrapper
+
+    def timed_generator(self, stage, function):
+        """ like timed() for generator functions. Only the time spent producing items is added,
+        not the time the consumer spends in between """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            iterator = iter(function(*args, **kwargs))
+            elapsed = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        elapsed += time.perf_counter() - start
+                        return
+                    elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                self.add(stage, elapsed)
+        return wrapper
+
+    def instrument(self, parser):
+        """ makes a TxtParser record the time of paragraph segmentation, markup, each formatting
+        command, each paragraph filter and each document filter in this profile """
+        parser.parse = self.timed('paragraphs', parser.parse)
+        parser.stream_paragraphs = self.timed_generator('paragraphs', parser.stream_paragraphs)
+        parser.markup.convert = self.timed('markup', parser.markup.convert)
+
+        compile_command = parser.format.compile_command
+
+        def compile_timed_command(command, commands):
+            return self.timed('format ' + command_name(command), compile_command(command, commands))
+
+        parser.format.compile_command = compile_timed_command
+        parser.paragraph_filters = [self.timed('paragraph filter ' + filter_name(f), f)
+                                    for f in parser.paragraph_filters]
+
+        specs = {}
+        for doc_filter in parser.document_filters:
+            spec = parser.filter_specs.get(doc_filter) or FilterSpec(doc_filter)
+            stage = 'document filter ' + filter_name(doc_filter)
+            stream = None
+            if spec.stream is not None:
+                stream = functools.partial(TimedStreamFilter, self, stage, spec.stream)
+            specs[doc_filter] = FilterSpec(self.timed(stage, spec.function), spec.scope, spec.markers,
+                                           spec.is_boundary, stream)
+        parser.filter_specs = specs
+        return parser
+
+    def measure_file(self, filename, function):
+        """ calls function to convert a file and records its wall time and, if enabled, its
+        cProfile statistics """
+        profiler = cProfile.Profile() if self.collect_stats else None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            return function()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.create_stats()
+                self.add_stats(profiler.stats)
+            self.files.append((time.perf_counter() - start, filename))
+
+    def add_stats(self, stats):
+        for function, entry in stats.items():
+            if function in self.stats:
+                self.stats[function] = pstats.add_func_stats(self.stats[function], entry)
+            else:
+                self.stats[function] = entry
+
+    def merge(self, other):
+        for stage, (seconds, calls) in other.stages.items():
+            self.add(stage, seconds, calls)
+        self.files.extend(other.files)
+        self.add_stats(other.stats)
+
+    def total_time(self):
+        return sum(seconds for seconds, filename in self.files)
+
+    def report(self, out, limit=10):
+        """ prints the stages sorted by their cumulative time and the slowest files """
+        total = self.total_time()
+        print("Profile of %d files, %.1f ms" % (len(self.files), total * 1000), file=out)
+        print("%-60s %8s %12s %12s %6s" % ('stage', 'calls', 'total ms', 'ms/call', '%'), file=out)
+
+        for stage, (seconds, calls) in sorted(self.stages.items(), key=lambda item: (-item[1][0], item[0])):
+            per_call = seconds / calls if calls else 0.0
+            share = 100.0 * seconds / total if total > 0 else 0.0
+            print("%-60s %8d %12.2f %12.4f %6.1f" % (stage, calls, seconds * 1000, per_call * 1000, share),
+                  file=out)
+
+        if self.files:
+            print("Slowest files:", file=out)
+            for seconds, filename in sorted(self.files, key=lambda item: -item[0])[:limit]:
+                print("%12.2f ms  %s" % (seconds * 1000, filename), file=out)
+
+    def dump_stats(self, filename):
+        """ writes the merged cProfile statistics in the format read by pstats """
+        pstats.Stats(StatsSnapshot(dict(self.stats))).dump_stats(filename)
+
+
+class StatsSnapshot(object):
+    """ cProfile statistics which were collected elsewhere, in the form pstats.Stats loads """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class TimedStreamFilter(object):
+    """ adds the time a stream filter spends on a document to a stage of a profile """
+
+    def __init__(self, profile, stage, create_filter):
+        self.profile = profile
+        self.stage = stage
+        self.stream_filter = create_filter()
+
+    def feed(self, text):
+        start = time.perf_counter()
+        try:
+            return self.stream_filter.feed(text)
+        finally:
+            self.profile.add(self.stage, time.perf_counter() - start, calls=0)
+
+    def finish(self):
+        start = time.perf_counter()
+        try:
+            return self.stream_filter.finish()
+        finally:
+            self.profile.add(self.stage, time.perf_counter() - start)
@@ -0,0 +1,178 @@
+# LAMMPS Documentation Utilities
+#
+# Reading of input files for batch conversions
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import io
+import time
+import mmap
+import locale
+
+# larger files are memory-mapped instead of being read into the buffer of the reader
+MMAP_THRESHOLD = 1 << 20
+
+
+def translate_newlines(text):
+    """ converts \\r\\n and \\r line breaks to \\n like reading a file in text mode """
+    if '\r' not in text:
+        return text
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def input_encoding(encoding=None):
+    """ the encoding input files are decoded with, by default the encoding of the locale """
+    return encoding or locale.getpreferredencoding(False)
+
+
+def advise(fd, advice):
+    """ passes advice like 'POSIX_FADV_SEQUENTIAL' about the access pattern of a file to the
+    kernel, where supported """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+    except OSError:
+        pass
+
+
+class InputReader(object):
+    """ reads input files as bytes and decodes them with an explicit encoding.
+
+    Small files are read into a buffer which is reused for all files, large files are
+    memory-mapped, both are decoded without copying them to a bytes object first. Line breaks
+    are translated like in text mode. With fadvise, the kernel is told that files are read
+    sequentially and can be asked to prefetch the next file of a batch.
+
+    The time spent reading and decoding is added up per file in read_times """
+
+    def __init__(self, encoding=None, fadvise=False, mmap_threshold=MMAP_THRESHOLD):
+        self.encoding = input_encoding(encoding)
+        self.fadvise = fadvise
+        self.mmap_threshold = mmap_threshold
+        self.buffer = bytearray()
+        self.read_times = {}
+
+    def __getstate__(self):
+        # worker processes start with an empty buffer
+        state = dict(self.__dict__)
+        state['buffer'] = bytearray()
+        state['read_times'] = {}
+        return state
+
+    def add_read_time(self, filename, seconds):
+        self.read_times[filename] = self.read_times.get(filename, 0.0) + seconds
+
+    def pop_read_time(self, filename):
+        """ returns and forgets the time spent reading a file """
+        return self.read_times.pop(filename, 0.0)
+
+    def read(self, filename):
+        """ returns the decoded content of a file """
+        start = time.perf_counter()
+        try:
+            with open(filename, 'rb', buffering=0) as f:
+                if self.fadvise:
+                    advise(f.fileno(), 'POSIX_FADV_SEQUENTIAL')
+
+                size = os.fstat(f.fileno()).st_size
+                if size >= self.mmap_threshold:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        return translate_newlines(str(data, self.encoding))
+                return translate_newlines(self.read_buffered(f, size))
+        finally:
+            self.add_read_time(filename, time.perf_counter() - start)
+
+    def read_buffered(self, f, size):
+        """ reads a file into the buffer of the reader, which grows to the largest file read so
+        far, and decodes it """
+        if len(self.buffer) <= size:
+            self.buffer = bytearray(size + 1)
+
+        total = 0
+        while True:
+            with memoryview(self.buffer) as view:
+                count = f.readinto(view[total:])
+            if not count:
+                break
+            total += count
+            if total == len(self.buffer):
+                # the file grew since its size was read
+                self.buffer = self.buffer + bytearray(len(self.buffer))
+
+        with memoryview(self.buffer) as view, view[:total] as data:
+            return str(data, self.encoding)
+
+    def open(self, filename):
+        """ returns a seekable text file object of a file. Small files are read at once, large
+        files are read while they are converted """
+        if os.path.getsize(filename) < self.mmap_threshold:
+            return io.StringIO(self.read(filename))
+
+        start = time.perf_counter()
+        f = open(filename, 'rb')
+        if self.fadvise:
+            advise(f.fileno(), 'POSIX_FADV_SEQUENTIAL')
+        self.add_read_time(filename, time.perf_counter() - start)
+        return TimedTextFile(self, filename, io.TextIOWrapper(f, encoding=self.encoding))
+
+    def prefetch(self, filename):
+        """ asks the kernel to start reading a file which will be converted soon """
+        if not self.fadvise or not hasattr(os, 'posix_fadvise'):
+            return
+        try:
+            fd = os.open(filename, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            advise(fd, 'POSIX_FADV_WILLNEED')
+        finally:
+            os.close(fd)
+
+
+class TimedTextFile(object):
+    """ a text file object which adds the time spent in read() to the read time of its file """
+
+    def __init__(self, reader, filename, f):
+        self.reader = reader
+        self.filename = filename
+        self.f = f
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        try:
+            return self.f.read(size)
+        finally:
+            self.reader.add_read_time(self.filename, time.perf_counter() - start)
+
+    def seekable(self):
+        return self.f.seekable()
+
+    def seek(self, offset, whence=0):
+        return self.f.seek(offset, whence)
+
+    def tell(self):
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
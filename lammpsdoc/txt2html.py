@@ -24,6 +24,20 @@ import os
 import re
 import sys
 import argparse
+import multiprocessing
+import time
+import shutil
+import functools
+import tempfile
+import copy
+from lammpsdoc.document import Document, Paragraph, ParagraphSegmenter, CommandCache, format_string, parse_commands, \
+    command_name, iter_lines, named_link_pattern, define_link_alias_pattern
+from lammpsdoc.output import OutputBuffer, FilteredWriter, create_filter_chain
+from lammpsdoc.manifest import BuildManifest, content_hash
+from lammpsdoc.watch import FileWatcher
+from lammpsdoc.profiling import Profile
+from lammpsdoc.metrics import RunMetrics, file_size
+from lammpsdoc.reader import InputReader, input_encoding
 
 
 class Markup(object):
@@ -36,10 +50,13 @@ class Markup(object):
     PUNCTUATION_CHARACTERS = '.,;:?!()'
 
     def __init__(self):
-        link_regex = r"(?P<text>[^\"]+)\"_(?P<link>[^\s\t\n]+)"
+        link_regex = r"\"(?P<text>[^\"]+)\"_(?P<link>[^\s\t\n]+)"
         self.link_pattern = re.compile(link_regex)
         self.aliases = {}
+        self.alias_definitions = []
         self.references = set()
+        self.unresolved_links = set()
+        self.link_table = None
 
     def convert(self, text):
         text = self.bold(text)
@@ -49,10 +66,34 @@ class Markup(object):
 
     def add_link_alias(self, name, href):
         self.aliases[name] = href
+        self.alias_definitions.append((name, href))
 
     def add_internal_reference(self, name):
         self.references.add(name)
 
+    def has_link_alias(self, name):
+        if name in self.aliases:
+            return True
+        self.unresolved_links.add(name)
+        return False
+
+    def has_internal_reference(self, name):
+        if name in self.references:
+            return True
+        self.unresolved_links.add(name)
+        return False
+
+    def is_link_target(self, name):
+        return name in self.aliases or name in self.references
+
+    def aliases_at(self, num_definitions):
+        """ aliases as seen after the first num_definitions alias definitions, with
+        names that are only defined later taking their final value """
+        aliases = dict(self.aliases)
+        for name, href in self.alias_definitions[:num_definitions]:
+            aliases[name] = href
+        return aliases
+
     def bold(self, text):
         text = text.replace("\\" + Markup.BOLD_START, Markup.START_PLACEHOLDER)
         text = text.replace("\\" + Markup.BOLD_END, Markup.END_PLACEHOLDER)
@@ -72,11 +113,13 @@ class Markup(object):
         return text
 
     def link(self, text):
-        for name, link in self.link_pattern.findall(text):
-            link = link.rstrip(Markup.PUNCTUATION_CHARACTERS)
-            href = self.create_link(name, link)
-            text = text.replace('\"%s\"_%s' % (name, link), href, 1)
-        return text
+        return self.link_pattern.sub(self.resolve_link, text)
+
+    def resolve_link(self, m):
+        """ replaces a single "text"_link match. Trailing punctuation is not part of the link """
+        target = m.group('link')
+        link = target.rstrip(Markup.PUNCTUATION_CHARACTERS)
+        return self.create_link(m.group('text'), link) + target[len(link):]
 
 
 class HTMLMarkup(Markup):
@@ -96,7 +139,7 @@ class HTMLMarkup(Markup):
         return "</I>"
 
     def create_link(self, content, link):
-        if link in self.aliases:
+        if self.has_link_alias(link):
             href = self.aliases[link]
         else:
             href = link
@@ -107,89 +150,136 @@ class HTMLMarkup(Markup):
 class Formatting(object):
     UNORDERED_LIST_MODE = "unordered-list"
     ORDERED_LIST_MODE = "ordered-list"
+    ALIGNMENTS = {'l': 'left', 'c': 'center', 'r' : 'right'}
+    VERTICAL_ALIGNMENTS = {'t': 'top', 'm': 'middle', 'ba' : 'baseline', 'bo': 'bottom'}
 
     def __init__(self, markup):
         image_regex = r"^image\((?P<file>[^\,]+)(,(?P<link>[^\,]+))?\)"
-        named_link_regex = r"^link\((?P<name>[^\,]+)\)"
-        define_link_alias_regex = r"^link\((?P<alias>[^\,]+),(?P<value>[^\,]+)\)"
         self.image_pattern = re.compile(image_regex)
-        self.named_link_pattern = re.compile(named_link_regex)
-        self.define_link_alias_pattern = re.compile(define_link_alias_regex)
+        self.named_link_pattern = named_link_pattern
+        self.define_link_alias_pattern = define_link_alias_pattern
+        self.table_pattern = re.compile(r"^tb\((?P<configuration>.+)\)")
         self.markup = markup
         self.first_header = ""
         self.current_list_mode = Formatting.UNORDERED_LIST_MODE
         self.current_command_list = []
 
+    def get_state(self):
+        return self.current_list_mode
+
+    def set_state(self, state):
+        self.current_list_mode = state
+
+    # commands which call a method with the paragraph as only argument
+    COMMANDS = {
+        "p": "paragraph",
+        "b": "linebreak",
+        "pre": "preformat",
+        "c": "center",
+        "ul": "unordered_list",
+        "ol": "ordered_list",
+        "dl": "definition_list",
+        "dt": "definition_term",
+        "dd": "definition_description",
+        "ule": "unordered_list_end",
+        "dlb": "definition_list_begin",
+        "dle": "definition_list_end",
+        "all(p)": "all_paragraphs",
+        "all(c)": "all_centered",
+        "all(b)": "all_breaks",
+        "all(l)": "all_list_items",
+        "line": "horizontal_rule",
+    }
+
+    # commands whose handler is created by a compile method from the command and its command list
+    COMMAND_COMPILERS = {
+        "h1": "compile_header",
+        "h2": "compile_header",
+        "h3": "compile_header",
+        "h4": "compile_header",
+        "h5": "compile_header",
+        "h6": "compile_header",
+        "l": "compile_list_command",
+        "ulb": "compile_list_command",
+        "olb": "compile_list_command",
+        "ole": "compile_list_command",
+    }
+
+    # commands with arguments, matched by their prefix
+    PREFIX_COMMANDS = (
+        ("image", "compile_image"),
+        ("link", "compile_link"),
+        ("tb", "compile_table"),
+    )
+
+    @classmethod
+    def register_command(cls, command, method_name):
+        """ lets a subclass handle a command with one of its methods """
+        if 'COMMANDS' not in cls.__dict__:
+            cls.COMMANDS = dict(cls.COMMANDS)
+        cls.COMMANDS[command] = method_name
+
     def convert(self, command, paragraph, commands):
         self.current_command_list = commands
-        if command == "p":
-            return self.paragraph(paragraph)
-        elif command == "b":
-            return self.linebreak(paragraph)
-        elif command == "pre":
-            return self.preformat(paragraph)
-        elif command == "c":
-            return self.center(paragraph)
-        elif command == "h1" or command == "h2" or command == "h3" or \
-                        command == "h4" or command == "h5" or command == "h6":
-            level = int(command[1])
-            return self.header(paragraph, level)
-        elif command == "ul":
-            return self.unordered_list(paragraph)
-        elif command == "ol":
-            return self.ordered_list(paragraph)
-        elif command == "dl":
-            return self.definition_list(paragraph)
-        elif command == "l":
+        return self.compile_command(command, commands)(paragraph)
+
+    def compile_command(self, command, commands):
+        """ returns a function which applies a single formatting command to a paragraph """
+        if command in self.COMMANDS:
+            return getattr(self, self.COMMANDS[command])
+        if command in self.COMMAND_COMPILERS:
+            return getattr(self, self.COMMAND_COMPILERS[command])(command, commands)
+        for prefix, compiler in self.PREFIX_COMMANDS:
+            if command.startswith(prefix):
+                return getattr(self, compiler)(command, commands)
+        return self.ignore
+
+    def ignore(self, paragraph):
+        return ""
+
+    def compile_header(self, command, commands):
+        return functools.partial(self.header, level=int(command[1]))
+
+    def compile_list_command(self, command, commands):
+        if command == "l":
+            handler = self.list_item
             if "olb" in commands:
-              self.current_list_mode = Formatting.ORDERED_LIST_MODE
+                mode = Formatting.ORDERED_LIST_MODE
             elif "ulb" in commands:
-              self.current_list_mode = Formatting.UNORDERED_LIST_MODE
-
-            return self.list_item(paragraph)
-        elif command == "dt":
-            return self.definition_term(paragraph)
-        elif command == "dd":
-            return self.definition_description(paragraph)
+                mode = Formatting.UNORDERED_LIST_MODE
+            else:
+                return handler
         elif command == "ulb":
-            self.current_list_mode = Formatting.UNORDERED_LIST_MODE
-            return self.unordered_list_begin(paragraph)
-        elif command == "ule":
-            return self.unordered_list_end(paragraph)
+            handler = self.unordered_list_begin
+            mode = Formatting.UNORDERED_LIST_MODE
         elif command == "olb":
-            self.current_list_mode = Formatting.ORDERED_LIST_MODE
-            return self.ordered_list_begin(paragraph)
-        elif command == "ole":
-            self.current_list_mode = Formatting.UNORDERED_LIST_MODE
-            return self.ordered_list_end(paragraph)
-        elif command == "dlb":
-            return self.definition_list_begin(paragraph)
-        elif command == "dle":
-            return self.definition_list_end(paragraph)
-        elif command == "all(p)":
-            return self.all_paragraphs(paragraph)
-        elif command == "all(c)":
-            return self.all_centered(paragraph)
-        elif command == "all(b)":
-            return self.all_breaks(paragraph)
-        elif command == "all(l)":
-            return self.all_list_items(paragraph)
-        elif command == "line":
-            return self.horizontal_rule(paragraph)
-        elif command.startswith("image"):
-            m = self.image_pattern.match(command)
-            return self.image(paragraph, file=m.group('file'), link=m.group('link'))
-        elif command.startswith("link"):
-            m = self.named_link_pattern.match(command)
-            if m:
-                return self.named_link(paragraph, name=m.group('name'))
-            m2 = self.define_link_alias_pattern.match(command)
-            if m2:
-                return self.define_link_alias(paragraph, alias=m2.group('alias'), value=m2.group('value'))
-        elif command.startswith("tb"):
-            configuration = self.get_table_configuration(command)
-            return self.table(paragraph, configuration)
-        return ""
+            handler = self.ordered_list_begin
+            mode = Formatting.ORDERED_LIST_MODE
+        else:
+            handler = self.ordered_list_end
+            mode = Formatting.UNORDERED_LIST_MODE
+
+        def set_list_mode(paragraph):
+            self.current_list_mode = mode
+            return handler(paragraph)
+
+        return set_list_mode
+
+    def compile_image(self, command, commands):
+        m = self.image_pattern.match(command)
+        return functools.partial(self.image, file=m.group('file'), link=m.group('link'))
+
+    def compile_link(self, command, commands):
+        m = self.named_link_pattern.match(command)
+        if m:
+            return functools.partial(self.named_link, name=m.group('name'))
+        m = self.define_link_alias_pattern.match(command)
+        if m:
+            return functools.partial(self.define_link_alias, alias=m.group('alias'), value=m.group('value'))
+        return self.ignore
+
+    def compile_table(self, command, commands):
+        return functools.partial(self.table, configuration=self.get_table_configuration(command))
 
     def math(self, paragraph):
         return self.paragraph(paragraph) + "\n"
@@ -212,29 +302,32 @@ class Formatting(object):
         return "<H%d>%s</H%d>" % (level, paragraph, level)
 
     def unordered_list(self, paragraph):
-        converted = self.unordered_list_begin("")
+        out = OutputBuffer()
+        out.write(self.unordered_list_begin(""))
         for line in paragraph.splitlines():
-            converted += self.unordered_list_item(line) + "\n"
-        return self.unordered_list_end(converted)
+            out.write(self.unordered_list_item(line) + "\n")
+        return self.unordered_list_end(out.getvalue())
 
     def ordered_list(self, paragraph):
-        converted = self.ordered_list_begin("")
+        out = OutputBuffer()
+        out.write(self.ordered_list_begin(""))
         for index, line in enumerate(paragraph.splitlines()):
-            converted += self.ordered_list_item(line, index+1) + "\n"
-        return self.ordered_list_end(converted)
+            out.write(self.ordered_list_item(line, index+1) + "\n")
+        return self.ordered_list_end(out.getvalue())
 
     def definition_list(self, paragraph):
-        converted = self.definition_list_begin("")
+        out = OutputBuffer()
+        out.write(self.definition_list_begin(""))
         is_title = True
         for line in paragraph.splitlines():
             if is_title:
-                converted += self.definition_term(line) + "\n"
+                out.write(self.definition_term(line) + "\n")
             else:
-                converted += self.definition_description(line) + "\n"
+                out.write(self.definition_description(line) + "\n")
 
             is_title = not is_title
 
-        return self.definition_list_end(converted)
+        return self.definition_list_end(out.getvalue())
 
     def list_item(self, paragraph, index=None):
         if self.current_list_mode == Formatting.ORDERED_LIST_MODE:
@@ -272,25 +365,25 @@ class Formatting(object):
         return paragraph + "</DL>"
 
     def all_paragraphs(self, paragraph):
-        converted = ""
+        out = OutputBuffer()
         for line in paragraph.splitlines():
-            converted += self.paragraph(line) + "\n"
-        return converted
+            out.write(self.paragraph(line) + "\n")
+        return out.getvalue()
 
     def all_centered(self, paragraph):
-        converted = ""
+        out = OutputBuffer()
         for line in paragraph.splitlines():
-            converted += self.center(line) + "\n"
-        return converted
+            out.write(self.center(line) + "\n")
+        return out.getvalue()
 
     def all_breaks(self, paragraph):
         return paragraph.replace("\n", "<BR>\n")
 
     def all_list_items(self, paragraph):
-        converted = ""
+        out = OutputBuffer()
         for line in paragraph.splitlines():
-            converted += self.list_item(line) + "\n"
-        return converted
+            out.write(self.list_item(line) + "\n")
+        return out.getvalue()
 
     def horizontal_rule(self, paragraph):
         return "<HR>" + paragraph
@@ -316,14 +409,11 @@ class Formatting(object):
             'table_alignment': 'center'
         }
 
-        table_regex = r"^tb\((?P<configuration>.+)\)"
-        table_pattern = re.compile(table_regex)
-
-        m = table_pattern.match(command)
+        m = self.table_pattern.match(command)
         if m:
             entries = m.groups('configuration')[0].split(',')
-            alignments = {'l': 'left', 'c': 'center', 'r' : 'right'}
-            vertical_alignments = {'t': 'top', 'm': 'middle', 'ba' : 'baseline', 'bo': 'bottom'}
+            alignments = Formatting.ALIGNMENTS
+            vertical_alignments = Formatting.VERTICAL_ALIGNMENTS
 
             for entry in entries:
                 lhs, rhs = entry.split('=')
@@ -365,54 +455,63 @@ class Formatting(object):
             rows = self.create_table_with_fixed_number_of_columns(paragraph, configuration['separator'],
                                                                   configuration['num_columns'])
 
-        tbl = "<DIV ALIGN=%s>" % configuration['table_alignment']
-        tbl += "<TABLE  "
+        out = OutputBuffer()
+        write = out.write
+        write("<DIV ALIGN=%s>" % configuration['table_alignment'])
+        write("<TABLE  ")
 
         if 'table_width' in configuration:
-            tbl += "WIDTH=\"%s\" " % configuration['table_width']
-
-        tbl += "BORDER=%d >\n" % configuration['border_width']
+            write("WIDTH=\"%s\" " % configuration['table_width'])
 
-        for row_idx in range(len(rows)):
-            columns = rows[row_idx]
-            tbl += "<TR"
+        write("BORDER=%d >\n" % configuration['border_width'])
 
-            if 'cell_alignment' in configuration:
-                tbl += " ALIGN=\"%s\"" % configuration['cell_alignment']
+        row_start = "<TR"
 
-            if 'cell_vertical_alignment' in configuration:
-                tbl += " VALIGN =\"%s\"" % configuration['cell_vertical_alignment']
+        if 'cell_alignment' in configuration:
+            row_start += " ALIGN=\"%s\"" % configuration['cell_alignment']
 
-            tbl += ">"
+        if 'cell_vertical_alignment' in configuration:
+            row_start += " VALIGN =\"%s\"" % configuration['cell_vertical_alignment']
 
-            for col_idx in range(len(columns)):
-                col = columns[col_idx]
-                tbl += "<TD "
+        row_start += ">"
+        cell_starts = []
 
-                if 'custom_cell_width' in configuration:
-                    if col_idx in configuration['custom_cell_width']:
-                        tbl += "WIDTH=\"%s\"" % configuration['custom_cell_width'][col_idx]
-                else:
-                    if 'cell_width' in configuration:
-                        tbl += "WIDTH=\"%s\"" % configuration['cell_width']
+        for row_idx, columns in enumerate(rows):
+            write(row_start)
 
-                if 'custom_cell_alignment' in configuration:
-                    if col_idx in configuration['custom_cell_alignment']:
-                        tbl += " ALIGN =\"%s\"" % configuration['custom_cell_alignment'][col_idx]
+            while len(cell_starts) < len(columns):
+                cell_starts.append(self.table_cell_start(configuration, len(cell_starts)))
 
-                tbl += ">"
-                tbl += col
+            for col_idx, col in enumerate(columns):
+                write(cell_starts[col_idx])
+                write(col)
 
-                if row_idx < len(rows) and col_idx < len(columns) - 1:
-                    tbl += "</TD>"
+                if col_idx < len(columns) - 1:
+                    write("</TD>")
 
             if row_idx < len(rows) - 1:
-                tbl += "</TD></TR>\n"
+                write("</TD></TR>\n")
+
+        write("\n")
+        write("</TD></TR>")
+        write("</TABLE></DIV>\n")
+        return out.getvalue()
+
+    def table_cell_start(self, configuration, col_idx):
+        cell = "<TD "
+
+        if 'custom_cell_width' in configuration:
+            if col_idx in configuration['custom_cell_width']:
+                cell += "WIDTH=\"%s\"" % configuration['custom_cell_width'][col_idx]
+        else:
+            if 'cell_width' in configuration:
+                cell += "WIDTH=\"%s\"" % configuration['cell_width']
 
-        tbl += "\n"
-        tbl += "</TD></TR>"
-        tbl += "</TABLE></DIV>\n"
-        return tbl
+        if 'custom_cell_alignment' in configuration:
+            if col_idx in configuration['custom_cell_alignment']:
+                cell += " ALIGN =\"%s\"" % configuration['custom_cell_alignment'][col_idx]
+
+        return cell + ">"
 
     def create_table_with_columns_based_on_newlines(self, paragraph, separator):
         rows = []
@@ -457,63 +556,264 @@ class TxtParser(object):
     def __init__(self):
         self.markup = HTMLMarkup()
         self.format = HTMLFormatting(self.markup)
+        self.command_cache = CommandCache()
         self.append_page_break = False
         self.create_title = False
         self.page_title = ""
         self.paragraph_filters = []
         self.document_filters = []
+        self.filter_specs = {}
+        self.paragraph_count = 0
+        self.table_count = 0
 
     def convert(self, content):
-        converted = self.format.begin_document()
+        return self.render(self.parse(content))
+
+    def parse(self, content):
+        return Document.parse(content, [self])
 
-        if len(content) > 0:
-            self.parse_link_aliases_and_find_title(content)
+    def render(self, document, target=0):
+        """ converts the paragraphs of a parsed document which belong to the given target index """
+        out = OutputBuffer()
+        out.write(self.format.begin_document())
+
+        if not document.is_empty():
+            body = self.transform_paragraphs(document.target_paragraphs(target))
+            self.page_title = self.format.first_header
 
             if self.create_title and self.page_title != "":
-                converted += "<HEAD>\n"
-                converted += "<TITLE>%s</TITLE>\n" % self.page_title
-                converted += "</HEAD>\n"
+                out.write(self.title_head(self.page_title))
 
-            converted += self.transform_paragraphs(content)
+            out.write(body)
 
         if self.append_page_break:
-            converted += "<!-- PAGE BREAK -->\n"
+            out.write("<!-- PAGE BREAK -->\n")
+
+        out.write(self.format.end_document())
+        return self.filter_document(out.getvalue())
+
+    def filter_document(self, content):
+        """ applies the document filters to a converted document """
+        if not self.document_filters:
+            return content
+        out = OutputBuffer()
+        writer = FilteredWriter(out, self.create_stream_filters())
+        writer.write(content)
+        writer.close()
+        return out.getvalue()
+
+    def title_head(self, title):
+        return "<HEAD>\n<TITLE>%s</TITLE>\n</HEAD>\n" % title
+
+    def convert_stream(self, infile, outfile):
+        """ converts the text read from infile and writes the result to outfile paragraph by
+        paragraph. The input is read twice, first to collect all link targets, so that memory
+        use depends on the largest paragraph instead of the size of the file """
+        if not infile.seekable():
+            spooled = tempfile.TemporaryFile('w+t')
+            shutil.copyfileobj(infile, spooled)
+            spooled.seek(0)
+            infile = spooled
+
+        start = infile.tell()
+        aliases, references = self.collect_link_targets(self.stream_paragraphs(infile))
+        infile.seek(start)
+
+        writer = FilteredWriter(outfile, self.create_stream_filters())
+        writer.write(self.format.begin_document())
+
+        # the page title is the first header as converted with the link targets defined before
+        # it. Until it is known, paragraphs are held back and converted like in render()
+        held = [] if self.create_title else None
+        unresolved = []
+
+        if held is None:
+            self.add_link_targets(aliases, references)
+
+        for paragraph in self.stream_paragraphs(infile):
+            if held is None:
+                self.count_paragraph(paragraph)
+                if paragraph.is_raw:
+                    writer.write(paragraph.text)
+                else:
+                    self.markup.unresolved_links = set()
+                    writer.write(self.transform_paragraph(paragraph))
+                continue
+
+            self.append_paragraph(paragraph, held, unresolved)
 
-        converted += self.format.end_document()
+            if self.format.first_header != "":
+                self.write_held_paragraphs(writer, held, unresolved, aliases, references)
+                held = None
 
-        for doc_filter in self.document_filters:
-            converted = doc_filter(converted)
+        self.markup.unresolved_links = set()
 
-        return converted
+        if held is not None:
+            self.write_held_paragraphs(writer, held, unresolved, aliases, references)
 
-    def parse_link_aliases_and_find_title(self, content):
-        for paragraph, is_raw in self.paragraphs(content):
-            if not is_raw:
-                self.convert_paragraph(paragraph)
+        self.finish_paragraphs()
         self.page_title = self.format.first_header
 
-    def transform_paragraphs(self, content):
-        converted = ""
-        for paragraph, is_raw in self.paragraphs(content):
-            if is_raw:
-                converted += paragraph
-            else:
-                converted_paragraph = self.convert_paragraph(paragraph)
-                for paragraph_filter in self.paragraph_filters:
-                    converted_paragraph = paragraph_filter(converted_paragraph)
-                converted += converted_paragraph
-        return converted
+        if self.append_page_break:
+            writer.write("<!-- PAGE BREAK -->\n")
+
+        writer.write(self.format.end_document())
+        writer.close()
+
+    def write_held_paragraphs(self, writer, held, unresolved, aliases, references):
+        title = self.format.first_header
+
+        if unresolved:
+            # held paragraphs are resolved against the final alias values
+            current_aliases = self.markup.aliases
+            self.markup.aliases = dict(current_aliases)
+            self.markup.aliases.update(aliases)
+            self.markup.references.update(references)
+            self.resolve_forward_links(held, unresolved)
+            self.markup.aliases = current_aliases
+
+        self.add_link_targets(aliases, references)
+
+        if title != "":
+            writer.write(self.title_head(title))
+
+        for converted in held:
+            writer.write(converted)
+
+    def stream_paragraphs(self, infile):
+        """ reads the paragraphs of a file object one at a time """
+        segmenter = ParagraphSegmenter(self)
+
+        for line in self.lines(infile):
+            paragraph = segmenter.feed(line)
+            if paragraph is not None:
+                yield Paragraph(paragraph[0], paragraph[1], 1)
+
+        paragraph = segmenter.finish()
+        if paragraph is not None:
+            yield Paragraph(paragraph[0], paragraph[1], 1)
+
+    def collect_link_targets(self, paragraphs):
+        """ returns the final link alias values and the anchors of all paragraphs """
+        aliases = {}
+        references = set()
+
+        for names, link_aliases in self.link_definitions(paragraphs):
+            references.update(names)
+            aliases.update(link_aliases)
+
+        return aliases, references
+
+    def link_definitions(self, paragraphs):
+        """ yields the anchor names and the (alias, value) pairs defined by the formatting commands
+        of each paragraph which is converted with them """
+        for paragraph in paragraphs:
+            if paragraph.is_raw or not paragraph.has_formatting():
+                continue
+            if self.is_raw_html_paragraph(paragraph.text) or self.is_math_paragraph(paragraph.text):
+                continue
+
+            formatting = Paragraph(self.do_markup(paragraph.format_str), False, 0)
+            yield formatting.anchors(), formatting.link_aliases()
+
+        self.markup.unresolved_links = set()
+
+    def add_link_targets(self, aliases, references):
+        """ makes link targets known before the paragraphs defining them are converted. Aliases
+        which were already defined keep their current value """
+        for alias, value in aliases.items():
+            self.markup.aliases.setdefault(alias, value)
+
+        for name in references:
+            self.markup.add_internal_reference(name)
+
+    def create_stream_filter(self, doc_filter):
+        return create_filter_chain([doc_filter], self.filter_specs)[0]
+
+    def create_stream_filters(self):
+        """ returns the stream filters which apply the document filters in order. Filters described
+        in filter_specs as line or block scoped are fused into a single pass """
+        return create_filter_chain(self.document_filters, self.filter_specs)
+
+    def finish_paragraphs(self):
+        """ called after the last paragraph of a document was converted """
+        pass
 
-    def convert_paragraph(self, paragraph):
+    def transform_paragraphs(self, paragraphs):
+        """ converts all paragraphs in a single pass. Paragraphs which use link aliases or
+        references that are not defined yet are converted again once the whole document is known """
+        converted = []
+        unresolved = []
+
+        for paragraph in paragraphs:
+            self.append_paragraph(paragraph, converted, unresolved)
+
+        self.markup.unresolved_links = set()
+
+        if unresolved:
+            self.resolve_forward_links(converted, unresolved)
+
+        self.finish_paragraphs()
+        return "".join(converted)
+
+    def append_paragraph(self, paragraph, converted, unresolved):
+        """ appends the converted paragraph and records it in unresolved if it uses link targets
+        which are not known yet """
+        self.count_paragraph(paragraph)
+
+        if paragraph.is_raw:
+            converted.append(paragraph.text)
+            return
+
+        state = self.format.get_state()
+        num_definitions = len(self.markup.alias_definitions)
+        self.markup.unresolved_links = set()
+        converted.append(self.transform_paragraph(paragraph))
+
+        if self.markup.unresolved_links:
+            unresolved.append((len(converted) - 1, paragraph, state, num_definitions,
+                               self.markup.unresolved_links))
+
+    def count_paragraph(self, paragraph):
+        """ counts the paragraphs and tables of the documents converted by this parser """
+        self.paragraph_count += 1
+        for command in paragraph.commands:
+            if command_name(command) == 'tb':
+                self.table_count += 1
+
+    def resolve_forward_links(self, converted, unresolved):
+        final_state = self.format.get_state()
+        final_aliases = self.markup.aliases
+        num_definitions = len(self.markup.alias_definitions)
+
+        for index, paragraph, state, definitions, names in unresolved:
+            if not any(self.markup.is_link_target(name) for name in names):
+                continue
+            self.markup.aliases = self.markup.aliases_at(definitions)
+            self.format.set_state(state)
+            converted[index] = self.transform_paragraph(paragraph)
+            self.markup.aliases = final_aliases
+
+        del self.markup.alias_definitions[num_definitions:]
+        self.markup.unresolved_links = set()
+        self.format.set_state(final_state)
+
+    def transform_paragraph(self, paragraph):
+        converted_paragraph = self.convert_paragraph(paragraph.text, paragraph)
+        for paragraph_filter in self.paragraph_filters:
+            converted_paragraph = paragraph_filter(converted_paragraph)
+        return converted_paragraph
+
+    def convert_paragraph(self, paragraph, node=None):
         if self.is_raw_html_paragraph(paragraph):
             return self.format.raw_html(paragraph) + '\n'
 
         if self.is_math_paragraph(paragraph):
             return self.format.math(self.do_markup(paragraph))
 
-        if self.has_formatting(paragraph):
+        if node.has_formatting() if node is not None else self.has_formatting(paragraph):
             paragraph = self.do_markup(paragraph)
-            return self.do_formatting(paragraph)
+            return self.do_formatting(paragraph, node)
 
         return self.format.paragraph(self.do_markup(paragraph)) + "\n"
 
@@ -521,82 +821,55 @@ class TxtParser(object):
         return self.last_word(paragraph).startswith(":")
 
     def last_word(self, text):
-        return text.split()[-1]
+        return text.rsplit(None, 1)[-1]
 
     def order_commands(self, commands):
         return list(reversed(commands))
 
-    def do_formatting(self, paragraph):
-        last_word = self.last_word(paragraph)
-        format_str = paragraph[paragraph.rfind(last_word):]
-        format_str = format_str.strip('\n')
+    def do_formatting(self, paragraph, node=None):
+        format_str = format_string(paragraph)
         paragraph = paragraph.replace(format_str, "")
-        commands = format_str[1:].strip()
-        command_regex = r"(?P<command>[^\(,]+(\([^\)]+\))?),?"
-        command_pattern = re.compile(command_regex)
 
-        commands = [x[0] for x in command_pattern.findall(commands)]
+        commands, handlers = self.compile_format_string(format_str, node)
+        self.format.current_command_list = commands
 
-        for command in self.order_commands(commands):
-            paragraph = self.format.convert(command, paragraph, commands)
+        for handler in handlers:
+            paragraph = handler(paragraph)
 
         return paragraph + '\n'
 
+    def compile_format_string(self, format_str, node=None):
+        """ returns the commands of a formatting string and their handlers in the order in which
+        they are applied. Both are cached for each distinct formatting string """
+        compiled = self.command_cache.get(format_str)
+
+        if compiled is None or compiled[0] is not self.format:
+            if node is not None and format_str == node.format_str:
+                commands = node.commands
+            else:
+                commands = parse_commands(format_str)
+            handlers = tuple(self.format.compile_command(command, commands)
+                             for command in self.order_commands(commands))
+            compiled = (self.format, commands, handlers)
+            self.command_cache.put(format_str, compiled)
+
+        return compiled[1], compiled[2]
+
     def do_markup(self, paragraph):
         return self.markup.convert(paragraph)
 
     def paragraphs(self, content):
-        paragraph = []
-        last_line_had_format = False
-        ignore_lines = False
-        raw_lines = False
+        """ yields the (text, is_raw) paragraphs of a string or of a file object while reading it """
+        segmenter = ParagraphSegmenter(self)
 
         for line in self.lines(content):
-            if self.is_ignored_textblock_begin(line):
-                if len(paragraph) > 0:
-                    yield ('\n'.join(paragraph) + '\n', False)
-                paragraph = []
-                last_line_had_format = False
-                ignore_lines = True
-            elif self.is_ignored_textblock_end(line):
-                ignore_lines = False
-                continue
-            elif self.is_raw_textblock_begin(line):
-                if len(paragraph) > 0:
-                    yield ('\n'.join(paragraph) + '\n', False)
-                paragraph = []
-                last_line_had_format = False
-                raw_lines = True
-                continue
-            elif self.is_raw_textblock_end(line):
-                if len(paragraph) > 0:
-                    yield ('\n'.join(paragraph) + '\n', True)
-                paragraph = []
-                raw_lines = False
-                continue
+            paragraph = segmenter.feed(line)
+            if paragraph is not None:
+                yield paragraph
 
-            if ignore_lines:
-                continue
-            elif raw_lines:
-                paragraph.append(line)
-                continue
-
-            if self.is_paragraph_separator(line) or last_line_had_format:
-                if len(paragraph) > 0:
-                    yield ('\n'.join(paragraph) + '\n', False)
-
-                if self.is_paragraph_separator(line):
-                    paragraph = []
-                    last_line_had_format = False
-                else:
-                    paragraph = [line]
-                    last_line_had_format = self.has_formatting(line)
-            else:
-                paragraph.append(line)
-                last_line_had_format = self.has_formatting(line)
-
-        if len(paragraph) > 0:
-            yield ('\n'.join(paragraph) + '\n', False)
+        paragraph = segmenter.finish()
+        if paragraph is not None:
+            yield paragraph
 
     def is_ignored_textblock_begin(self, line):
         return line.startswith('<!-- RST')
@@ -620,20 +893,28 @@ class TxtParser(object):
         return len(line) == 0 or line.isspace()
 
     def lines(self, content):
-        lines = content.splitlines()
-        current_line = ""
-        i = 0
+        """ yields the lines of a string or a file object with continued lines joined """
+        return self.join_continued_lines(iter_lines(content))
 
-        while i < len(lines):
-            current_line += lines[i]
+    def join_continued_lines(self, lines):
+        """ joins lines ending with a backslash with the line that follows them """
+        # pieces of the current line, joined once its last continuation is read
+        continued = []
 
-            if current_line.endswith("\\"):
-                current_line = current_line[0:-1]
-            else:
-                yield current_line
-                current_line = ""
+        for line in lines:
+            if line:
+                continued.append(line)
+            elif not continued:
+                yield line
+                continue
 
-            i += 1
+            if continued[-1].endswith("\\"):
+                continued[-1] = continued[-1][0:-1]
+                if not continued[-1]:
+                    continued.pop()
+            else:
+                yield "".join(continued)
+                continued = []
 
 
 class Txt2Html(TxtParser):
@@ -649,6 +930,13 @@ class Txt2Html(TxtParser):
 
 
 class TxtConverter:
+    profile = None
+    metrics = None
+    link_table = None
+
+    def __init__(self):
+        self.reader = InputReader()
+
     def get_argument_parser(self):
         return None
 
@@ -658,36 +946,355 @@ class TxtConverter:
     def create_converter(self, args):
         return None
 
+    def add_common_arguments(self, parser):
+        parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1,
+                            help='number of worker processes used to convert multiple files (0: one per CPU)')
+        parser.add_argument('--incremental', dest='incremental', action='store_true',
+                            help='only convert files whose content, converter or options changed since the last '
+                                 'run. keeps a manifest file next to the outputs')
+        parser.add_argument('--watch', dest='watch', action='store_true',
+                            help='keep running and convert files again whenever they are modified')
+        parser.add_argument('--targets', dest='targets', type=lambda s: s.split(','),
+                            help='comma separated list of output formats (html,rst) written from a single parse of '
+                                 'each file')
+        parser.add_argument('--profile', dest='profile', action='store_true',
+                            help='print the time spent in each conversion stage, formatting command and filter '
+                                 'and the slowest files')
+        parser.add_argument('--profile-stats', dest='profile_stats', metavar='FILE',
+                            help='write the merged cProfile statistics of all conversions to FILE. implies --profile')
+        parser.add_argument('--metrics-json', dest='metrics_json', metavar='PATH',
+                            help='write sizes, paragraph and table counts, times and errors of each file and run '
+                                 'totals to PATH. uses JSON Lines if PATH ends with .jsonl')
+        parser.add_argument('--global-links', dest='global_links', action='store_true',
+                            help='scan all input files for link anchors and aliases first, so that RST links to '
+                                 'names defined in other files are created with the right kind')
+        parser.add_argument('--link-table', dest='link_table', metavar='FILE',
+                            help='read the anchors and aliases of --global-links from FILE instead of scanning the '
+                                 'input files. together with --global-links the scanned table is written to FILE')
+        parser.add_argument('--encoding', dest='encoding',
+                            help='encoding of the input files (default: the encoding of the locale)')
+        parser.add_argument('--fadvise', dest='fadvise', action='store_true',
+                            help='tell the kernel that input files are read sequentially and prefetch the next '
+                                 'input file while converting the current one')
+
+    def get_target_applications(self, args):
+        if not getattr(args, 'targets', None):
+            return [self]
+
+        from lammpsdoc.txt2rst import Txt2RstConverter
+        applications = {'html': Txt2HtmlConverter, 'rst': Txt2RstConverter}
+        targets = []
+
+        for target in args.targets:
+            if target not in applications:
+                raise ValueError("unknown target '%s'" % target)
+            targets.append(applications[target]())
+
+        return targets
+
+    def create_parser(self, app, args):
+        """ creates the converter of a target application, which records the time of its stages
+        while profiling """
+        converter = app.create_converter(args)
+        if app.link_table is not None:
+            converter.markup.link_table = app.link_table
+        if self.profile is not None:
+            self.profile.instrument(converter)
+        if self.metrics is not None:
+            self.metrics.track(converter)
+        return converter
+
+    def measure_file(self, filename, function):
+        """ calls function to convert a file, timing it while profiling """
+        if self.profile is None:
+            return function()
+        return self.profile.measure_file(filename, function)
+
+    def convert_measured(self, filename, applications, args, write_to_files):
+        """ converts a file to its output files or to a list of results. Returns the errors, the
+        results and the metrics record of the file, which is None unless metrics are enabled """
+        file_metrics = self.metrics.begin_file(filename) if self.metrics is not None else None
+
+        if write_to_files:
+            errors = self.measure_file(filename, lambda: self.convert_file(filename, applications, args))
+            results = []
+        else:
+            content = self.reader.read(filename)
+            errors = []
+            results = self.measure_file(filename,
+                                        lambda: self.convert_targets(content, applications, args, errors))
+
+        read_time = self.reader.pop_read_time(filename)
+        if self.profile is not None:
+            self.profile.add('read', read_time)
+
+        if file_metrics is None:
+            return errors, results, None
+
+        if write_to_files:
+            output_bytes = sum(file_size(app.get_output_filename(filename)) for app in applications)
+        else:
+            output_bytes = sum(len(result.encode()) for result in results)
+        return errors, results, file_metrics.finish(output_bytes, errors, read_time)
+
+    def convert_targets(self, content, applications, args, errors):
+        """ converts content for each target application. Returns one result per target and
+        appends the message of every failed conversion to errors """
+        converters = [self.create_parser(app, args) for app in applications]
+
+        if len(converters) == 1:
+            return [self.convert_document(lambda: converters[0].convert(content), errors)]
+
+        parse = Document.parse if self.profile is None else self.profile.timed('paragraphs', Document.parse)
+        document = parse(content, converters)
+        return [self.convert_document(lambda: converter.render(document, index), errors)
+                for index, converter in enumerate(converters)]
+
+    def convert_document(self, convert, errors):
+        try:
+            return convert()
+        except Exception as e:
+            msg = "###########################################################################\n" \
+                  " ERROR: " + e.args[0] + "\n" \
+                  "###########################################################################\n"
+            errors.append(msg)
+            return msg
+
+    def convert_file(self, filename, applications, args):
+        """ converts a file and writes one output file per target. Returns the error messages """
+        errors = []
+
+        if len(applications) == 1:
+            self.stream_file(filename, applications[0], args, errors)
+            return errors
+
+        content = self.reader.read(filename)
+        results = self.convert_targets(content, applications, args, errors)
+        self.write_results(filename, applications, results)
+        return errors
+
+    def stream_file(self, filename, app, args, errors):
+        """ converts a file while writing its output. If the conversion fails, the output
+        only contains the error message """
+        converter = self.create_parser(app, args)
+
+        with self.reader.open(filename) as infile, open(app.get_output_filename(filename), "w+t") as outfile:
+            msg = self.convert_document(lambda: converter.convert_stream(infile, outfile), errors)
+            if errors:
+                outfile.seek(0)
+                outfile.truncate()
+                outfile.write(msg)
+
+    def write_results(self, filename, applications, results):
+        for app, result in zip(applications, results):
+            output_filename = app.get_output_filename(filename)
+            with open(output_filename, "w+t") as outfile:
+                outfile.write(result)
+
     def run(self, args=sys.argv[1:], out=sys.stdout, err=sys.stderr):
         parser = self.get_argument_parser()
         parsed_args = parser.parse_args(args)
 
-        write_to_files = len(parsed_args.files) > 1
+        try:
+            applications = self.get_target_applications(parsed_args)
+        except ValueError as e:
+            parser.error(e.args[0])
 
-        for filename in parsed_args.files:
-            if parsed_args.skip_files and filename in parsed_args.skip_files:
-                continue
+        write_to_files = len(parsed_args.files) > 1 or len(applications) > 1 or parsed_args.watch
+        filenames = [filename for filename in parsed_args.files
+                     if not (parsed_args.skip_files and filename in parsed_args.skip_files)]
+        jobs = parsed_args.jobs if parsed_args.jobs > 0 else os.cpu_count()
+        manifest = None
+
+        if parsed_args.global_links or parsed_args.link_table:
+            self.use_link_table(applications, self.create_link_table(parsed_args, jobs))
 
-            with open(filename, 'r') as f:
+        self.reader = InputReader(parsed_args.encoding, parsed_args.fadvise)
+
+        if parsed_args.profile or parsed_args.profile_stats:
+            self.profile = Profile(collect_stats=bool(parsed_args.profile_stats))
+
+        if parsed_args.metrics_json:
+            self.metrics = RunMetrics()
+
+        if write_to_files and parsed_args.incremental:
+            manifest = BuildManifest()
+            filenames, records = self.outdated_files(filenames, applications, parsed_args, manifest, err)
+
+        if write_to_files and jobs > 1 and len(filenames) > 1:
+            file_errors = self.run_parallel(filenames, applications, parsed_args, jobs, err)
+        else:
+            file_errors = self.run_serial(filenames, applications, parsed_args, write_to_files, out, err)
+
+        if manifest is not None:
+            for filename, errors in zip(filenames, file_errors):
+                if not errors:
+                    for output_filename, record in records[filename]:
+                        manifest.update(output_filename, record)
+            manifest.save()
+
+        if self.metrics is not None:
+            self.metrics.save(parsed_args.metrics_json)
+
+        if self.profile is not None:
+            self.profile.report(err)
+            if parsed_args.profile_stats:
+                self.profile.dump_stats(parsed_args.profile_stats)
+
+        if parsed_args.watch:
+            watched = [filename for filename in parsed_args.files
+                       if not (parsed_args.skip_files and filename in parsed_args.skip_files)]
+            self.watch(watched, applications, parsed_args, err)
+
+    def create_link_table(self, args, jobs):
+        """ scans all input files for the link targets they define or loads them from a file """
+        from lammpsdoc.links import LinkTable
+
+        if not args.global_links:
+            return LinkTable.load(args.link_table)
+
+        link_table = LinkTable.scan(args.files, jobs)
+        if args.link_table:
+            link_table.save(args.link_table)
+        return link_table
+
+    def use_link_table(self, applications, link_table):
+        self.link_table = link_table
+        for app in applications:
+            app.link_table = link_table
+
+    def create_worker(self):
+        """ returns a copy of the converter for worker processes, which starts without the profile
+        and metrics collected by this run """
+        worker = copy.copy(self)
+        if self.profile is not None:
+            worker.profile = self.profile.fork()
+        if self.metrics is not None:
+            worker.metrics = RunMetrics()
+        return worker
+
+    def run_serial(self, filenames, applications, args, write_to_files, out, err):
+        file_errors = []
+
+        for index, filename in enumerate(filenames):
+            print("Converting", filename, "...", file=err)
+            if index + 1 < len(filenames):
+                self.reader.prefetch(filenames[index + 1])
+            errors, results, record = self.convert_measured(filename, applications, args, write_to_files)
+
+            if record is not None:
+                self.metrics.add(record)
+
+            for msg in errors:
+                print(msg, file=err)
+
+            for result in results:
+                print(result, end='', file=out)
+
+            file_errors.append(errors)
+
+        return file_errors
+
+    def run_parallel(self, filenames, applications, args, jobs, err):
+        """ converts files in a pool of worker processes. Progress and errors are reported in
+        the order of the input files """
+        chunksize = max(1, min(16, len(filenames) // (4 * jobs)))
+        file_errors = []
+        worker_app = self.create_worker()
+        # without --targets the converter itself is the only target application
+        initargs = (worker_app, [worker_app if app is self else app for app in applications], args)
+
+        with multiprocessing.Pool(jobs, initializer=init_worker, initargs=initargs) as pool:
+            for filename, (errors, profile, record) in zip(filenames,
+                                                           pool.imap(convert_file_job, filenames, chunksize)):
                 print("Converting", filename, "...", file=err)
-                content = f.read()
-                converter = self.create_converter(parsed_args)
-
-                try:
-                    result = converter.convert(content)
-                except Exception as e:
-                    msg = "###########################################################################\n" \
-                          " ERROR: " + e.args[0] + "\n" \
-                          "###########################################################################\n"
+                for msg in errors:
                     print(msg, file=err)
-                    result = msg
+                file_errors.append(errors)
+                if profile is not None:
+                    self.profile.merge(profile)
+                if record is not None:
+                    self.metrics.add(record)
+
+        return file_errors
+
+    def create_watcher(self, filenames):
+        return FileWatcher(filenames)
+
+    def watch(self, filenames, applications, args, err, poll_interval=0.25, max_polls=None):
+        """ reconverts files whenever they change until interrupted. A file which can not be
+        converted, e.g. because it was removed or can not be decoded, is reported and watched on """
+        watcher = self.create_watcher(filenames)
+        print("Watching", len(filenames), "files for changes ...", file=err)
+        polls = 0
+
+        try:
+            while max_polls is None or polls < max_polls:
+                for filename in watcher.poll():
+                    start = time.time()
+                    print("Converting", filename, "...", file=err)
+                    try:
+                        errors = self.convert_file(filename, applications, args)
+                    except Exception as e:
+                        print("Failed to convert %s: %s" % (filename, e), file=err)
+                        continue
+                    for msg in errors:
+                        print(msg, file=err)
+                    end = time.time()
+                    print("Converted %s in %.1f ms (%.1f ms after last change)" %
+                          (filename, (end - start) * 1000, (end - watcher.modification_time(filename)) * 1000),
+                          file=err)
+                polls += 1
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+
+    def get_build_options(self, args):
+        """ options which influence the output of a conversion """
+        return {'skip_files': sorted(args.skip_files or []),
+                'encoding': input_encoding(getattr(args, 'encoding', None))}
+
+    def outdated_files(self, filenames, applications, args, manifest, err):
+        """ returns the files whose outputs are missing or were built from a different source,
+        converter or set of options, together with the manifest records of their outputs """
+        outdated = []
+        records = {}
+
+        for filename in filenames:
+            source_hash = content_hash(filename)
+            file_records = []
+            for app in applications:
+                converter = type(app.create_converter(args)).__name__
+                record = manifest.create_record(filename, source_hash, converter, app.get_build_options(args))
+                file_records.append((app.get_output_filename(filename), record))
+
+            if all(manifest.is_up_to_date(output_filename, record) for output_filename, record in file_records):
+                print("Skipping", filename, "(unchanged)", file=err)
+                continue
 
-                if write_to_files:
-                    output_filename = self.get_output_filename(filename)
-                    with open(output_filename, "w+t") as outfile:
-                        outfile.write(result)
-                else:
-                    print(result, end='', file=out)
+            outdated.append(filename)
+            records[filename] = file_records
+
+        return outdated, records
+
+
+# converter, target applications and arguments of the conversions of a worker process
+worker = None
+
+
+def init_worker(app, applications, args):
+    global worker
+    worker = (app, applications, args)
+
+
+def convert_file_job(filename):
+    """ converts a file in a worker process. Returns its errors, profile and metrics record """
+    app, applications, args = worker
+    if app.profile is not None:
+        # each file gets its own profile, which is merged by the parent process
+        app.profile = app.profile.fork()
+    errors, results, record = app.convert_measured(filename, applications, args, True)
+    return errors, app.profile, record
 
 
 class Txt2HtmlConverter(TxtConverter):
@@ -701,19 +1308,26 @@ class Txt2HtmlConverter(TxtConverter):
         parser.add_argument('--generate-title', dest='create_title', action='store_true', help='add HTML head page'
                                                                                                'title based on first '
                                                                                                'h1,h2,h3,h4... element')
+        self.add_common_arguments(parser)
         parser.add_argument('files',  metavar='file', nargs='+', help='one or more files to convert')
         return parser
 
     def create_converter(self, args):
         converter = Txt2Html()
-        converter.append_page_break = args.breakflag
-        converter.create_title = args.create_title
+        converter.append_page_break = getattr(args, 'breakflag', False)
+        converter.create_title = getattr(args, 'create_title', False)
         return converter
 
     def get_output_filename(self, path):
         filename, ext = os.path.splitext(path)
         return filename + ".html"
 
+    def get_build_options(self, args):
+        options = super().get_build_options(args)
+        options['breakflag'] = getattr(args, 'breakflag', False)
+        options['create_title'] = getattr(args, 'create_title', False)
+        return options
+
 def main():
     app = Txt2HtmlConverter()
     app.run()
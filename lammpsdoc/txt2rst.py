@@ -23,11 +23,39 @@ import re
 import argparse
 from lammpsdoc import lammps_filters
 from lammpsdoc.txt2html import Markup, Formatting, TxtParser, TxtConverter
+from lammpsdoc.output import OutputBuffer
+
+
+class RSTEscaper(object):
+    """ escapes characters with a special meaning in RST and removes these escapes again.
+    Each direction is a single pass over the text """
+    ESCAPES = str.maketrans({'*': '\\*', '^': '\\^', '|': '\\|'})
+
+    def __init__(self):
+        self.underscore_pattern = re.compile(r'([^"])_')
+        self.escaped_pattern = re.compile(r'\\([*^_|])')
+
+    def escape(self, text):
+        text = text.translate(RSTEscaper.ESCAPES)
+        if '_' in text:
+            text = self.underscore_pattern.sub(r'\1\\_', text)
+        return text
+
+    def unescape(self, text):
+        if '\\' not in text:
+            return text
+        return self.escaped_pattern.sub(lambda m: m.group(1), text)
+
+    def unescape_underscore(self, text):
+        if '\\_' not in text:
+            return text
+        return text.replace('\\_', '_')
 
 
 class RSTMarkup(Markup):
     def __init__(self):
         super().__init__()
+        self.escaper = RSTEscaper()
 
     def bold_start(self):
         return "**"
@@ -64,37 +92,38 @@ class RSTMarkup(Markup):
         return text
 
     def escape_rst_chars(self, text):
-        text = text.replace('*', '\\*')
-        text = text.replace('^', '\\^')
-        text = text.replace('|', '\\|')
-        text = re.sub(r'([^"])_', r'\1\\_', text)
-        return text
+        return self.escaper.escape(text)
 
     def unescape_rst_chars(self, text):
-        text = text.replace('\\*', '*')
-        text = text.replace('\\^', '^')
-        text = self.unescape_underscore(text)
-        text = text.replace('\\|', '|')
-        return text
+        return self.escaper.unescape(text)
 
     def unescape_underscore(self, text):
-        return text.replace('\\_', '_')
+        return self.escaper.unescape_underscore(text)
 
     def inline_math(self, text):
+        """ converts each \\( formula \\) span in a single pass over the text """
         start_pos = text.find("\\(")
-        end_pos = text.find("\\)")
+        if start_pos < 0:
+            return text
 
-        while start_pos >= 0 and end_pos >= 0:
-            original = text[start_pos:end_pos+2]
-            formula = original[2:-2]
-            formula = self.unescape_rst_chars(formula)
-            replacement = ":math:`" + formula.replace('\n', ' ').strip() + "`"
-            text = text.replace(original, replacement)
+        out = OutputBuffer()
+        pos = 0
 
-            start_pos = text.find("\\(")
-            end_pos = text.find("\\)")
+        while start_pos >= 0:
+            end_pos = text.find("\\)", start_pos + 2)
+            if end_pos < 0:
+                break
+            out.write(text[pos:start_pos])
+            out.write(self.inline_math_formula(text[start_pos+2:end_pos]))
+            pos = end_pos + 2
+            start_pos = text.find("\\(", pos)
 
-        return text
+        out.write(text[pos:])
+        return out.getvalue()
+
+    def inline_math_formula(self, formula):
+        formula = self.unescape_rst_chars(formula)
+        return ":math:`" + formula.replace('\n', ' ').strip() + "`"
 
     def create_link(self, content, href):
         content = content.strip()
@@ -105,13 +134,28 @@ class RSTMarkup(Markup):
         anchor_pos = href.find('#')
 
         if anchor_pos >= 0 and not href.startswith('http'):
-            href = href[anchor_pos+1:]
+            return self.create_target_link(content, href)
+
+        if self.has_internal_reference(href):
             return ":ref:`%s <%s>`" % (content, href)
+        elif self.has_link_alias(href):
+            return "`%s <%s_>`_" % (content, href)
+        elif self.link_table is not None:
+            # names defined in other files of the corpus
+            if self.link_table.has_reference(href):
+                return ":ref:`%s <%s>`" % (content, href)
+            elif self.link_table.has_alias(href):
+                href = self.link_table.aliases[href]
+
+        return self.create_target_link(content, href)
+
+    def create_target_link(self, content, href):
+        """ creates a link to an anchor, a document or an external URL """
+        anchor_pos = href.find('#')
 
-        if href in self.references:
+        if anchor_pos >= 0 and not href.startswith('http'):
+            href = href[anchor_pos+1:]
             return ":ref:`%s <%s>`" % (content, href)
-        elif href in self.aliases:
-            href = "%s_" % href
         elif href.endswith('.html') and not href.startswith('http') and 'USER/atc' not in href:
             href = href[0:-5]
             return ":doc:`%s <%s>`" % (content, href)
@@ -119,12 +163,122 @@ class RSTMarkup(Markup):
         return "`%s <%s>`_" % (content, href)
 
 
+class RSTTable(object):
+    """ the cells of a table stored by column, parsed in a single pass over the body of a tb()
+    paragraph. The width of each column is computed as soon as it is complete. Rows with fewer
+    cells than the table has columns are padded with empty cells """
+    __slots__ = ('columns', 'widths', 'num_rows')
+
+    TABLE_FORMATS = ('grid', 'list-table', 'csv-table')
+
+    def __init__(self, columns, num_rows):
+        self.columns = columns
+        self.num_rows = num_rows
+        self.widths = [max(map(len, column)) for column in columns]
+
+    @classmethod
+    def parse(cls, paragraph, separator, num_columns):
+        """ splits the table into rows at line breaks or, if num_columns is given, after each
+        num_columns cells """
+        if num_columns == 0:
+            return cls.parse_lines(paragraph.splitlines(), separator)
+
+        cells = paragraph.split(separator)
+        num_rows = (len(cells) + num_columns - 1) // num_columns
+        columns = []
+
+        for col_idx in range(min(num_columns, len(cells))):
+            column = [cell.strip() for cell in cells[col_idx::num_columns]]
+            if len(column) < num_rows:
+                column.append("")
+            columns.append(column)
+
+        return cls(columns, num_rows)
+
+    @classmethod
+    def parse_lines(cls, lines, separator):
+        columns = []
+
+        for row_idx, line in enumerate(lines):
+            cells = line.split(separator)
+
+            while len(columns) < len(cells):
+                columns.append([""] * row_idx)
+
+            for column, cell in zip(columns, cells):
+                column.append(cell.strip())
+
+            for column in columns[len(cells):]:
+                column.append("")
+
+        return cls(columns, len(lines))
+
+    def rows(self):
+        return zip(*self.columns)
+
+    def grid(self):
+        """ returns the table as RST grid table """
+        if not self.columns:
+            return ""
+
+        horizontal_line = '+' + '+'.join('-' * (width + 2) for width in self.widths) + "+\n"
+        row_format = '| ' + ' | '.join('%%-%ds' % width for width in self.widths) + " |\n" + horizontal_line
+
+        out = OutputBuffer()
+        out.write(horizontal_line)
+        out.writelines(row_format % row for row in self.rows())
+        return out.getvalue()
+
+    @staticmethod
+    def replace_in_columns(columns, old, new):
+        """ returns the columns with old replaced by new in each cell, copying only the columns
+        which contain old """
+        return [[cell.replace(old, new) for cell in column] if any(old in cell for cell in column) else column
+                for column in columns]
+
+    def list_table(self):
+        """ returns the table as RST list-table directive """
+        if not self.columns:
+            return ""
+
+        # lines of multi-line cells are indented to the content of their item
+        columns = self.replace_in_columns(self.columns, '\n', '\n       ')
+        row_format = "   * - %s\n" + "     - %s\n" * (len(columns) - 1)
+
+        out = OutputBuffer()
+        out.write(".. list-table::\n\n")
+        out.writelines(row_format % row for row in zip(*columns))
+        return out.getvalue().replace(" \n", "\n")
+
+    def csv_table(self):
+        """ returns the table as RST csv-table directive """
+        if not self.columns:
+            return ""
+
+        columns = self.replace_in_columns(self.columns, '"', '""')
+        columns = self.replace_in_columns(columns, '\n', ' ')
+        row_format = "   " + ",".join(['"%s"'] * len(columns)) + "\n"
+
+        out = OutputBuffer()
+        out.write(".. csv-table::\n\n")
+        out.writelines(row_format % row for row in zip(*columns))
+        return out.getvalue()
+
+
 class RSTFormatting(Formatting):
     RST_HEADER_TYPES = '#*=-^"'
 
     def __init__(self, markup):
         super().__init__(markup)
         self.indent_level = 0
+        self.table_format = 'grid'
+
+    def get_state(self):
+        return super().get_state(), self.indent_level
+
+    def set_state(self, state):
+        list_mode, self.indent_level = state
+        super().set_state(list_mode)
 
     def paragraph(self, content):
         if self.indent_level > 0:
@@ -224,11 +378,10 @@ class RSTFormatting(Formatting):
         return paragraph.rstrip() + '\n'
 
     def all_breaks(self, paragraph):
-        indented = ""
-        for line in paragraph.splitlines():
-            indented += "| %s\n" % line
-        indented += "| \n"
-        return indented
+        out = OutputBuffer()
+        out.writelines("| %s\n" % line for line in paragraph.splitlines())
+        out.write("| \n")
+        return out.getvalue()
 
     def begin_document(self):
         return ""
@@ -241,66 +394,33 @@ class RSTFormatting(Formatting):
         return raw_directive + self.indent(content)
 
     def indent(self, content):
-        indented = ""
-        for line in content.splitlines():
-            indented += "   %s\n" % line
-        return indented
+        out = OutputBuffer()
+        out.writelines("   %s\n" % line for line in content.splitlines())
+        return out.getvalue()
 
     def list_indent(self, content, level=1):
-        indented = ""
-        for line in content.splitlines():
-            indented += "  " * level + ("%s\n" % line)
-        return indented
-
-    def get_max_column_widths(self, rows):
-        num_columns = max([len(row) for row in rows])
-        max_widths = [0] * num_columns
-
-        for columns in rows:
-            for col_idx, column in enumerate(columns):
-                max_widths[col_idx] = max(max_widths[col_idx], len(column.strip())+2)
-
-        return max_widths
-
-    def create_table_horizontal_line(self, max_widths):
-        cell_borders = ['-' * width for width in max_widths]
-        return '+' + '+'.join(cell_borders) + "+"
+        prefix = "  " * level
+        out = OutputBuffer()
+        out.writelines("%s%s\n" % (prefix, line) for line in content.splitlines())
+        return out.getvalue()
 
     def table(self, paragraph, configuration):
-        paragraph = self.protect_rst_directives(paragraph)
-
-        if configuration['num_columns'] == 0:
-            rows = self.create_table_with_columns_based_on_newlines(paragraph, configuration['separator'])
-        else:
-            rows = self.create_table_with_fixed_number_of_columns(paragraph, configuration['separator'],
-                                                                  configuration['num_columns'])
+        protected = ':doc:' in paragraph or ':ref:' in paragraph
+        if protected:
+            paragraph = self.protect_rst_directives(paragraph)
 
-        column_widths = self.get_max_column_widths(rows)
-        max_columns = len(column_widths)
-        horizontal_line = self.create_table_horizontal_line(column_widths) + "\n"
+        table = RSTTable.parse(paragraph, configuration['separator'], configuration['num_columns'])
 
-        tbl = horizontal_line
-
-        for row_idx in range(len(rows)):
-            columns = rows[row_idx]
-
-            tbl += "| "
-            for col_idx in range(max_columns):
-                if col_idx < len(columns):
-                    col = columns[col_idx].strip()
-                else:
-                    col = ""
-
-                tbl += col.ljust(column_widths[col_idx]-2, ' ')
-                tbl += " |"
-
-                if col_idx < max_columns - 1:
-                    tbl += " "
-            tbl += "\n"
-            tbl += horizontal_line
+        if self.table_format == 'list-table':
+            content = table.list_table()
+        elif self.table_format == 'csv-table':
+            content = table.csv_table()
+        else:
+            content = table.grid()
 
-        tbl = self.restore_rst_directives(tbl)
-        return tbl
+        if protected or '0DOC0' in content or '0REF0' in content:
+            content = self.restore_rst_directives(content)
+        return content
 
     def protect_rst_directives(self, content):
         content = content.replace(":doc:", "0DOC0")
@@ -315,7 +435,7 @@ class RSTFormatting(Formatting):
     def math(self, content):
         eqs = content.split(r'\end{equation}')
 
-        text = ""
+        out = OutputBuffer()
 
         if len(eqs) > 1:
             post = eqs[-1].strip()
@@ -338,12 +458,13 @@ class RSTFormatting(Formatting):
             body = self.markup.unescape_rst_chars(body)
 
             if len(start) > 0:
-                text += start + "\n"
-            text += "\n.. math::\n\n"
-            text += self.indent(r'\begin{equation}' + body.strip('\n') + r'\end{equation}')
-            text += "\n"
+                out.write(start + "\n")
+            out.write("\n.. math::\n\n")
+            out.write(self.indent(r'\begin{equation}' + body.strip('\n') + r'\end{equation}'))
+            out.write("\n")
 
-        return text + post
+        out.write(post)
+        return out.getvalue()
 
 
 class Txt2Rst(TxtParser):
@@ -360,6 +481,7 @@ class Txt2Rst(TxtParser):
         self.document_filters.append(lammps_filters.filter_multiple_horizontal_rules)
         self.document_filters.append(lammps_filters.promote_doc_keywords)
         self.document_filters.append(lammps_filters.merge_preformatted_sections)
+        self.filter_specs.update(lammps_filters.filter_specs)
 
     def is_ignored_textblock_begin(self, line):
         return line.startswith('<!-- HTML_ONLY -->')
@@ -380,10 +502,9 @@ class Txt2Rst(TxtParser):
             return commands
         return super().order_commands(commands)
 
-    def transform_paragraphs(self, content):
+    def finish_paragraphs(self):
         if self.format.indent_level > 0:
             raise Exception("unbalanced number of ulb,ule or olb,ole pairs!")
-        return super().transform_paragraphs(content)
 
 
 class Txt2RstConverter(TxtConverter):
@@ -391,16 +512,31 @@ class Txt2RstConverter(TxtConverter):
         parser = argparse.ArgumentParser(description='converts a text file with simple formatting & markup into '
                                                      'Restructured Text for Sphinx.')
         parser.add_argument('-x', metavar='file-to-skip', dest='skip_files', action='append')
+        parser.add_argument('--table-format', dest='table_format', choices=RSTTable.TABLE_FORMATS, default='grid',
+                            help='write tables as grid tables, or as list-table or csv-table directives which '
+                                 'are smaller and faster to parse for large tables')
+        self.add_common_arguments(parser)
         parser.add_argument('files',  metavar='file', nargs='+', help='one or more files to convert')
         return parser
 
     def create_converter(self, args):
-        return Txt2Rst()
+        converter = Txt2Rst()
+        converter.format.table_format = getattr(args, 'table_format', None) or 'grid'
+        return converter
 
     def get_output_filename(self, path):
         filename, ext = os.path.splitext(path)
         return filename + ".rst"
 
+    def get_build_options(self, args):
+        options = super().get_build_options(args)
+        table_format = getattr(args, 'table_format', None) or 'grid'
+        if table_format != 'grid':
+            options['table_format'] = table_format
+        if self.link_table is not None:
+            options['link_table'] = self.link_table.digest()
+        return options
+
 
 def main():
     app = Txt2RstConverter()
@@ -0,0 +1,66 @@
+# LAMMPS Documentation Utilities
+#
+# Polling file watcher used by the --watch mode of the converters
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+
+
+class FileWatcher(object):
+    """ detects modified files by polling their modification time and size.
+
+    A file is reported once it did not change for debounce seconds, so that editors
+    which save in several steps only trigger a single conversion """
+
+    def __init__(self, filenames, debounce=0.2):
+        self.debounce = debounce
+        self.signatures = {}
+        self.pending = {}
+
+        for filename in filenames:
+            self.signatures[filename] = self.signature(filename)
+
+    def signature(self, filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def poll(self, now=None):
+        """ returns the changed files which are ready for conversion, most recently
+        modified first """
+        if now is None:
+            now = time.time()
+
+        for filename, old_signature in self.signatures.items():
+            signature = self.signature(filename)
+            if signature != old_signature:
+                self.signatures[filename] = signature
+                self.pending[filename] = now
+
+        ready = [filename for filename, changed in self.pending.items()
+                 if now - changed >= self.debounce and self.signatures[filename] is not None]
+
+        for filename in ready:
+            del self.pending[filename]
+
+        return sorted(ready, key=lambda filename: self.signatures[filename][0], reverse=True)
+
+    def modification_time(self, filename):
+        return self.signatures[filename][0] / 1e9
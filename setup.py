@@ -1,7 +1,12 @@
+import os
+import re
 from setuptools import setup
 
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lammpsdoc', '__init__.py')) as f:
+    version = re.search(r"^__version__ = '([^']+)'", f.read(), re.MULTILINE).group(1)
+
 setup(name='LAMMPS Documentation Utilities',
-      version='2.0.0',
+      version=version,
       description='Utilities to convert existing LAMMPS documentation text files into ReStructured Text',
       url='https://github.com/rbberger/lammps-doc-utils',
       author='Richard Berger',
@@ -13,6 +18,9 @@ setup(name='LAMMPS Documentation Utilities',
       entry_points = {
           "console_scripts": ['txt2html = lammpsdoc.txt2html:main',
                               'txt2rst  = lammpsdoc.txt2rst:main',
-                              'doc_anchor_check = lammpsdoc.doc_anchor_check:main ']
+                              'doc_anchor_check = lammpsdoc.doc_anchor_check:main ',
+                              'doc_link_check = lammpsdoc.doc_link_check:main',
+                              'lammpsdoc-bench = lammpsdoc.benchmark:main',
+                              'lammpsdoc-corpus = lammpsdoc.corpus:main']
       },
 )
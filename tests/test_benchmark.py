@@ -0,0 +1,94 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import tempfile
+import unittest
+from lammpsdoc import benchmark
+from lammpsdoc import txt2html, txt2rst
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_create_document(self):
+        content = benchmark.create_document(10)
+        self.assertIn(":ulb,l", content)
+        self.assertIn(":tb(c=2)", content)
+        self.assertIn(":pre", content)
+
+    def test_scaling(self):
+        for parser_class in (txt2html.Txt2Html, txt2rst.Txt2Rst):
+            results = benchmark.scaling(parser_class, [10, 20], repeat=1)
+            self.assertEqual([10, 20], [n for n, seconds in results])
+
+    def test_formatting_scaling(self):
+        for parser_class in (txt2html.Txt2Html, txt2rst.Txt2Rst):
+            results = benchmark.scaling(parser_class, [10, 20], repeat=1, formatting_only=True)
+            self.assertEqual([10, 20], [n for n, seconds in results])
+
+    def test_time_markup(self):
+        text = benchmark.create_markup_paragraph(50)
+        self.assertEqual(50, len(text.split()))
+        for markup_class in (txt2html.HTMLMarkup, txt2rst.RSTMarkup):
+            self.assertGreater(benchmark.time_markup(markup_class, text, repeat=1), 0)
+
+    def test_time_inline_math(self):
+        self.assertEqual(3, benchmark.create_math_paragraph(3).count("\\("))
+        self.assertGreater(benchmark.time_inline_math(10, repeat=1), 0)
+
+    def test_create_page(self):
+        content = benchmark.create_page(2)
+        self.assertEqual(2, content.count(benchmark.PAGE_SEPARATOR) + 1)
+        self.assertIn("fix nvt1 command :h3", content)
+        self.assertIn("nvt0.html", txt2html.Txt2Html().convert(content))
+        self.assertIn(".. index:: fix nvt0", txt2rst.Txt2Rst().convert(content))
+
+    def test_run_suite(self):
+        reported = []
+        results = benchmark.run_suite(repeat=1, select='filter/', report=reported.append)
+        self.assertEqual(results, reported)
+        self.assertEqual({'pages', 'corpus', 'scaled'}, set(r['input'] for r in results))
+        self.assertIn('filter/promote_doc_keywords', [r['name'] for r in results])
+        for result in results:
+            self.assertTrue(result['name'].startswith('filter/'))
+            self.assertGreater(result['paragraphs'], 0)
+            self.assertGreater(result['mb_per_second'], 0)
+
+    def test_suite_covers_engines(self):
+        names = set(r['name'] for r in benchmark.run_suite(repeat=1))
+        for name in ['html/markup', 'rst/paragraphs', 'html/table', 'rst/convert', 'filter/all',
+                     'filter/merge_preformatted_sections', 'doc_anchor_check']:
+            self.assertIn(name, names)
+
+    def test_save_and_compare_results(self):
+        results = [{'name': 'rst/convert', 'input': 'pages', 'seconds': 2.0},
+                   {'name': 'html/convert', 'input': 'pages', 'seconds': 1.0}]
+        baseline = [{'name': 'rst/convert', 'input': 'pages', 'seconds': 1.0}]
+        fd, filename = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            benchmark.save_results(baseline, filename, scale=1, repeat=3)
+            with open(filename) as f:
+                self.assertEqual(1, json.load(f)['scale'])
+            loaded = benchmark.load_results(filename)
+        finally:
+            os.remove(filename)
+        self.assertEqual(baseline, loaded)
+        self.assertEqual([('rst/convert', 'pages', 2.0)], benchmark.compare_results(results, loaded))
+
+if __name__ == '__main__':
+    unittest.main()
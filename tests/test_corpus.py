@@ -0,0 +1,74 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import unittest
+from lammpsdoc import txt2html, txt2rst, doc_anchor_check
+from lammpsdoc.corpus import CorpusGenerator
+
+
+class TestCorpusGenerator(unittest.TestCase):
+    def setUp(self):
+        self.generator = CorpusGenerator(seed=1)
+
+    def test_pages_are_reproducible(self):
+        self.assertEqual(self.generator.page(5, 20), CorpusGenerator(seed=1).page(5, 20))
+        self.assertNotEqual(self.generator.page(5, 20), CorpusGenerator(seed=2).page(5, 20))
+        self.assertNotEqual(self.generator.page(5, 20), self.generator.page(6, 20))
+
+    def test_pages_do_not_depend_on_generation_order(self):
+        pages = list(self.generator.pages(10))
+        self.assertEqual(pages[7][1], self.generator.page(7, 10))
+
+    def test_corpus_covers_lammps_markup(self):
+        content = "".join(page for name, page in self.generator.pages(30))
+        for markup in [" command :h3", ":link(lws,", ":link(Shinoda", '"_#', '.html', ':tb(c=',
+                       ':ulb,l', ',ule', '\\begin\\{equation\\}', '\\(', 'NOTE:', '<!-- HTML_ONLY -->',
+                       '<!-- RST', ':pre']:
+            self.assertIn(markup, content)
+
+    def test_size_scales_pages(self):
+        small = sum(len(page) for name, page in CorpusGenerator(size=1).pages(20))
+        large = sum(len(page) for name, page in CorpusGenerator(size=8).pages(20))
+        self.assertGreater(large, 3 * small)
+
+    def test_filenames_are_unique(self):
+        names = [self.generator.filename(i) for i in range(1000)]
+        self.assertEqual(len(names), len(set(names)))
+
+    def test_pages_convert(self):
+        for name, page in self.generator.pages(20):
+            self.assertIn("<H3>", txt2html.Txt2Html().convert(page))
+            self.assertIn(".. index::", txt2rst.Txt2Rst().convert(page))
+
+    def test_write(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filenames = self.generator.write(os.path.join(directory, 'corpus'), 10)
+            self.assertEqual(10, len(filenames))
+            with open(filenames[3]) as f:
+                self.assertEqual(self.generator.page(3, 10), f.read())
+            anchors = doc_anchor_check.find_anchors(filenames)
+            self.assertIn('Shinoda3', anchors)
+            self.assertTrue(all(len(locations) == 1 for locations in anchors.values()))
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2017 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import unittest
+from lammpsdoc import doc_anchor_check
+
+
+class TestAnchorScan(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, content):
+        filename = os.path.join(self.tmpdir.name, name)
+        with open(filename, 'w', newline='') as f:
+            f.write(content)
+        return filename
+
+    def assertScansMatch(self, content):
+        filename = self.write("page.txt", content)
+        expected = doc_anchor_check.scan_lines(filename)
+        self.assertEqual(expected, doc_anchor_check.scan_file(filename))
+
+        threshold = doc_anchor_check.MMAP_THRESHOLD
+        doc_anchor_check.MMAP_THRESHOLD = 1
+        try:
+            self.assertEqual(expected, doc_anchor_check.scan_file(filename))
+        finally:
+            doc_anchor_check.MMAP_THRESHOLD = threshold
+        return expected
+
+    def test_scan_file(self):
+        labels = self.assertScansMatch(":link(first)\n"
+                                       "text :link(inline)\n"
+                                       "\n"
+                                       ":link(alias,http://lammps.sandia.gov)\n"
+                                       " :link(indented)\n"
+                                       ":link(broken\n"
+                                       ")\n"
+                                       ":link(last)")
+        self.assertEqual([("first", 1), ("last", 8)], labels)
+
+    def test_line_endings(self):
+        self.assertEqual([("a", 2), ("b", 3)], self.assertScansMatch("text\r\n:link(a)\r\n:link(b)\r\n"))
+        self.assertEqual([("b", 3)], self.assertScansMatch("text\r:link(a\r:link(b)\n"))
+
+    def test_empty_file(self):
+        self.assertEqual([], self.assertScansMatch(""))
+
+    def test_find_anchors_in_parallel(self):
+        filenames = [self.write("page%d.txt" % i, ":link(page%d)\n\n:link(shared)\n" % i) for i in range(6)]
+        anchors = doc_anchor_check.find_anchors(filenames)
+        self.assertEqual(anchors, doc_anchor_check.find_anchors(filenames, jobs=2))
+        self.assertEqual([(filename, 3) for filename in filenames], anchors['shared'])
+        self.assertEqual([(filenames[2], 1)], anchors['page2'])
+
+    def test_pool_size_is_limited_by_files(self):
+        filenames = [self.write("page%d.txt" % i, ":link(page%d)\n" % i) for i in range(3)]
+        pool_sizes = []
+        pool = doc_anchor_check.multiprocessing.Pool
+
+        def create_pool(processes):
+            pool_sizes.append(processes)
+            return pool(processes)
+
+        doc_anchor_check.multiprocessing.Pool = create_pool
+        try:
+            doc_anchor_check.find_anchors(filenames, jobs=8)
+            doc_anchor_check.find_anchors(filenames[:1], jobs=8)
+        finally:
+            doc_anchor_check.multiprocessing.Pool = pool
+        self.assertEqual([3], pool_sizes)
+
+class TestAnchorIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.index = doc_anchor_check.AnchorIndex(os.path.join(self.tmpdir.name, "anchors.db"))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmpdir.cleanup()
+
+    def write(self, name, content, mtime=1000000000):
+        filename = os.path.join(self.tmpdir.name, name)
+        with open(filename, 'wt') as f:
+            f.write(content)
+        os.utime(filename, (mtime, mtime))
+        return filename
+
+    def test_duplicates(self):
+        a = self.write("a.txt", ":link(one)\n:link(two)\n")
+        b = self.write("b.txt", "text\n:link(two)\n")
+        self.assertEqual(2, self.index.update([a, b]))
+        self.assertEqual({'two': [(a, 2), (b, 2)]}, self.index.duplicates())
+
+    def test_only_changed_files_are_rescanned(self):
+        a = self.write("a.txt", ":link(one)\n")
+        b = self.write("b.txt", ":link(two)\n")
+        self.assertEqual(2, self.index.update([a, b]))
+        self.assertEqual(0, self.index.update([a, b]))
+
+        self.write("b.txt", ":link(one)\n", mtime=1000000001)
+        self.assertEqual(1, self.index.update([b]))
+        self.assertEqual({'one': [(a, 1), (b, 1)]}, self.index.duplicates())
+
+    def test_removed_files(self):
+        a = self.write("a.txt", ":link(one)\n")
+        b = self.write("b.txt", ":link(one)\n")
+        self.index.update([a, b])
+        os.remove(b)
+        self.assertEqual(0, self.index.update([a]))
+        self.assertEqual([a], self.index.files())
+        self.assertEqual({}, self.index.duplicates())
+
+    def test_index_persists(self):
+        a = self.write("a.txt", ":link(one)\n")
+        b = self.write("b.txt", ":link(one)\n")
+        self.index.update([a, b])
+        self.index.close()
+
+        self.index = doc_anchor_check.AnchorIndex(os.path.join(self.tmpdir.name, "anchors.db"))
+        self.assertEqual(0, self.index.update([a]))
+        self.assertEqual({'one': [(a, 1), (b, 1)]}, self.index.duplicates())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import unittest
+from lammpsdoc import txt2html, txt2rst
+from lammpsdoc.document import Document, CommandCache, iter_lines
+
+
+class TestDocument(unittest.TestCase):
+    def setUp(self):
+        self.txt2html = txt2html.Txt2Html()
+        self.txt2rst = txt2rst.Txt2Rst()
+
+    def test_paragraph_commands(self):
+        doc = self.txt2html.parse("one :ulb,l\n"
+                                  "two :link(name)\n"
+                                  "three :link(alias,value)\n")
+        self.assertEqual([['ulb', 'l'], ['link(name)'], ['link(alias,value)']],
+                         [p.commands for p in doc.paragraphs])
+        self.assertEqual(['name'], doc.paragraphs[1].anchors())
+        self.assertEqual([('alias', 'value')], doc.paragraphs[2].link_aliases())
+
+    def test_paragraph_links(self):
+        doc = self.txt2html.parse('a "link"_page.html and "another"_#anchor\n')
+        self.assertEqual([('link', 'page.html'), ('another', '#anchor')], doc.paragraphs[0].links())
+
+    def test_shared_paragraphs(self):
+        doc = Document.parse("Hello World!\n\n"
+                             "<!-- RST\n"
+                             ".. toctree::\n"
+                             "END_RST -->\n", [self.txt2html, self.txt2rst])
+        self.assertEqual(2, len(doc.paragraphs))
+        self.assertEqual(3, doc.paragraphs[0].targets)
+        self.assertEqual(2, doc.paragraphs[1].targets)
+        self.assertTrue(doc.paragraphs[1].is_raw)
+
+    def test_render_multiple_targets(self):
+        content = "Title :h1\n" \
+                  "[bold] \"link\"_alias :p\n" \
+                  ":link(alias,value)\n"
+        doc = Document.parse(content, [self.txt2html, self.txt2rst])
+        self.assertEqual(txt2html.Txt2Html().convert(content), self.txt2html.render(doc, 0))
+        self.assertEqual(txt2rst.Txt2Rst().convert(content), self.txt2rst.render(doc, 1))
+
+
+class TestLines(unittest.TestCase):
+    TEXT = "one\r\ntwo\rthree\n\nfour\x0cfive\u2028six\n\r\n"
+
+    def test_split_like_splitlines(self):
+        for chunk_size in range(1, len(self.TEXT) + 2):
+            self.assertEqual(self.TEXT.splitlines(), list(iter_lines(self.TEXT, chunk_size)))
+            self.assertEqual(self.TEXT.splitlines(), list(iter_lines(io.StringIO(self.TEXT, newline=''), chunk_size)))
+
+    def test_empty(self):
+        self.assertEqual([], list(iter_lines("")))
+        self.assertEqual([""], list(iter_lines("\r", 1)))
+
+    def test_paragraphs_are_read_lazily(self):
+        class Reader(io.StringIO):
+            reads = 0
+
+            def read(self, size=-1):
+                self.reads += 1
+                return super().read(size)
+
+        infile = Reader("first paragraph\n\n" + "more text\n" * 100000)
+        paragraphs = txt2html.Txt2Html().paragraphs(infile)
+        self.assertEqual(("first paragraph\n", False), next(paragraphs))
+        self.assertEqual(1, infile.reads)
+
+    def test_continued_lines(self):
+        parser = txt2html.Txt2Html()
+        content = "a \\\n" * 1000 + "b\n"
+        self.assertEqual(["a " * 1000 + "b"], list(parser.lines(content)))
+        self.assertEqual(["a " * 1000 + "b"], list(parser.lines(io.StringIO(content))))
+
+
+class TestCommandCache(unittest.TestCase):
+    def test_get_missing(self):
+        self.assertIsNone(CommandCache().get(":p"))
+
+    def test_evicts_least_recently_used(self):
+        cache = CommandCache(maxsize=2)
+        cache.put(":p", 1)
+        cache.put(":b", 2)
+        cache.get(":p")
+        cache.put(":c", 3)
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.get(":p"))
+        self.assertIsNone(cache.get(":b"))
+        self.assertEqual(3, cache.get(":c"))
+
+    def test_parser_compiles_each_format_string_once(self):
+        parser = txt2html.Txt2Html()
+        parser.convert("a :p\n\nb :p\n\nc,d :tb(c=2)\n")
+        commands, handlers = parser.compile_format_string(":p")
+        self.assertEqual(["p"], commands)
+        self.assertEqual(2, len(parser.command_cache))
+
+    def test_register_command(self):
+        class QuoteFormatting(txt2html.HTMLFormatting):
+            def blockquote(self, paragraph):
+                return "<BLOCKQUOTE>" + paragraph.strip() + "</BLOCKQUOTE>"
+
+        QuoteFormatting.register_command("q", "blockquote")
+        parser = txt2html.Txt2Html()
+        parser.format = QuoteFormatting(parser.markup)
+        self.assertEqual("<HTML>\n<BLOCKQUOTE>quote</BLOCKQUOTE>\n</HTML>\n", parser.convert("quote :q\n"))
+        self.assertNotIn("q", txt2html.HTMLFormatting.COMMANDS)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,8 +15,31 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
+import re
+import random
 import unittest
 from lammpsdoc import txt2rst
+from lammpsdoc import lammps_filters
+from lammpsdoc.output import FilteredWriter, FilterSpec, FusedFilter, LINE_SCOPE
+
+
+def merge_with_regex(content):
+    """ the former regular expression based merge_preformatted_sections, as reference """
+    pattern = re.compile(r"\.\. parsed-literal::\n"
+                         r"\n"
+                         r"(?P<listingA>((   [^\n]+\n)|(^\n))+)\n\s*"
+                         r"^\.\. parsed-literal::\n"
+                         r"\n"
+                         r"(?P<listingB>((   [^\n]+\n)|(^\n))+)\n", re.MULTILINE | re.DOTALL)
+
+    while pattern.search(content):
+        content = pattern.sub(r".. parsed-literal::\n"
+                              r"\n"
+                              r"\g<listingA>"
+                              r"\g<listingB>"
+                              r"\n", content)
+    return content
 
 class TestStructuralFilters(unittest.TestCase):
     def setUp(self):
@@ -54,3 +77,189 @@ class TestStructuralFilters(unittest.TestCase):
                                  "   \n\n"
                                  ":hline\n")
         self.assertEqual("\n\n", s)
+
+
+class TestMergePreformattedSections(unittest.TestCase):
+    def block(self, *lines):
+        return ".. parsed-literal::\n\n" + "".join("   %s\n" % line for line in lines) + "\n"
+
+    def setUp(self):
+        self.scanned_blocks = []
+        self.scanner_class = lammps_filters.LiteralBlockScanner
+        scanned_blocks = self.scanned_blocks
+
+        class CountingScanner(self.scanner_class):
+            def scan_lines(self, start):
+                scanned_blocks.append(start)
+                super().scan_lines(start)
+
+        lammps_filters.LiteralBlockScanner = CountingScanner
+
+    def tearDown(self):
+        lammps_filters.LiteralBlockScanner = self.scanner_class
+
+    def assertMergesLikeRegex(self, content):
+        self.assertEqual(merge_with_regex(content), lammps_filters.merge_preformatted_sections(content))
+
+    def test_merge_two_blocks(self):
+        s = lammps_filters.merge_preformatted_sections(self.block("a") + self.block("b"))
+        self.assertEqual(self.block("a", "b"), s)
+
+    def test_keep_blocks_separated_by_text(self):
+        content = self.block("a") + "text\n\n" + self.block("b")
+        self.assertEqual(content, lammps_filters.merge_preformatted_sections(content))
+
+    def test_keep_indented_directive(self):
+        content = self.block("a") + "  .. parsed-literal::\n\n   b\n\n"
+        self.assertEqual(content, lammps_filters.merge_preformatted_sections(content))
+
+    def test_merge_thousands_of_blocks(self):
+        content = "".join(self.block("fix %d all nve" % i) for i in range(5000))
+        expected = self.block(*["fix %d all nve" % i for i in range(5000)])
+        self.assertEqual(expected, lammps_filters.merge_preformatted_sections(content))
+
+    def test_scan_each_block_once(self):
+        lammps_filters.merge_preformatted_sections("".join(self.block("cmd %d" % i) for i in range(2000)))
+        self.assertEqual(2000, len(self.scanned_blocks))
+
+    def test_scan_nested_directives_with_enclosing_block(self):
+        nested = ".. parsed-literal::\n\n%stext\n"
+        lammps_filters.merge_preformatted_sections(nested % ("   .. parsed-literal::\n\n" * 2000))
+        self.assertLessEqual(len(self.scanned_blocks), 2)
+
+    def test_same_output_as_regex_on_generated_lines(self):
+        lines = [".. parsed-literal::", ".. parsed-literal::", "", "", "", "   abc", "   x y", "    ", "   ",
+                 "text", "x.. parsed-literal::", "   .. parsed-literal::", "  .. parsed-literal::", "\t", " ",
+                 "----------"]
+        for seed in range(500):
+            r = random.Random(seed)
+            content = "\n".join(r.choice(lines) for _ in range(r.randint(0, 40)))
+            self.assertMergesLikeRegex(content + r.choice(["", "\n", "\n\n"]))
+
+    def test_same_output_as_regex_on_generated_blocks(self):
+        for seed in range(500):
+            r = random.Random(seed)
+            content = ""
+            for i in range(r.randint(1, 12)):
+                content += ".. parsed-literal::\n\n"
+                content += "".join(r.choice(["   cmd %d\n" % i, "\n", "   \n", "    \n"]) for _ in range(r.randint(0, 5)))
+                content += r.choice(["\n", "\n\n", "", "\n   \n", "text\n\n", "\n  "])
+            self.assertMergesLikeRegex(content)
+
+
+class TestStreamFilters(unittest.TestCase):
+    def setUp(self):
+        self.txt2rst = txt2rst.Txt2Rst()
+
+    def stream(self, content, chunk_size):
+        out = io.StringIO()
+        writer = FilteredWriter(out, [self.txt2rst.create_stream_filter(f) for f in self.txt2rst.document_filters])
+        for i in range(0, len(content), chunk_size):
+            writer.write(content[i:i+chunk_size])
+        writer.close()
+        return out.getvalue()
+
+    def filter_document(self, content):
+        for doc_filter in self.txt2rst.document_filters:
+            content = doc_filter(content)
+        return content
+
+    def test_stream_filters_match_document_filters(self):
+        content = "header\n" \
+                  "----------\n\n" \
+                  "   \n" \
+                  "fix nvt command\n\n" \
+                  "**Syntax:**\n" \
+                  ".. parsed-literal::\n\n" \
+                  "   fix ID group-ID nvt\n\n" \
+                  "  \n" \
+                  ".. parsed-literal::\n\n" \
+                  "   keyword = temp\n\n" \
+                  "----------\n" \
+                  "  \n" \
+                  "----------\n" \
+                  "**Restrictions:** none\n"
+        expected = self.filter_document(content)
+
+        for chunk_size in range(1, len(content) + 1):
+            self.assertEqual(expected, self.stream(content, chunk_size))
+
+    def test_stream_without_horizontal_line(self):
+        content = "some command\n\ntext\n"
+        self.assertEqual(self.filter_document(content), self.stream(content, 3))
+
+    def test_starts_unindented_line(self):
+        self.assertFalse(lammps_filters.starts_unindented_line("   code\n\n", 8))
+        self.assertTrue(lammps_filters.starts_unindented_line("   code\ntext\n", 8))
+        self.assertFalse(lammps_filters.starts_unindented_line("   code\n.. parsed", 8))
+
+    def test_starts_outside_horizontal_rules(self):
+        self.assertFalse(lammps_filters.starts_outside_horizontal_rules("text\n----------\n", 5))
+        self.assertFalse(lammps_filters.starts_outside_horizontal_rules("text\n \n", 5))
+        self.assertTrue(lammps_filters.starts_outside_horizontal_rules("----------\ntext\n", 11))
+
+    def fused_stream(self, content, chunk_size):
+        out = io.StringIO()
+        writer = FilteredWriter(out, self.txt2rst.create_stream_filters())
+        for i in range(0, len(content), chunk_size):
+            writer.write(content[i:i+chunk_size])
+        writer.close()
+        return out.getvalue()
+
+    def test_fused_filters_match_document_filters(self):
+        content = "fix nvt command\n\n" \
+                  "----------\n\n" \
+                  "**Syntax:**\n" \
+                  ".. parsed-literal::\n\n" \
+                  "   fix ID group-ID nvt\n\n" \
+                  ".. parsed-literal::\n\n" \
+                  "   keyword = temp\n\n" \
+                  "----------\n" \
+                  "  \n" \
+                  "----------\n" \
+                  "**Default:**\n" \
+                  "none\n"
+        expected = self.filter_document(content)
+
+        for chunk_size in range(1, len(content) + 1):
+            self.assertEqual(expected, self.fused_stream(content, chunk_size))
+
+    def test_line_and_block_filters_are_fused(self):
+        filters = self.txt2rst.create_stream_filters()
+        self.assertEqual(3, len(filters))
+        self.assertEqual(3, len(filters[-1].specs))
+
+    def test_fused_filters_process_large_documents_in_windows(self):
+        section = "**Syntax:**\n" \
+                  ".. parsed-literal::\n\n" \
+                  "   code\n\n" \
+                  ".. parsed-literal::\n\n" \
+                  "   more code\n\n" \
+                  "----------\n\n" \
+                  "----------\n" \
+                  "text\n"
+        content = "header\n----------\n\n" + section * 5000
+        self.assertGreater(len(content), 2 * FusedFilter.window_size)
+        self.assertEqual(self.filter_document(content), self.txt2rst.filter_document(content))
+
+    def test_filters_without_markers_are_skipped(self):
+        calls = []
+
+        def count_calls(content):
+            calls.append(content)
+            return content
+
+        spec = FilterSpec(count_calls, LINE_SCOPE, markers=('**',))
+        fused = FusedFilter([spec])
+        self.assertEqual("text\n", fused.feed("text\n"))
+        self.assertEqual("**b**\n", fused.feed("**b**\n"))
+        self.assertEqual("", fused.finish())
+        self.assertEqual(["**b**\n"], calls)
+
+    def test_custom_document_filters(self):
+        self.txt2rst.document_filters.append(lambda content: content.upper())
+        content = "text\n----------\n\nsome text\n"
+        expected = self.filter_document(content)
+        self.assertEqual(expected, self.txt2rst.filter_document(content))
+        self.assertEqual(expected, self.fused_stream(content, 4))
+
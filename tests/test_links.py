@@ -0,0 +1,165 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2017 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import unittest
+from lammpsdoc.links import PageLinks, LinkIndex, LinkTable, scan_page, scan_link_targets
+from lammpsdoc.doc_anchor_check import map_files
+
+
+class TestPageLinks(unittest.TestCase):
+    def test_scan(self):
+        page = PageLinks.scan("fix.txt", "See \"this page\"_fix_nvt.html and \"(Allen)\"_#Allen.\n"
+                                         "\n"
+                                         ":link(lws,http://lammps.sandia.gov)\n"
+                                         "\n"
+                                         ":link(Allen)\n"
+                                         "[(Allen)] Allen, \"LAMMPS\"_lws\n")
+        self.assertEqual([("fix_nvt.html", 1), ("#Allen", 1), ("lws", 6)], page.links)
+        self.assertEqual({"Allen": 5}, page.anchors)
+        self.assertEqual({"lws": "http://lammps.sandia.gov"}, page.aliases)
+
+    def test_raw_paragraphs_are_skipped(self):
+        page = PageLinks.scan("fix.txt", "<!-- RST\n\"a\"_b.html\nEND_RST -->\n"
+                                         "\n"
+                                         "<A HREF = \"c.html\">\"c\"_c.html</A>\n")
+        self.assertEqual([], page.links)
+
+
+class TestLinkIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def page(self, name, anchors=None, aliases=None, links=None):
+        return PageLinks(os.path.join(self.tmpdir.name, name), anchors, aliases, links)
+
+    def test_valid_links(self):
+        index = LinkIndex([self.page("fix.txt", anchors={"fix_nvt": 1}),
+                           self.page("pair.txt", aliases={"lws": "http://lammps.sandia.gov", "lf": "fix.html"},
+                                     links=[("fix.html", 1), ("fix.html#fix_nvt", 2), ("lws", 3), ("lf", 4),
+                                            ("http://www.google.com", 5)])])
+        self.assertEqual(([], []), index.check())
+
+    def test_dangling_links(self):
+        fix = self.page("fix.txt", anchors={"fix_nvt": 1})
+        pair = self.page("pair.txt", links=[("compute.html", 3), ("fix.html#fix_npt", 4), ("#Allen", 5)])
+        dangling, unused = LinkIndex([fix, pair]).check()
+        self.assertEqual([(pair.filename, 3, "compute.html", "no page compute.html"),
+                          (pair.filename, 4, "fix.html#fix_npt", "no anchor fix_npt in %s" % fix.filename),
+                          (pair.filename, 5, "#Allen", "no anchor Allen in %s" % pair.filename)], dangling)
+        self.assertEqual([(fix.filename, 1, "fix_nvt")], unused)
+
+    def test_internal_references(self):
+        page = self.page("fix.txt", anchors={"Allen": 7, "Frenkel": 8}, links=[("#Allen", 1), ("Frenkel", 2)])
+        self.assertEqual(([], []), LinkIndex([page]).check())
+
+    def test_pages_only_available_as_source(self):
+        with open(os.path.join(self.tmpdir.name, "fix.txt"), 'wt') as f:
+            f.write("fix command :h1,link(fix_nvt)\n")
+        pair = self.page("pair.txt", links=[("fix.html", 1), ("fix.html#fix_nvt", 2), ("fix.html#fix_npt", 3)])
+        dangling, unused = LinkIndex([pair]).check()
+        self.assertEqual([(pair.filename, 3, "fix.html#fix_npt",
+                           "no anchor fix_npt in %s" % os.path.join(self.tmpdir.name, "fix.txt"))], dangling)
+        self.assertEqual([], unused)
+
+    def test_repeated_dangling_link(self):
+        page = PageLinks.scan(os.path.join(self.tmpdir.name, "p.txt"),
+                              "\"a\"_missing.html\n\ntext\n\n\"a\"_missing.html\n\n\"b\nc\"_missing.html\n\n"
+                              "\"d\"_missing.html\n")
+        dangling, unused = LinkIndex([page]).check()
+        self.assertEqual([1, 5, 7, 10], [line for filename, line, target, reason in dangling])
+
+    def test_files_next_to_pages(self):
+        with open(os.path.join(self.tmpdir.name, "Manual.pdf"), 'wt') as f:
+            f.write("pdf")
+        page = self.page("fix.txt", links=[("Manual.pdf", 1)])
+        self.assertEqual(([], []), LinkIndex([page]).check())
+
+    def test_scan_files_in_parallel(self):
+        filenames = []
+        for i in range(4):
+            filename = os.path.join(self.tmpdir.name, "page%d.txt" % i)
+            with open(filename, 'wt') as f:
+                f.write("\"next\"_page%d.html\n\n:link(anchor%d)\n" % ((i + 1) % 4, i))
+            filenames.append(filename)
+
+        pages = map_files(scan_page, filenames, jobs=2)
+        dangling, unused = LinkIndex(pages).check()
+        self.assertEqual([], dangling)
+        self.assertEqual([(filename, 3, "anchor%d" % i) for i, filename in enumerate(filenames)], unused)
+
+class TestLinkTable(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, content):
+        filename = os.path.join(self.tmpdir.name, name)
+        with open(filename, 'wt') as f:
+            f.write(content)
+        return filename
+
+    def test_scan_link_targets(self):
+        filename = self.write("fix.txt", "fix nvt command :h3,link(fix_nvt)\n"
+                                         ":link(lws,http://lammps.sandia.gov)\n"
+                                         "\"text\"_link\n")
+        self.assertEqual((["fix\\_nvt"], [("lws", "http://lammps.sandia.gov")]), scan_link_targets(filename))
+
+    def test_scan_link_targets_like_converter(self):
+        filename = self.write("fix.txt", "<!-- HTML_ONLY -->\n"
+                                         "html only :link(html_only)\n"
+                                         "<!-- END_HTML_ONLY -->\n"
+                                         "\n"
+                                         "<!-- RST\n"
+                                         "raw :link(raw)\n"
+                                         "END_RST -->\n"
+                                         "\n"
+                                         "the text :link(text) is no formatting string\n"
+                                         "\n"
+                                         "Allen :p,link(Allen)\n")
+        self.assertEqual((["Allen"], []), scan_link_targets(filename))
+
+    def test_ambiguous_aliases(self):
+        table = LinkTable()
+        table.add(["a"], [("lws", "http://lammps.sandia.gov"), ("ld", "Manual.html")])
+        table.add(["b"], [("ld", "Section_intro.html"), ("lws", "http://lammps.sandia.gov")])
+        table.add([], [("ld", "Manual.html")])
+        self.assertEqual({"a", "b"}, table.references)
+        self.assertEqual({"lws": "http://lammps.sandia.gov"}, table.aliases)
+        self.assertTrue(table.has_alias("lws"))
+        self.assertFalse(table.has_alias("ld"))
+
+    def test_save_and_load(self):
+        filenames = [self.write("page%d.txt" % i, ":link(anchor%d)\n:link(lws,http://lammps.sandia.gov)\n" % i)
+                     for i in range(3)]
+        table = LinkTable.scan(filenames, jobs=2)
+        self.assertEqual({"anchor0", "anchor1", "anchor2"}, table.references)
+
+        filename = os.path.join(self.tmpdir.name, "links.json")
+        table.save(filename)
+        loaded = LinkTable.load(filename)
+        self.assertEqual(table.to_dict(), loaded.to_dict())
+        self.assertEqual(table.digest(), loaded.digest())
+
+if __name__ == '__main__':
+    unittest.main()
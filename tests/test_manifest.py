@@ -0,0 +1,68 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import unittest
+from lammpsdoc.manifest import BuildManifest, content_hash
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmpdir.name, "a.txt")
+        self.output = os.path.join(self.tmpdir.name, "a.rst")
+        with open(self.source, "w") as f:
+            f.write("Hello World!\n")
+        with open(self.output, "w") as f:
+            f.write("Hello World!\n\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def create_record(self, manifest, **options):
+        return manifest.create_record(self.source, content_hash(self.source), "Txt2Rst", options)
+
+    def test_new_output_is_outdated(self):
+        manifest = BuildManifest()
+        self.assertFalse(manifest.is_up_to_date(self.output, self.create_record(manifest)))
+
+    def test_saved_record_is_up_to_date(self):
+        manifest = BuildManifest()
+        manifest.update(self.output, self.create_record(manifest))
+        manifest.save()
+
+        manifest = BuildManifest()
+        self.assertTrue(manifest.is_up_to_date(self.output, self.create_record(manifest)))
+        self.assertFalse(manifest.is_up_to_date(self.output, self.create_record(manifest, breakflag=True)))
+
+    def test_missing_output_is_outdated(self):
+        manifest = BuildManifest()
+        record = self.create_record(manifest)
+        manifest.update(self.output, record)
+        os.remove(self.output)
+        self.assertFalse(manifest.is_up_to_date(self.output, record))
+
+    def test_changed_source_is_outdated(self):
+        manifest = BuildManifest()
+        manifest.update(self.output, self.create_record(manifest))
+        with open(self.source, "w") as f:
+            f.write("Bye World!\n")
+        self.assertFalse(manifest.is_up_to_date(self.output, self.create_record(manifest)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import os
+import json
+import tempfile
+import unittest
+from lammpsdoc import txt2html, txt2rst
+from lammpsdoc.metrics import RunMetrics, error_text
+
+DOCUMENT = "fix nvt command :h3\n\n" \
+           "text\n\n" \
+           "a,b,c,d :tb(c=2)\n\n" \
+           "e,f :tb(c=2,s=;)\n"
+
+
+class TestMetrics(unittest.TestCase):
+    def test_error_text(self):
+        msg = "###########################################################################\n" \
+              " ERROR: unbalanced number of ulb,ule or olb,ole pairs!\n" \
+              "###########################################################################\n"
+        self.assertEqual("unbalanced number of ulb,ule or olb,ole pairs!", error_text(msg))
+
+    def test_parser_counts(self):
+        parser = txt2html.Txt2Html()
+        parser.convert(DOCUMENT)
+        self.assertEqual(4, parser.paragraph_count)
+        self.assertEqual(2, parser.table_count)
+
+        parser = txt2rst.Txt2Rst()
+        parser.convert_stream(io.StringIO(DOCUMENT), io.StringIO())
+        self.assertEqual(4, parser.paragraph_count)
+        self.assertEqual(2, parser.table_count)
+
+    def test_file_record(self):
+        with tempfile.NamedTemporaryFile(mode='w+t') as f:
+            f.write(DOCUMENT)
+            f.flush()
+            metrics = RunMetrics()
+            file_metrics = metrics.begin_file(f.name)
+            parser = txt2rst.Txt2Rst()
+            metrics.track(parser)
+            output = parser.convert(DOCUMENT)
+            record = file_metrics.finish(len(output), [], 0.5)
+
+        self.assertEqual(len(DOCUMENT), record['input_bytes'])
+        self.assertEqual(len(output), record['output_bytes'])
+        self.assertEqual(4, record['paragraphs'])
+        self.assertEqual(2, record['tables'])
+        self.assertGreaterEqual(record['wall_time'], 0)
+        self.assertGreaterEqual(record['cpu_time'], 0)
+        self.assertEqual(0.5, record['read_time'])
+        self.assertEqual([], record['errors'])
+
+
+class TestMetricsOption(unittest.TestCase):
+    def setUp(self):
+        self.out = io.StringIO()
+        self.err = io.StringIO()
+        self.app = txt2rst.Txt2RstConverter()
+
+    def write_files(self, tmpdir, contents):
+        filenames = []
+        for index, content in enumerate(contents):
+            filename = os.path.join(tmpdir, "file%d.txt" % index)
+            with open(filename, "w") as f:
+                f.write(content)
+            filenames.append(filename)
+        return filenames
+
+    def test_single_file_json(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = self.write_files(tmpdir, [DOCUMENT])
+            path = os.path.join(tmpdir, "metrics.json")
+            self.app.run(args=["--metrics-json", path] + filenames, out=self.out, err=self.err)
+            with open(path) as f:
+                metrics = json.load(f)
+
+        record = metrics['files'][0]
+        self.assertEqual(filenames[0], record['file'])
+        self.assertEqual(len(self.out.getvalue().encode()), record['output_bytes'])
+        self.assertEqual(2, record['tables'])
+        self.assertEqual(1, metrics['totals']['files'])
+        self.assertEqual(len(DOCUMENT), metrics['totals']['input_bytes'])
+        self.assertGreater(metrics['totals']['files_per_second'], 0)
+        self.assertGreater(metrics['totals']['mb_per_second'], 0)
+
+    def test_parallel_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = self.write_files(tmpdir, [DOCUMENT, "one :ulb,l\n", DOCUMENT])
+            path = os.path.join(tmpdir, "metrics.jsonl")
+            self.app.run(args=["-j", "2", "--metrics-json", path] + filenames, out=self.out, err=self.err)
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+            output_size = os.path.getsize(filenames[0][:-4] + ".rst")
+
+        self.assertEqual(['file', 'file', 'file', 'run'], [line['type'] for line in lines])
+        self.assertEqual(filenames, [line['file'] for line in lines[:3]])
+        self.assertEqual(output_size, lines[0]['output_bytes'])
+        self.assertEqual(["unbalanced number of ulb,ule or olb,ole pairs!"], lines[1]['errors'])
+        self.assertEqual(1, lines[3]['failed_files'])
+        self.assertEqual(4, lines[3]['tables'])
+        self.assertEqual(9, lines[3]['paragraphs'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+from lammpsdoc.output import OutputBuffer
+
+
+class TestOutputBuffer(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual("", OutputBuffer().getvalue())
+
+    def test_write(self):
+        out = OutputBuffer()
+        out.write("Hello")
+        out.write(" ")
+        out.write("World!\n")
+        self.assertEqual("Hello World!\n", out.getvalue())
+
+    def test_writelines(self):
+        out = OutputBuffer()
+        out.write("<UL>")
+        out.writelines("<LI>%d\n" % i for i in range(3))
+        self.assertEqual("<UL><LI>0\n<LI>1\n<LI>2\n", out.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
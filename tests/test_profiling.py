@@ -0,0 +1,153 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import os
+import pstats
+import tempfile
+import unittest
+from lammpsdoc import txt2html, txt2rst
+from lammpsdoc.document import command_name
+from lammpsdoc.profiling import Profile
+
+DOCUMENT = "fix nvt command :h3\n\n" \
+           "[Syntax:]\n\n" \
+           "fix ID group nvt :pre\n\n" \
+           "NOTE: some {note}\n\n" \
+           "one :ulb,l\n" \
+           "two :l,ule\n\n" \
+           "a,b,c,d :tb(c=2)\n"
+
+
+class TestProfile(unittest.TestCase):
+    def test_command_name(self):
+        self.assertEqual("tb", command_name("tb(c=3,s=;)"))
+        self.assertEqual("ulb", command_name("ulb"))
+
+    def test_timed(self):
+        profile = Profile()
+        double = profile.timed('double', lambda x: 2 * x)
+        self.assertEqual(4, double(2))
+        self.assertEqual(6, double(3))
+        self.assertEqual(2, profile.stages['double'][1])
+
+    def test_timed_generator(self):
+        profile = Profile()
+        numbers = profile.timed_generator('numbers', lambda n: iter(range(n)))
+        self.assertEqual([0, 1, 2], list(numbers(3)))
+        self.assertEqual(1, profile.stages['numbers'][1])
+
+    def test_instrumented_parser_output_is_unchanged(self):
+        for parser_class in (txt2html.Txt2Html, txt2rst.Txt2Rst):
+            expected = parser_class().convert(DOCUMENT)
+            profile = Profile()
+            self.assertEqual(expected, profile.instrument(parser_class()).convert(DOCUMENT))
+
+    def test_stages(self):
+        profile = Profile()
+        parser = profile.instrument(txt2rst.Txt2Rst())
+        parser.convert(DOCUMENT)
+        for stage in ['paragraphs', 'markup', 'format h3', 'format pre', 'format ulb', 'format tb',
+                      'paragraph filter detect_and_format_notes',
+                      'document filter promote_doc_keywords',
+                      'document filter filter_file_header_until_first_horizontal_line']:
+            self.assertIn(stage, profile.stages)
+        self.assertEqual(2, profile.stages['format l'][1])
+
+    def test_stream_stages(self):
+        profile = Profile()
+        parser = profile.instrument(txt2rst.Txt2Rst())
+        out = io.StringIO()
+        parser.convert_stream(io.StringIO(DOCUMENT), out)
+        self.assertEqual(txt2rst.Txt2Rst().convert(DOCUMENT), out.getvalue())
+        self.assertEqual(2, profile.stages['paragraphs'][1])
+        self.assertEqual(1, profile.stages['document filter detect_and_add_command_to_index'][1])
+
+    def test_custom_document_filter(self):
+        profile = Profile()
+        parser = txt2rst.Txt2Rst()
+        parser.document_filters.append(lambda content: content.upper())
+        profile.instrument(parser)
+        self.assertIn("FIX NVT COMMAND", parser.convert(DOCUMENT))
+        self.assertEqual(1, profile.stages['document filter <lambda>'][1])
+
+    def test_merge_and_report(self):
+        first = Profile(collect_stats=True)
+        first.measure_file("a.txt", lambda: txt2html.Txt2Html().convert(DOCUMENT))
+        first.add('markup', 0.5)
+        second = first.fork()
+        self.assertEqual({}, second.stages)
+        second.measure_file("b.txt", lambda: txt2rst.Txt2Rst().convert(DOCUMENT))
+        second.add('markup', 0.25, calls=2)
+        first.merge(second)
+
+        self.assertEqual([0.75, 3], first.stages['markup'])
+        self.assertEqual(["a.txt", "b.txt"], sorted(filename for seconds, filename in first.files))
+
+        out = io.StringIO()
+        first.report(out)
+        self.assertIn("Profile of 2 files", out.getvalue())
+        self.assertIn("Slowest files:", out.getvalue())
+        self.assertLess(out.getvalue().index("markup"), out.getvalue().index("Slowest files:"))
+
+        fd, filename = tempfile.mkstemp(suffix='.stats')
+        os.close(fd)
+        try:
+            first.dump_stats(filename)
+            stats = pstats.Stats(filename)
+            self.assertTrue(any(function[2] == 'convert' for function in stats.stats))
+        finally:
+            os.remove(filename)
+
+
+class TestProfileOption(unittest.TestCase):
+    def setUp(self):
+        self.out = io.StringIO()
+        self.err = io.StringIO()
+        self.app = txt2rst.Txt2RstConverter()
+
+    def write_files(self, tmpdir, count):
+        filenames = []
+        for index in range(count):
+            filename = os.path.join(tmpdir, "file%d.txt" % index)
+            with open(filename, "w") as f:
+                f.write(DOCUMENT)
+            filenames.append(filename)
+        return filenames
+
+    def test_profile_report(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = self.write_files(tmpdir, 2)
+            self.app.run(args=["--profile"] + filenames, out=self.out, err=self.err)
+            report = self.err.getvalue()
+            self.assertIn("Profile of 2 files", report)
+            self.assertIn("format tb", report)
+            self.assertIn("document filter merge_preformatted_sections", report)
+            self.assertIn(filenames[0], report.split("Slowest files:")[1])
+
+    def test_parallel_profile_stats(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = self.write_files(tmpdir, 4)
+            stats_file = os.path.join(tmpdir, "profile.stats")
+            self.app.run(args=["-j", "2", "--profile-stats", stats_file] + filenames, out=self.out, err=self.err)
+            self.assertIn("Profile of 4 files", self.err.getvalue())
+            stats = pstats.Stats(stats_file)
+            convert_calls = [entry[1] for function, entry in stats.stats.items() if function[2] == 'convert_file']
+            self.assertEqual([4], convert_calls)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import os
+import pickle
+import tempfile
+import unittest
+from lammpsdoc import txt2html
+from lammpsdoc.reader import InputReader
+
+
+class TestInputReader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, data):
+        filename = os.path.join(self.tmpdir.name, name)
+        with open(filename, 'wb') as f:
+            f.write(data)
+        return filename
+
+    def test_read(self):
+        reader = InputReader('utf-8')
+        long_file = self.write("long.txt", "äöü\n".encode() * 1000)
+        short_file = self.write("short.txt", b"short\n")
+        empty_file = self.write("empty.txt", b"")
+        self.assertEqual("äöü\n" * 1000, reader.read(long_file))
+        self.assertEqual("short\n", reader.read(short_file))
+        self.assertEqual("", reader.read(empty_file))
+
+    def test_read_large_files(self):
+        reader = InputReader('utf-8', mmap_threshold=1)
+        filename = self.write("large.txt", "äöü\n".encode() * 1000)
+        self.assertEqual("äöü\n" * 1000, reader.read(filename))
+        self.assertEqual("", reader.read(self.write("empty.txt", b"")))
+
+    def test_line_breaks_are_translated(self):
+        filename = self.write("crlf.txt", b"one\r\ntwo\rthree\n")
+        for threshold in (1, 1 << 20):
+            reader = InputReader('utf-8', mmap_threshold=threshold)
+            self.assertEqual("one\ntwo\nthree\n", reader.read(filename))
+            with reader.open(filename) as f:
+                self.assertEqual("one\ntwo\nthree\n", f.read())
+
+    def test_encoding(self):
+        filename = self.write("latin1.txt", "café\n".encode('latin-1'))
+        self.assertEqual("café\n", InputReader('latin-1').read(filename))
+        self.assertRaises(UnicodeDecodeError, InputReader('utf-8').read, filename)
+
+    def test_open_large_files(self):
+        reader = InputReader('utf-8', mmap_threshold=1)
+        filename = self.write("large.txt", b"one\ntwo\n")
+        with reader.open(filename) as f:
+            self.assertTrue(f.seekable())
+            start = f.tell()
+            self.assertEqual("one\ntwo\n", f.read())
+            f.seek(start)
+            self.assertEqual("one\n", f.read(4))
+
+    def test_read_times(self):
+        reader = InputReader('utf-8', fadvise=True)
+        filename = self.write("file.txt", b"text\n")
+        reader.prefetch(filename)
+        reader.read(filename)
+        self.assertGreater(reader.pop_read_time(filename), 0.0)
+        self.assertEqual(0.0, reader.pop_read_time(filename))
+
+    def test_pickle_without_buffer(self):
+        reader = InputReader('latin-1')
+        reader.read(self.write("file.txt", b"text\n"))
+        copy = pickle.loads(pickle.dumps(reader))
+        self.assertEqual('latin-1', copy.encoding)
+        self.assertEqual(0, len(copy.buffer))
+        self.assertEqual({}, copy.read_times)
+
+    def test_converter_encoding(self):
+        filename = self.write("latin1.txt", "café\n".encode('latin-1'))
+        out = io.StringIO()
+        txt2html.Txt2HtmlConverter().run(args=["--encoding", "latin-1", filename], out=out, err=io.StringIO())
+        self.assertEqual("<HTML>\n<P>café\n</P>\n</HTML>\n", out.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
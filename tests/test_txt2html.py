@@ -20,6 +20,51 @@ import tempfile
 import io
 import os
 from lammpsdoc import txt2html
+from lammpsdoc.watch import FileWatcher
+from lammpsdoc.reader import InputReader
+
+
+class CountingPattern(object):
+    """ a compiled pattern which counts how often it is used to scan a text """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.scans = 0
+
+    def sub(self, repl, text):
+        self.scans += 1
+        return self.pattern.sub(repl, text)
+
+    def finditer(self, text):
+        self.scans += 1
+        return self.pattern.finditer(text)
+
+    def findall(self, text):
+        self.scans += 1
+        return self.pattern.findall(text)
+
+
+class CountingText(str):
+    """ a text which counts how often it is rewritten by replace() """
+    replaces = 0
+
+    def replace(self, *args):
+        self.replaces += 1
+        return super().replace(*args)
+
+
+class RemovingWatcher(FileWatcher):
+    """ a watcher without debounce time which removes a file after it was reported as changed """
+
+    def __init__(self, filenames, removed):
+        super().__init__(filenames, debounce=0)
+        self.removed = removed
+
+    def poll(self, now=None):
+        ready = super().poll(now)
+        if self.removed in ready:
+            os.remove(self.removed)
+        return ready
 
 class TestBasicFormatting(unittest.TestCase):
     def setUp(self):
@@ -122,6 +167,36 @@ class TestMarkup(unittest.TestCase):
         self.markup.add_link_alias("link", "replacement")
         self.assertEqual("<A HREF = \"replacement\">Text</A>", self.markup.convert('"Text"_link'))
 
+    def test_link_requires_opening_quote(self):
+        s = self.markup.link('word"_target "Text"_link')
+        self.assertEqual('word"_target <A HREF = "link">Text</A>', s)
+
+    def links(self, n):
+        return ",\n".join('"cmd%d"_cmd%d.html' % (i, i) for i in range(n)) + "."
+
+    def test_thousands_of_links(self):
+        s = self.markup.link(self.links(5000))
+        self.assertEqual(5000, s.count("<A HREF"))
+        self.assertTrue(s.startswith('<A HREF = "cmd0.html">cmd0</A>,\n'))
+        self.assertTrue(s.endswith('<A HREF = "cmd4999.html">cmd4999</A>.'))
+
+    def test_link_pass_scans_text_once(self):
+        pattern = CountingPattern(self.markup.link_pattern)
+        self.markup.link_pattern = pattern
+        resolved = []
+        create_link = self.markup.create_link
+
+        def count_link(content, link):
+            resolved.append(link)
+            return create_link(content, link)
+
+        self.markup.create_link = count_link
+        text = CountingText(self.links(5000))
+        self.markup.link(text)
+        self.assertEqual(1, pattern.scans)
+        self.assertEqual(0, text.replaces)
+        self.assertEqual(5000, len(resolved))
+
 class TestFormatting(unittest.TestCase):
     def setUp(self):
         self.txt2html = txt2html.Txt2Html()
@@ -435,6 +510,67 @@ class TestSpecialCommands(unittest.TestCase):
                              "\n"
                              "</HTML>\n")
 
+    def test_redefine_link_alias(self):
+        s = self.txt2html.convert("\"test\"_alias\n\n"
+                                  "one :link(alias,first)\n"
+                                  "\"test\"_alias\n\n"
+                                  "two :link(alias,second)\n")
+        self.assertEqual(s, "<HTML>\n"
+                             "<P><A HREF = \"second\">test</A>\n"
+                             "</P>\n"
+                             "one \n"
+                             "\n"
+                             "<P><A HREF = \"first\">test</A>\n"
+                             "</P>\n"
+                             "two \n"
+                             "\n"
+                             "</HTML>\n")
+
+    def test_malformed_link_command(self):
+        s = self.txt2html.convert("some text :link(a,b,c)\n")
+        self.assertEqual(s, "<HTML>\n"
+                             "\n"
+                             "</HTML>\n")
+
+    def test_malformed_link_command_after_paragraph(self):
+        s = self.txt2html.convert("x :p,link(x,http://a.b/c,d)\n")
+        self.assertEqual(s, "<HTML>\n"
+                             "<P></P>\n"
+                             "</HTML>\n")
+
+    def test_convert_each_paragraph_once(self):
+        converted = []
+        convert_paragraph = self.txt2html.convert_paragraph
+
+        def count_paragraph(paragraph, node=None):
+            converted.append(paragraph)
+            return convert_paragraph(paragraph, node)
+
+        self.txt2html.convert_paragraph = count_paragraph
+        self.txt2html.convert("one\n\ntwo :h1\n\nthree\n")
+        self.assertEqual(3, len(converted))
+
+    def test_convert_stream(self):
+        content = "\"test\"_alias\n\n" \
+                  "one :link(alias,first)\n" \
+                  "\"test\"_alias\n\n" \
+                  "two :link(alias,second)\n"
+        out = io.StringIO()
+        self.txt2html.convert_stream(io.StringIO(content), out)
+        self.assertEqual(txt2html.Txt2Html().convert(content), out.getvalue())
+
+    def test_convert_stream_with_title(self):
+        content = "\"test\"_alias\n\n" \
+                  "Title \"test\"_alias :h1\n\n" \
+                  "one :link(alias,value)\n"
+        out = io.StringIO()
+        self.txt2html.create_title = True
+        self.txt2html.convert_stream(io.StringIO(content), out)
+        parser = txt2html.Txt2Html()
+        parser.create_title = True
+        self.assertEqual(parser.convert(content), out.getvalue())
+        self.assertIn("<TITLE>Title <A HREF = \"alias\">test</A></TITLE>\n", out.getvalue())
+
 class TestTableCommand(unittest.TestCase):
     def setUp(self):
         self.txt2html = txt2html.Txt2Html()
@@ -585,6 +721,36 @@ class TestTxt2HtmlCLI(unittest.TestCase):
         self.err = io.StringIO()
         self.app = txt2html.Txt2HtmlConverter()
 
+    def test_watch_continues_after_failed_conversion(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = [os.path.join(tmpdir, name) for name in ("bad.txt", "good.txt", "removed.txt")]
+            for filename in filenames:
+                with open(filename, "w") as f:
+                    f.write("Hello World!\n")
+            bad, good, removed = filenames
+            watcher = RemovingWatcher(filenames, removed)
+
+            with open(bad, "wb") as f:
+                f.write(b"caf\xe9\n")
+            for filename in (good, removed):
+                with open(filename, "a") as f:
+                    f.write("Bye World!\n")
+
+            self.app.create_watcher = lambda filenames: watcher
+            self.app.reader = InputReader('utf-8')
+            args = self.app.get_argument_parser().parse_args(filenames)
+            self.app.watch(filenames, [self.app], args, self.err, poll_interval=0, max_polls=2)
+
+            self.assertIn("Failed to convert %s: 'utf-8' codec can't decode" % bad, self.err.getvalue())
+            self.assertIn("Failed to convert %s: [Errno 2]" % removed, self.err.getvalue())
+            self.assertIn("Converted %s in" % good, self.err.getvalue())
+            with open(good[:-4] + ".html") as f:
+                self.assertEqual("<HTML>\n"
+                                 "<P>Hello World!\n"
+                                 "Bye World!\n"
+                                 "</P>\n"
+                                 "</HTML>\n", f.read())
+
     def test_convert_single_file(self):
         with tempfile.NamedTemporaryFile(mode='w+t') as f:
             f.write('Hello World!\n')
@@ -655,6 +821,56 @@ class TestTxt2HtmlCLI(unittest.TestCase):
                               "</H1>\n"
                               "</HTML>\n", self.out.getvalue())
 
+    def test_incremental_conversion(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            f = os.path.join(tmpdir, "a.txt")
+            g = os.path.join(tmpdir, "b.txt")
+            for filename in (f, g):
+                with open(filename, "w") as outfile:
+                    outfile.write("Hello World!\n")
+
+            self.app.run(args=["--incremental", f, g], out=self.out, err=self.err)
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, ".lammpsdoc-manifest.json")))
+
+            err = io.StringIO()
+            with open(g, "w") as outfile:
+                outfile.write("Bye World!\n")
+            self.app.run(args=["--incremental", f, g], out=self.out, err=err)
+            self.assertEqual("Skipping " + f + " (unchanged)\n"
+                             "Converting " + g + " ...\n", err.getvalue())
+            with open(os.path.join(tmpdir, "b.html")) as outfile:
+                self.assertEqual("<HTML>\n"
+                                 "<P>Bye World!\n"
+                                 "</P>\n"
+                                 "</HTML>\n", outfile.read())
+
+            err = io.StringIO()
+            self.app.run(args=["--incremental", "-b", f, g], out=self.out, err=err)
+            self.assertEqual("Converting " + f + " ...\n"
+                             "Converting " + g + " ...\n", err.getvalue())
+
+    def test_incremental_conversion_after_encoding_change(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            f = os.path.join(tmpdir, "a.txt")
+            g = os.path.join(tmpdir, "b.txt")
+            for filename in (f, g):
+                with open(filename, "wb") as outfile:
+                    outfile.write("caf\u00e9\n".encode('utf-8'))
+
+            self.app.run(args=["--incremental", "--encoding", "utf-8", f, g], out=self.out, err=self.err)
+
+            err = io.StringIO()
+            self.app.run(args=["--incremental", "--encoding", "latin-1", f, g], out=self.out, err=err)
+            self.assertEqual("Converting " + f + " ...\n"
+                             "Converting " + g + " ...\n", err.getvalue())
+            with open(os.path.join(tmpdir, "a.html"), encoding="utf-8") as outfile:
+                self.assertIn("caf\u00c3\u00a9", outfile.read())
+
+            err = io.StringIO()
+            self.app.run(args=["--incremental", "--encoding", "latin-1", f, g], out=self.out, err=err)
+            self.assertEqual("Skipping " + f + " (unchanged)\n"
+                             "Skipping " + g + " (unchanged)\n", err.getvalue())
+
 class TestMathMarkup(unittest.TestCase):
     def setUp(self):
         self.txt2html = txt2html.Txt2Html()
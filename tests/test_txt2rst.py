@@ -16,9 +16,30 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import io
+import os
+import pickle
 import tempfile
 import unittest
 from lammpsdoc import txt2rst
+from lammpsdoc.links import LinkTable
+from lammpsdoc.profiling import Profile
+from lammpsdoc.metrics import RunMetrics
+
+
+class SearchedText(str):
+    """ a text which records the start positions of find() calls and counts replace() calls """
+
+    def __init__(self, text):
+        self.searches = []
+        self.replaces = 0
+
+    def find(self, sub, start=0, *args):
+        self.searches.append(start)
+        return super().find(sub, start, *args)
+
+    def replace(self, *args):
+        self.replaces += 1
+        return super().replace(*args)
 
 class TestBasicFormatting(unittest.TestCase):
     def setUp(self):
@@ -93,6 +114,15 @@ class TestMarkup(unittest.TestCase):
         s = self.markup.convert("x_")
         self.assertEqual("x\_", s)
 
+    def test_escape_rst_chars(self):
+        s = self.markup.escape_rst_chars('a*b^c|d e_f "x"_y a__b')
+        self.assertEqual('a\\*b\\^c\\|d e\\_f "x"_y a\\__b', s)
+
+    def test_unescape_rst_chars(self):
+        s = self.markup.unescape_rst_chars('a\\*b\\^c\\|d e\\_f \\\\_ \\x')
+        self.assertEqual('a*b^c|d e_f \\_ \\x', s)
+        self.assertEqual('plain_text', self.markup.unescape_rst_chars('plain_text'))
+
     def test_paragraph_with_italic(self):
         self.assertEqual("A sentence with a *italic* word", self.markup.convert("A sentence with a {italic} word"))
 
@@ -125,6 +155,24 @@ class TestMarkup(unittest.TestCase):
                                   'xt"_link\n')
         self.assertEqual("`Te xt <link>`_\n\n", s)
 
+    def test_global_link_table(self):
+        self.markup.link_table = LinkTable(['Allen'], {'lws': 'http://lammps.sandia.gov',
+                                                       'lc': 'Section_commands.html#comm',
+                                                       'ld': 'Manual.html'})
+        self.assertEqual(":ref:`Text <Allen>`", self.markup.convert('"Text"_Allen'))
+        self.assertEqual("`Text <http://lammps.sandia.gov>`_", self.markup.convert('"Text"_lws'))
+        self.assertEqual(":ref:`Text <comm>`", self.markup.convert('"Text"_lc'))
+        self.assertEqual(":doc:`Text <Manual>`", self.markup.convert('"Text"_ld'))
+        self.assertEqual("`Text <link>`_", self.markup.convert('"Text"_link'))
+
+    def test_local_link_targets_take_precedence(self):
+        self.txt2rst.markup.link_table = LinkTable(['lws'], {'lws': 'http://example.org'})
+        s = self.txt2rst.convert("\"site\"_lws\n"
+                                 "\n"
+                                 ":link(lws,http://lammps.sandia.gov)\n")
+        self.assertEqual("`site <lws_>`_\n\n"
+                         ".. _lws: http://lammps.sandia.gov\n\n\n\n", s)
+
     def test_ignore_punctuation_in_link(self):
         self.assertEqual("`Text <link>`_.", self.markup.convert('"Text"_link.'))
         self.assertEqual("`Text <link>`_,", self.markup.convert('"Text"_link,'))
@@ -373,6 +421,19 @@ class TestListFormatting(unittest.TestCase):
                          "\n"
                          "* first paragraph of second bullet\n\n\n", s)
 
+    def test_list_item_before_first_list_is_unordered(self):
+        # the list mode of a bare :l only depends on the paragraphs before it
+        content = "first :l\n\n" \
+                  "one :olb,l\n" \
+                  "two :l,ule\n"
+        expected = "* first\n" \
+                   "#. one\n" \
+                   "#. two\n\n"
+        self.assertEqual(expected, self.txt2rst.convert(content))
+        out = io.StringIO()
+        txt2rst.Txt2Rst().convert_stream(io.StringIO(content), out)
+        self.assertEqual(expected, out.getvalue())
+
 
 class TestSpecialCommands(unittest.TestCase):
     def setUp(self):
@@ -437,6 +498,29 @@ class TestSpecialCommands(unittest.TestCase):
                          "\n"
                          "`test <alias_>`_\n\n", s)
 
+    def test_internal_reference_link_defined_later(self):
+        s = self.txt2rst.convert("a \"link\"_name to below\n\n"
+                                 "one :link(name)\n")
+        self.assertEqual("a :ref:`link <name>` to below\n\n"
+                         ".. _name:\n"
+                         "\n"
+                         "one \n\n", s)
+
+    def test_define_link_alias_later(self):
+        s = self.txt2rst.convert("\"test\"_alias\n\n"
+                                 "one :link(alias,value)\n")
+        self.assertEqual("`test <alias_>`_\n\n"
+                         ".. _alias: value\n\n"
+                         "one \n\n", s)
+
+    def test_malformed_link_command(self):
+        s = self.txt2rst.convert("some text :link(a,b,c)\n")
+        self.assertEqual("\n", s)
+
+    def test_malformed_link_command_after_paragraph(self):
+        s = self.txt2rst.convert("x :p,link(x,http://a.b/c,d)\n")
+        self.assertEqual("\n\n", s)
+
 class TestTableCommand(unittest.TestCase):
     def setUp(self):
         self.txt2rst = txt2rst.Txt2Rst()
@@ -455,12 +539,61 @@ class TestTableCommand(unittest.TestCase):
                 "+-----------------+---+---+\n\n"
         self.assertEqual(table, s)
 
+    def test_rows_with_missing_cells(self):
+        s = self.txt2rst.convert("a,bb,c,\nd,e :tb(c=3)")
+        table = "+---+----+---+\n" \
+                "| a | bb | c |\n" \
+                "+---+----+---+\n" \
+                "| d | e  |   |\n" \
+                "+---+----+---+\n\n"
+        self.assertEqual(table, s)
+
+    def test_table_with_rows_per_line(self):
+        s = self.txt2rst.convert("a;b\nc\nd;e;f :tb(s=;)")
+        table = "+---+---+---+\n" \
+                "| a | b |   |\n" \
+                "+---+---+---+\n" \
+                "| c |   |   |\n" \
+                "+---+---+---+\n" \
+                "| d | e | f |\n" \
+                "+---+---+---+\n\n"
+        self.assertEqual(table, s)
+
+    def test_convert_table_to_list_table(self):
+        self.txt2rst.format.table_format = 'list-table'
+        s = self.txt2rst.convert("\"a\"_test.html: b: : c: : :tb(c=2,s=:)")
+        table = ".. list-table::\n" \
+                "\n" \
+                "   * - :doc:`a <test>`\n" \
+                "     - b\n" \
+                "   * -\n" \
+                "     - c\n" \
+                "   * -\n" \
+                "     -\n\n"
+        self.assertEqual(table, s)
+
+    def test_convert_table_to_csv_table(self):
+        self.txt2rst.format.table_format = 'csv-table'
+        s = self.txt2rst.convert("a \"quoted\" cell,b\nc,d :tb(c=2)")
+        table = ".. csv-table::\n" \
+                "\n" \
+                "   \"a \"\"quoted\"\" cell\",\"b c\"\n" \
+                "   \"d\",\"\"\n\n"
+        self.assertEqual(table, s)
+
 class TestTxt2RstCLI(unittest.TestCase):
     def setUp(self):
         self.out = io.StringIO()
         self.err = io.StringIO()
         self.app = txt2rst.Txt2RstConverter()
 
+    def test_table_format(self):
+        with tempfile.NamedTemporaryFile(mode='w+t') as f:
+            f.write('a,b :tb(c=2)\n')
+            f.flush()
+            self.app.run(args=["--table-format", "list-table", f.name], out=self.out, err=self.err)
+            self.assertEqual(".. list-table::\n\n   * - a\n     - b\n\n", self.out.getvalue())
+
     def test_convert_single_file(self):
         with tempfile.NamedTemporaryFile(mode='w+t') as f:
             f.write('Hello World!\n')
@@ -470,6 +603,106 @@ class TestTxt2RstCLI(unittest.TestCase):
             self.assertEqual("Hello World!\n\n", self.out.getvalue())
             self.assertEqual("Converting " + f.name + " ...\n", self.err.getvalue())
 
+    def test_convert_multiple_targets(self):
+        with tempfile.NamedTemporaryFile(mode='w+t', suffix='.txt') as f:
+            f.write('Hello World!\n')
+            f.flush()
+            base, ext = os.path.splitext(f.name)
+            args = ["--targets", "html,rst", f.name]
+            self.app.run(args=args, out=self.out, err=self.err)
+            self.assertEqual("", self.out.getvalue())
+            self.assertEqual("Converting " + f.name + " ...\n", self.err.getvalue())
+            with open(base + ".rst") as rst:
+                self.assertEqual("Hello World!\n\n", rst.read())
+            with open(base + ".html") as html:
+                self.assertEqual("<HTML>\n"
+                                 "<P>Hello World!\n"
+                                 "</P>\n"
+                                 "</HTML>\n", html.read())
+            os.remove(base + ".rst")
+            os.remove(base + ".html")
+
+    def test_parallel_conversion(self):
+        contents = ["Hello World!\n", "one :ulb,l\n", "[bold] text :p\n"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = []
+            for index, content in enumerate(contents):
+                filename = os.path.join(tmpdir, "file%d.txt" % index)
+                with open(filename, "w") as f:
+                    f.write(content)
+                filenames.append(filename)
+
+            self.app.run(args=filenames, out=self.out, err=self.err)
+            serial = []
+            for filename in filenames:
+                with open(filename[:-4] + ".rst") as f:
+                    serial.append(f.read())
+                os.remove(filename[:-4] + ".rst")
+
+            parallel_err = io.StringIO()
+            self.app.run(args=["-j", "2"] + filenames, out=self.out, err=parallel_err)
+            for filename, expected in zip(filenames, serial):
+                with open(filename[:-4] + ".rst") as f:
+                    self.assertEqual(expected, f.read())
+
+            self.assertEqual("", self.out.getvalue())
+            self.assertEqual(self.err.getvalue(), parallel_err.getvalue())
+            self.assertIn(" ERROR: unbalanced number of ulb,ule or olb,ole pairs!", parallel_err.getvalue())
+
+    def test_worker_starts_without_run_state(self):
+        self.app.profile = Profile()
+        self.app.profile.add('read', 1.0)
+        self.app.metrics = RunMetrics()
+        self.app.metrics.add({'file': 'one.txt'})
+        self.app.use_link_table([self.app], LinkTable(['Allen']))
+
+        worker = pickle.loads(pickle.dumps(self.app.create_worker()))
+        self.assertEqual({}, worker.profile.stages)
+        self.assertEqual([], worker.metrics.files)
+        self.assertTrue(worker.link_table.has_reference('Allen'))
+        self.assertEqual([1.0, 1], self.app.profile.stages['read'])
+        self.assertEqual(1, len(self.app.metrics.files))
+
+    def test_global_links(self):
+        contents = [":link(Allen)\n", "\"Allen\"_Allen\n"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = []
+            for index, content in enumerate(contents):
+                filename = os.path.join(tmpdir, "file%d.txt" % index)
+                with open(filename, "w") as f:
+                    f.write(content)
+                filenames.append(filename)
+            table = os.path.join(tmpdir, "links.json")
+
+            for args in (["--global-links", "--link-table", table], ["-j", "2", "--global-links"],
+                         ["--link-table", table]):
+                self.app.run(args=args + filenames, out=self.out, err=self.err)
+                with open(filenames[1][:-4] + ".rst") as f:
+                    self.assertEqual(":ref:`Allen <Allen>`\n\n", f.read())
+                os.remove(filenames[1][:-4] + ".rst")
+
+            self.app.link_table = None
+            self.app.run(args=filenames, out=self.out, err=self.err)
+            with open(filenames[1][:-4] + ".rst") as f:
+                self.assertEqual("`Allen <Allen>`_\n\n", f.read())
+
+    def test_failed_conversion_only_writes_error(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = []
+            for index, content in enumerate(["Hello World!\n", "text\n\none :ulb,l\n"]):
+                filename = os.path.join(tmpdir, "file%d.txt" % index)
+                with open(filename, "w") as f:
+                    f.write(content)
+                filenames.append(filename)
+
+            self.app.run(args=filenames, out=self.out, err=self.err)
+
+            with open(filenames[1][:-4] + ".rst") as f:
+                self.assertEqual("###########################################################################\n"
+                                 " ERROR: unbalanced number of ulb,ule or olb,ole pairs!\n"
+                                 "###########################################################################\n",
+                                 f.read())
+
 class TestMathMarkup(unittest.TestCase):
     def setUp(self):
         self.markup = txt2rst.RSTMarkup()
@@ -523,5 +756,34 @@ class TestMathMarkup(unittest.TestCase):
                    ":math:`f_r'` is a random force proportional to\n\n"
         self.assertEqual(expected, self.txt2rst.convert(line))
 
+    def test_unmatched_inline_math_delimiters(self):
+        self.assertEqual("a \\) b :math:`x`", self.markup.inline_math("a \\) b \\(x\\)"))
+        self.assertEqual(":math:`x` \\(y", self.markup.inline_math("\\(x\\) \\(y"))
+
+    def test_thousands_of_inline_formulas(self):
+        s = self.markup.inline_math(" ".join("\\(x_%d\\)" % i for i in range(5000)))
+        self.assertEqual(5000, s.count(":math:"))
+        self.assertTrue(s.startswith(":math:`x_0` :math:`x_1`"))
+
+    def test_unbalanced_closing_delimiter_is_left_as_text(self):
+        self.assertEqual(":math:`a` \\) b :math:`c`", self.markup.inline_math("\\(a\\) \\) b \\(c\\)"))
+        self.assertEqual("a \\) b :math:`x`\n\n", self.txt2rst.convert("a \\) b \\(x\\)\n"))
+
+    def test_inline_math_walks_text_once(self):
+        text = SearchedText(" ".join("\\(x_%d\\)" % i for i in range(5000)))
+        formulas = []
+        inline_math_formula = self.markup.inline_math_formula
+
+        def count_formula(formula):
+            formulas.append(formula)
+            return inline_math_formula(formula)
+
+        self.markup.inline_math_formula = count_formula
+        self.markup.inline_math(text)
+        self.assertEqual(5000, len(formulas))
+        self.assertEqual(2 * 5000 + 1, len(text.searches))
+        self.assertEqual(sorted(text.searches), text.searches)
+        self.assertEqual(0, text.replaces)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,72 @@
+# LAMMPS Documentation Utilities
+#
+# Copyright (C) 2015 Richard Berger
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import unittest
+from lammpsdoc.watch import FileWatcher
+
+
+class TestFileWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = []
+        for name in ("a.txt", "b.txt"):
+            filename = os.path.join(self.tmpdir.name, name)
+            self.touch(filename, "Hello World!\n", 1000)
+            self.files.append(filename)
+        self.watcher = FileWatcher(self.files, debounce=1.0)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def touch(self, filename, content, mtime):
+        with open(filename, "w") as f:
+            f.write(content)
+        os.utime(filename, (mtime, mtime))
+
+    def test_no_changes(self):
+        self.assertEqual([], self.watcher.poll(now=2000))
+
+    def test_debounce_changes(self):
+        a, b = self.files
+        self.touch(a, "Bye World!\n", 1100)
+        self.assertEqual([], self.watcher.poll(now=2000))
+        self.touch(a, "Bye World!!\n", 1200)
+        self.assertEqual([], self.watcher.poll(now=2000.5))
+        self.assertEqual([], self.watcher.poll(now=2001))
+        self.assertEqual([a], self.watcher.poll(now=2001.5))
+        self.assertEqual([], self.watcher.poll(now=2010))
+
+    def test_most_recently_modified_first(self):
+        a, b = self.files
+        self.touch(a, "Bye World!\n", 1100)
+        self.touch(b, "Bye World!\n", 1200)
+        self.watcher.poll(now=2000)
+        self.assertEqual([b, a], self.watcher.poll(now=2001))
+
+    def test_removed_file(self):
+        a, b = self.files
+        os.remove(a)
+        self.assertEqual([], self.watcher.poll(now=2000))
+        self.assertEqual([], self.watcher.poll(now=2001))
+        self.touch(a, "Back again\n", 1300)
+        self.watcher.poll(now=2002)
+        self.assertEqual([a], self.watcher.poll(now=2003))
+
+if __name__ == '__main__':
+    unittest.main()